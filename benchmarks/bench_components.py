@@ -0,0 +1,89 @@
+'''Timings of each component's design and off-design solve_nonlinear, at the operating points of the component tests. time_design and time_off_design solve from scratch each time, without the warm starts and cached states earlier runs leave behind; time_off_design_warm repeats the same off-design point, as solver iterations close to convergence do.'''
+
+from openmdao.core.group import Group
+from openmdao.core.problem import Problem
+
+from pycycle import flowstation
+from pycycle.compressor import Compressor
+from pycycle.duct import Duct
+from pycycle.heat_exchanger import HeatExchanger
+from pycycle.inlet import Inlet
+from pycycle.nozzle import Nozzle
+from pycycle.splitter import SplitterBPR, SplitterW
+
+class _ComponentBenchmark(object):
+    '''Runs one component at design, then times design and off-design runs. Subclasses give the component class, its parameters, and parameter changes for the off-design point.'''
+    component = None
+    params = {}
+    off_design = {}
+
+    def setup(self):
+        flowstation.disable_solve_cache()
+        self.comp = self.component()
+        g = Group()
+        g.add('comp', self.comp)
+        self.p = Problem(root=g)
+        self.p.setup(check=False)
+        for name, value in self.params.iteritems():
+            self.comp.params[name] = value
+        self.comp.params['design'] = True
+        self.p.run()
+
+    def _cold(self):
+        '''Forget the warm starts and cached states of earlier runs'''
+        self.comp.clear_caches()
+        flowstation.clear_solve_cache() # and the sonic states
+
+    def _set_off_design(self):
+        self.comp.params['design'] = False
+        for name, value in self.off_design.iteritems():
+            self.comp.params[name] = value
+
+    def time_design(self):
+        self._cold()
+        self.comp.params['design'] = True
+        self.p.run()
+
+    def time_off_design(self):
+        self._cold()
+        self._set_off_design()
+        self.p.run()
+
+    def time_off_design_warm(self):
+        self._set_off_design()
+        self.p.run()
+
+class InletSolve(_ComponentBenchmark):
+    component = Inlet
+    params = {'ram_recovery': 1.0, 'MNexit_des': 0.6, 'flow_in:in:W': 1.08, 'flow_in:in:Tt': 630.75, 'flow_in:in:Pt': 0.0272, 'flow_in:in:Mach': 1.0}
+    off_design = {'flow_in:in:W': 0.9}
+
+class DuctSolve(_ComponentBenchmark):
+    component = Duct
+    params = {'dPqP': 0.0, 'Q_dot': -237.8, 'MNexit_des': 0.4, 'flow_in:in:W': 1.08, 'flow_in:in:Tt': 1424.01, 'flow_in:in:Pt': 0.34, 'flow_in:in:Mach': 0.4}
+    off_design = {'dPqP': 0.1}
+
+class CompressorSolve(_ComponentBenchmark):
+    component = Compressor
+    params = {'PR_des': 12.47, 'MNexit_des': 0.4, 'eff_des': 0.8, 'flow_in:in:W': 1.08, 'flow_in:in:Tt': 630.74523, 'flow_in:in:Pt': 0.0271945, 'flow_in:in:Mach': 0.6}
+    off_design = {'flow_in:in:W': 1.0}
+
+class SplitterBPRSolve(_ComponentBenchmark):
+    component = SplitterBPR
+    params = {'BPR': 2.2285, 'MNexit1_des': 1.0, 'MNexit2_des': 1.0, 'flow_in:in:W': 3.48771299, 'flow_in:in:Tt': 630.74523, 'flow_in:in:Pt': 0.0271945, 'flow_in:in:Mach': 1.0}
+    off_design = {'flow_in:in:W': 3.48771299 * 0.95}
+
+class SplitterWSolve(_ComponentBenchmark):
+    component = SplitterW
+    params = {'W1_des': 1.08, 'MNexit1_des': 1.0, 'MNexit2_des': 1.0, 'flow_in:in:W': 3.48771299, 'flow_in:in:Tt': 630.74523, 'flow_in:in:Pt': 0.0271945, 'flow_in:in:Mach': 1.0}
+    off_design = {'flow_in:in:W': 3.48771299 * 0.95}
+
+class HeatExchangerSolve(_ComponentBenchmark):
+    component = HeatExchanger
+    params = {'flow_in:in:Tt': 1423.8, 'flow_in:in:Pt': 0.302712118187, 'flow_in:in:W': 1.0, 'dPqP': 0.0}
+    off_design = {'flow_in:in:W': 0.9}
+
+class NozzleSolve(_ComponentBenchmark):
+    component = Nozzle
+    params = {'flow_in:in:W': 100.0, 'flow_in:in:Tt': 700.0, 'flow_in:in:Pt': 50.0, 'flow_in:in:Mach': 0.4, 'back_Ps': 15.0}
+    off_design = {'back_Ps': 20.0}
@@ -0,0 +1,45 @@
+'''Timings of each flowstation solve path, at the operating point of the flowstation tests'''
+
+from pycycle import flowstation
+
+W = 100.0
+Tt = 1100.0
+Pt = 400.0
+
+class FlowStationSolve(object):
+    def setup(self):
+        flowstation.disable_solve_cache()
+        totals = flowstation.solve(W=W, Tt=Tt, Pt=Pt)
+        self.ht = totals.ht
+        self.s = totals.s
+        self.area = flowstation.solve(W=W, Tt=Tt, Pt=Pt, Mach=0.3).area
+        self.statics = flowstation.solve(W=W, Tt=Tt, Pt=Pt, Mach=0.3)
+
+    def time_Pt_Tt(self):
+        flowstation.solve(W=W, Tt=Tt, Pt=Pt)
+
+    def time_Pt_ht(self):
+        flowstation.solve(W=W, ht=self.ht, Pt=Pt)
+
+    def time_Pt_s(self):
+        flowstation.solve(W=W, s=self.s, Pt=Pt)
+
+    def time_isentropic_h(self):
+        flowstation.isentropic_h(self.s, Pt)
+
+    def time_Mach(self):
+        flowstation.solve(W=W, Tt=Tt, Pt=Pt, Mach=0.3)
+
+    def time_area_subsonic(self):
+        flowstation.clear_solve_cache() # include the sonic state solve
+        flowstation.solve(W=W, Tt=Tt, Pt=Pt, area=self.area, is_super=False)
+
+    def time_area_supersonic(self):
+        flowstation.clear_solve_cache()
+        flowstation.solve(W=W, Tt=Tt, Pt=Pt, area=self.area, is_super=True)
+
+    def time_Ps(self):
+        flowstation.solve(W=W, Tt=Tt, Pt=Pt, Ps=self.statics.Ps)
+
+    def time_Ts_Ps_MN(self):
+        flowstation.solve(W=W, Ts=self.statics.Ts, Ps=self.statics.Ps, Mach=0.3)
@@ -0,0 +1,92 @@
+'''
+Runs the benchmarks and compares them against a stored baseline.
+
+Benchmarks are written in the asv style: classes in the bench_*.py modules of this directory, with an optional setup() and time_*() methods. Each time_*() method is called repeatedly after one setup(), and the best time per call over several samples is reported.
+
+    python benchmarks/run.py                  # compare against benchmarks/baseline.json
+    python benchmarks/run.py --save           # (re)record the baseline
+    python benchmarks/run.py -k Nozzle        # only benchmarks whose name contains 'Nozzle'
+
+Timings depend on the machine and the Cantera build, so the baseline should be recorded on the machine it is compared on; for that reason no baseline.json is kept in the repository, and the first run with --save on a machine records its reference. A benchmark more than --tolerance times slower than its baseline is reported as a regression, and the exit status is then 1.
+'''
+
+import argparse
+import glob
+import imp
+import inspect
+import json
+import os
+import sys
+import timeit
+
+_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+def discover(pattern=''):
+    '''(name, class, method name) of every benchmark whose name contains pattern'''
+    benchmarks = []
+    for filename in sorted(glob.glob(os.path.join(_DIRECTORY, 'bench_*.py'))):
+        module_name = os.path.splitext(os.path.basename(filename))[0]
+        module = imp.load_source(module_name, filename)
+        for class_name, cls in sorted(inspect.getmembers(module, inspect.isclass)):
+            if class_name.startswith('_') or cls.__module__ != module_name:
+                continue
+            for method_name in sorted(dir(cls)):
+                name = '%s.%s.%s' % (module_name, class_name, method_name)
+                if method_name.startswith('time_') and pattern in name:
+                    benchmarks.append((name, cls, method_name))
+    return benchmarks
+
+def measure(cls, method_name, repeat=5, min_time=0.05):
+    '''Best time per call (s) of a benchmark method, over repeat samples of at least min_time each'''
+    bench = cls()
+    if hasattr(bench, 'setup'):
+        bench.setup()
+    method = getattr(bench, method_name)
+    timer = timeit.Timer(method)
+    number = 1
+    while True:
+        sample = timer.timeit(number)
+        if sample >= min_time or number >= 1e6:
+            break
+        number *= 10 if sample < min_time / 10.0 else 2
+    return min([sample] + timer.repeat(repeat - 1, number)) / number
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the pyCycle benchmarks')
+    parser.add_argument('-k', dest='pattern', default='', help='only run benchmarks whose name contains this')
+    parser.add_argument('--baseline', default=os.path.join(_DIRECTORY, 'baseline.json'), help='baseline file')
+    parser.add_argument('--save', action='store_true', help='store the timings as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=1.25, help='slowdown relative to the baseline that counts as a regression')
+    parser.add_argument('--repeat', type=int, default=5, help='number of timing samples per benchmark')
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    results = {}
+    regressions = []
+    for name, cls, method_name in discover(args.pattern):
+        results[name] = measure(cls, method_name, repeat=args.repeat)
+        line = '%-60s %10.3f ms' % (name, results[name] * 1e3)
+        if name in baseline:
+            ratio = results[name] / baseline[name]
+            line += '  %5.2fx baseline' % ratio
+            if ratio > args.tolerance:
+                line += '  REGRESSION'
+                regressions.append(name)
+        print line
+        sys.stdout.flush()
+
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print 'Saved baseline to %s' % args.baseline
+    elif regressions:
+        print '%d regression(s) over %.2fx: %s' % (len(regressions), args.tolerance, ', '.join(regressions))
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,7 +4,7 @@ kwargs = {'author': '',
  'author_email': '',
  'classifiers': ['Intended Audience :: Science/Research',
                  'Topic :: Scientific/Engineering'],
- 'data_files': [('pycycle', ['src/pycycle/gri1000.cti'])],
+ 'data_files': [('pycycle', ['src/pycycle/gri1000.cti', 'src/pycycle/gri1000.xml'])],
  'description': '',
  'download_url': '',
  'include_package_data': True,
@@ -14,7 +14,7 @@ kwargs = {'author': '',
  'maintainer': '',
  'maintainer_email': '',
  'name': 'pycycle',
- 'package_data': {'pycycle': []},
+ 'package_data': {'pycycle': ['gri1000.cti', 'gri1000.xml']},
  'package_dir': {'': 'src'},
  'packages': ['pycycle'],
  'url': '',
@@ -0,0 +1,117 @@
+import math
+
+from pycycle import flowstation, instrument
+from pycycle.cache import LRUCache, quantize
+from pycycle.flowstation import combine_partials
+from pycycle.cycle_component import CycleComponent, component_solve
+
+class Burner(CycleComponent):
+    '''Burns fuel in the incoming flow at constant enthalpy, giving the equilibrium combustion products at the exit'''
+    # Equilibrium product states are cached by their exact (FAR, WAR, fuel, Pt, ht) inputs, and a repeated point returns the cached state without
+    # solving the equilibrium again. Product compositions are also cached per cell of this (FAR, log(Pt), ht) grid: within a cell, the equilibrium
+    # solve of a new point starts from the cached composition, shifted by the change in reactants so the element totals stay exact, instead of
+    # from a hot equilibrium of the reactants. The exit state is still the equilibrium at the actual FAR, Pt, and ht.
+    FAR_step = 1e-4
+    Pt_step = 1e-3 # relative
+    ht_step = 0.25 # Btu/lbm
+    products_cache_size = 256 # of each cache; 0 solves the equilibrium every time
+    discrete_params = ('fuel_type',)
+    optional_params = ('FAR',)
+
+    def __init__(self):
+        super(Burner, self).__init__()
+        self.add_param('Wfuel', 0.0, desc='fuel flow rate', units='lbm/s')
+        self.add_param('FAR', -1.0, desc='fuel-to-air ratio at the exit; overrides Wfuel if not negative')
+        self.add_param('fuel_type', float(flowstation.FUEL), desc='index of the fuel reactant in flowstation.REACTANT_NAMES')
+        self.add_param('hfuel', -642.0, desc='enthalpy of the fuel', units='Btu/lbm')
+        self.add_param('dPqP', 0.0, desc='pressure differential as a fraction of incoming pressure')
+        self.add_param('MNexit_des', 0.2, desc='Mach number at the burner exit at design conditions')
+        self.add_output('Wfuel_out', 0.0, desc='fuel flow rate burned', units='lbm/s')
+        self._add_flowstation('flow_in')
+        self._add_flowstation('flow_out')
+        self._products = LRUCache(self.products_cache_size)
+        self._states = LRUCache(self.products_cache_size)
+
+    @component_solve
+    @instrument.component_scope
+    def solve_nonlinear(self, params, unknowns, resids):
+        self._clear_unknowns('flow_in', unknowns)
+        self._clear_unknowns('flow_out', unknowns)
+        self._solve_flow_vars('flow_in', params, unknowns)
+        W_in = unknowns['flow_in:out:W']
+        FAR_in = max(unknowns['flow_in:out:FAR'], 0.0)
+        WAR = unknowns['flow_in:out:WAR']
+        if params['FAR'] >= 0.0:
+            Wfuel = (params['FAR'] - FAR_in) * W_in / (1.0 + FAR_in + max(WAR, 0.0))
+        else:
+            Wfuel = params['Wfuel']
+        unknowns['Wfuel_out'] = Wfuel
+        W, ht, FAR = flowstation.burn(W_in, unknowns['flow_in:out:ht'], Wfuel, params['hfuel'], FAR=FAR_in, WAR=WAR)
+        Pt = unknowns['flow_in:out:Pt'] * (1.0 - params['dPqP'])
+        species = flowstation.composition(FAR=FAR, WAR=WAR, fuel=params['fuel_type'])
+        totals = self._products_state(FAR, WAR, params['fuel_type'], Pt, ht, species)
+        if params['design']:
+            out = flowstation.solve_from_totals(totals, Pt, W=W, Mach=params['MNexit_des'], species=species)
+            self._exit_area_des = out.area
+        else:
+            out = flowstation.solve_from_totals(totals, Pt, W=W, area=self._exit_area_des, species=species)
+        self._set_flow_vars('flow_out', unknowns, out, W=W, FAR=FAR, WAR=WAR, fuel=params['fuel_type'], is_super=False)
+
+    def _partials(self, params, unknowns):
+        J = self._flow_partials('flow_in', unknowns)
+        W_in, ht_in, Pt_in = unknowns['flow_in:out:W'], unknowns['flow_in:out:ht'], unknowns['flow_in:out:Pt']
+        FAR_in, WAR = max(unknowns['flow_in:out:FAR'], 0.0), unknowns['flow_in:out:WAR']
+        dW_in = J['flow_in:out:W']
+        dFAR_in = J['flow_in:out:FAR'] if FAR_in > 0.0 else {}
+        flow_per_air = 1.0 + FAR_in + max(WAR, 0.0)
+        dflow_per_air = combine_partials((1.0, dFAR_in), (1.0, J['flow_in:out:WAR'] if WAR > 0.0 else {}))
+        Wfuel = unknowns['Wfuel_out']
+        if params['FAR'] >= 0.0:
+            J['Wfuel_out'] = dWfuel = combine_partials((W_in / flow_per_air, {'FAR': 1.0}), (-W_in / flow_per_air, dFAR_in), ((params['FAR'] - FAR_in) / flow_per_air, dW_in), (-Wfuel / flow_per_air, dflow_per_air))
+        else:
+            J['Wfuel_out'] = dWfuel = {'Wfuel': 1.0}
+        # see flowstation.burn()
+        W = W_in + Wfuel
+        dW = combine_partials((1.0, dW_in), (1.0, dWfuel))
+        inputs = {'W': dW,
+                  'ht': combine_partials((ht_in / W, dW_in), (W_in / W, J['flow_in:out:ht']), (params['hfuel'] / W, dWfuel), (Wfuel / W, {'hfuel': 1.0}), (-unknowns['flow_out:out:ht'] / W, dW)),
+                  'FAR': combine_partials((1.0, dFAR_in), (flow_per_air / W_in, dWfuel), (Wfuel / W_in, dflow_per_air), (-Wfuel * flow_per_air / W_in ** 2, dW_in)),
+                  'WAR': J['flow_in:out:WAR'],
+                  'Pt': combine_partials((1.0 - params['dPqP'], J['flow_in:out:Pt']), (-Pt_in, {'dPqP': 1.0}))}
+        if params['design']:
+            inputs['Mach'] = {'MNexit_des': 1.0}
+        J.update(self._flow_partials('flow_out', unknowns, inputs, mode=('ht', 'Mach' if params['design'] else 'area')))
+        return J
+
+    def _products_state(self, FAR, WAR, fuel, Pt, ht, species):
+        '''Equilibrium total state of the products: the cached state of an earlier solve at the same inputs, or else an equilibrium solve that starts from the product composition of an earlier solve in the same grid cell if there is one'''
+        if not self.products_cache_size:
+            return flowstation.equilibrium_products(ht, Pt, species)[0]
+        exact_key = tuple(quantize(float(x), 1e-12) for x in (FAR, max(WAR, 0.0), Pt, ht)) + (int(fuel), flowstation.get_mechanism())
+        state = self._states.get(exact_key)
+        if state is not None:
+            return state
+        key = (int(round(FAR / self.FAR_step)), int(round(math.log(Pt) / self.Pt_step)), int(round(ht / self.ht_step)), max(WAR, 0.0), int(fuel), flowstation.get_mechanism()) # mass fractions are in mechanism species order
+        cached = self._products.get(key)
+        Y_guess = None
+        if cached is not None:
+            species_cached, Y = cached
+            Y_guess = Y + flowstation._mass_fractions(species) - flowstation._mass_fractions(species_cached)
+            if (Y_guess < 0.0).any():
+                Y_guess = None # less of a reactant than the cached products hold, so there is no guess with the right element totals
+        state, Y = flowstation.equilibrium_products(ht, Pt, species, Y_guess)
+        if cached is None:
+            self._products.put(key, (species, Y))
+        self._states.put(exact_key, state)
+        return state
+
+    def clear_caches(self):
+        super(Burner, self).clear_caches()
+        self._products.clear()
+        self._states.clear()
+
+    def products_stats(self):
+        '''Number of grid cells whose cached product composition was found (hits) or not (misses), for the points that were not repeated, and the statistics of the cache of repeated points ('states'), whose hits solve no equilibrium'''
+        stats = self._products.stats()
+        stats['states'] = self._states.stats()
+        return stats
@@ -0,0 +1,69 @@
+import math
+import threading
+from collections import OrderedDict
+
+def quantize(x, rel_tol):
+    '''Hashable key for x that is equal for values within about rel_tol of each other. Non-float values are returned unchanged.'''
+    if not isinstance(x, float) or x == 0.0 or math.isinf(x) or math.isnan(x):
+        return x
+    mantissa, exponent = math.frexp(x)
+    return (int(round(mantissa / rel_tol)), exponent)
+
+class LRUCache(object):
+    '''Mapping with a bounded number of entries that evicts the least recently used one and counts hits and misses. Safe to share between threads.'''
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        '''Value stored for key (marking it as most recently used), or default'''
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data[key] = value
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            if key in self._data:
+                del self._data[key]
+            elif len(self._data) >= self.maxsize:
+                self._data.popitem(last=False)
+            self._data[key] = value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['_lock'] # locks cannot be pickled; the copy gets its own
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = 0
+
+    def stats(self):
+        '''Number of hits and misses, hit rate, and current and maximum size'''
+        with self._lock:
+            hits, misses, size = self.hits, self.misses, len(self._data)
+        calls = hits + misses
+        return {'hits': hits, 'misses': misses, 'hit_rate': float(hits) / calls if calls else 0.0, 'size': size, 'maxsize': self.maxsize}
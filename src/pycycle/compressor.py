@@ -1,25 +1,33 @@
 import math 
 
-from pycycle import flowstation
-from pycycle.flowstation import GAS_CONSTANT
-from pycycle.cycle_component import CycleComponent
+from pycycle import flowstation, instrument
+from pycycle.flowstation import GAS_CONSTANT, combine_partials
+from pycycle.cycle_component import CycleComponent, component_solve
+from pycycle.compressor_map import CompressorMap
 
 class Compressor(CycleComponent): 
-    '''Basis for axial compressor performance calculations (without flowstations)''' 
+    '''Basis for axial compressor performance calculations (without flowstations). Off-design performance follows a linear operating line, or a CompressorMap (or the name of a map file) scaled to the design point.''' 
 
-    def __init__(self):
+    def __init__(self, compressor_map=None):
         super(Compressor, self).__init__()
+        if isinstance(compressor_map, basestring):
+            compressor_map = CompressorMap.load(compressor_map)
+        self.compressor_map = compressor_map
         self.add_param('PR_des', 12.47, desc='Pressure ratio at design conditions')
         self.add_param('MNexit_des', 0.4, desc='mach number at the compressor exit at design conditions')
         self.add_param('eff_des', 0.95, desc='adiabatic efficiency at the design condition')
         self.add_param('hub_to_tip', 0.4, desc='ratio of hub radius to tip radius')
         self.add_param('op_slope', 0.85, desc='slope of operating line (pressure/efficiency)')
+        self.add_param('Nc', 1.0, desc='corrected speed, relative to design (with a map)')
+        self.add_param('Nc_map_des', 1.0, desc='corrected speed of the design point on the map')
+        self.add_param('Rline_map_des', 2.0, desc='R-line of the design point on the map')
         self.add_output('PR', 0.0, desc='pressure ratio at operating conditions')
         self.add_output('eff', 0.0, desc='adiabatic efficiency at the operating condition')
         self.add_output('eff_poly', 0.0, desc='polytropic efficiency at the operating condition')
         self.add_output('pwr', 0.0, units='hp', desc='power required to run the compressor at the operating condition')
         self.add_output('tip_radius', 0.0, units='inch', desc='radius at the tip of the compressor')
         self.add_output('hub_radius', 0.0, units='inch', desc='radius at the hub of the compressor')
+        self.add_output('Rline', 0.0, desc='R-line of the operating point on the map')
         self._add_flowstation('flow_in')
         self._add_flowstation('flow_out')
 
@@ -30,16 +38,30 @@ class Compressor(CycleComponent):
         norm_PR = params['op_slope'] * (Wc / self._Wc_des) + b 
         return norm_PR * params['PR_des']
 
+    def _map_point(self, params, Wc):
+        '''(PR, eff, Rline) where the scaled map speed line params['Nc'] passes through corrected flow Wc'''
+        return self._map_lookup(params['Nc'] * params['Nc_map_des'], Wc)
+
+    def _map_lookup(self, Nc, Wc):
+        '''(PR, eff, Rline) where the map speed line Nc passes through the scaled corrected flow Wc'''
+        Wc_scale, PR_scale, eff_scale = self._map_scalars_des
+        Rline = self.compressor_map.rline(Nc, Wc / Wc_scale)
+        Wc_map, PR_map, eff_map = self.compressor_map.lookup(Nc, Rline)
+        return 1.0 + PR_scale * (PR_map - 1.0), eff_scale * eff_map, Rline
+
+    @component_solve
+    @instrument.component_scope
     def solve_nonlinear(self, params, unknowns, resids):
         self._clear_unknowns('flow_in', unknowns)
         self._clear_unknowns('flow_out', unknowns)
         self._solve_flow_vars('flow_in', params, unknowns)
+        self._copy_composition('flow_in', 'flow_out', unknowns)
         unknowns['flow_out:out:W'] = params['flow_in:in:W']
         if params['design']:
             # Design Calculations
             Pt_out = unknowns['flow_in:out:Pt'] * params['PR_des']
             unknowns['PR'] = params['PR_des']
-            ideal_ht = flowstation.solve(s=unknowns['flow_in:out:s'], Pt=Pt_out).ht
+            ideal_ht = flowstation.isentropic_h(unknowns['flow_in:out:s'], Pt_out, FAR=unknowns['flow_in:out:FAR'], WAR=unknowns['flow_in:out:WAR'], fuel=unknowns['flow_in:out:fuel'])
             ht_out = (ideal_ht - unknowns['flow_in:out:ht']) / params['eff_des'] + unknowns['flow_in:out:ht']
             unknowns['flow_out:out:ht'] = ht_out
             unknowns['flow_out:out:Pt'] = Pt_out
@@ -47,13 +69,20 @@ class Compressor(CycleComponent):
             self._solve_flow_vars('flow_out', params, unknowns)
             self._exit_area_des = unknowns['flow_out:out:area']
             self._Wc_des = unknowns['flow_in:out:Wc']
+            if self.compressor_map is not None:
+                # scale the map once, so off-design points are plain lookups
+                self._map_scalars_des = self.compressor_map.scalars(params['Nc_map_des'], params['Rline_map_des'], self._Wc_des, params['PR_des'], params['eff_des'])
+                unknowns['Rline'] = params['Rline_map_des']
         else:
-            # Assumed Op Line Calculation
-            unknowns['PR'] = self._op_line(params, unknowns['flow_in:out:Wc'])
-            unknowns['eff'] = params['eff_des'] # TODO: add in eff variation with W
+            if self.compressor_map is not None:
+                unknowns['PR'], unknowns['eff'], unknowns['Rline'] = self._map_point(params, unknowns['flow_in:out:Wc'])
+            else:
+                # Assumed Op Line Calculation
+                unknowns['PR'] = self._op_line(params, unknowns['flow_in:out:Wc'])
+                unknowns['eff'] = params['eff_des'] # TODO: add in eff variation with W
             # Operational Conditions
             Pt_out = unknowns['flow_in:out:Pt'] * unknowns['PR']
-            ideal_ht = flowstation.solve(s=unknowns['flow_in:out:s'], Pt=Pt_out).ht
+            ideal_ht = flowstation.isentropic_h(unknowns['flow_in:out:s'], Pt_out, FAR=unknowns['flow_in:out:FAR'], WAR=unknowns['flow_in:out:WAR'], fuel=unknowns['flow_in:out:fuel'])
             ht_out = (ideal_ht - unknowns['flow_in:out:ht']) / unknowns['eff'] + unknowns['flow_in:out:ht']
             unknowns['flow_out:out:ht'] = ht_out
             unknowns['flow_out:out:Pt'] = Pt_out
@@ -65,3 +94,47 @@ class Compressor(CycleComponent):
         unknowns['pwr'] = params['flow_in:in:W'] * (unknowns['flow_out:out:ht'] - unknowns['flow_in:out:ht']) * 1.4148532 # btu/s to hp
         unknowns['tip_radius'] = (unknowns['flow_out:out:area'] / math.pi / (1 - params['hub_to_tip'] ** 2)) ** 0.5
         unknowns['hub_radius'] = params['hub_to_tip'] * unknowns['tip_radius']
+
+    def _map_partials(self, params, Wc, dWc):
+        '''Partials of _map_point() (PR, eff, and Rline), given those of Wc. The map is interpolated piecewise linearly, so steps of the lookups give its slopes.'''
+        Nc = params['Nc'] * params['Nc_map_des']
+        dNc = {'Nc': params['Nc_map_des'], 'Nc_map_des': params['Nc']}
+        step_Wc, step_Nc = self.fd_step * Wc, self.fd_step * Nc
+        values = zip(self._map_lookup(Nc, Wc), self._map_lookup(Nc, Wc + step_Wc), self._map_lookup(Nc + step_Nc, Wc))
+        return [combine_partials(((by_Wc - value) / step_Wc, dWc), ((by_Nc - value) / step_Nc, dNc)) for value, by_Wc, by_Nc in values]
+
+    def _partials(self, params, unknowns):
+        J = self._flow_partials('flow_in', unknowns)
+        if params['design']:
+            J['PR'] = {'PR_des': 1.0}
+            eff, deff = params['eff_des'], {'eff_des': 1.0}
+            if self.compressor_map is not None:
+                J['Rline'] = {'Rline_map_des': 1.0}
+        else:
+            Wc, dWc = unknowns['flow_in:out:Wc'], J['flow_in:out:Wc']
+            if self.compressor_map is not None:
+                J['PR'], J['eff'], J['Rline'] = self._map_partials(params, Wc, dWc)
+            else:
+                J['PR'] = combine_partials((params['PR_des'] * params['op_slope'] / self._Wc_des, dWc), (unknowns['PR'] / params['PR_des'], {'PR_des': 1.0}), (params['PR_des'] * (Wc / self._Wc_des - 1.0), {'op_slope': 1.0}))
+                J['eff'] = {'eff_des': 1.0}
+            eff, deff = unknowns['eff'], J['eff']
+        PR, Pt_in, ht_in = unknowns['PR'], unknowns['flow_in:out:Pt'], unknowns['flow_in:out:ht']
+        composition = dict((var_name, J['flow_in:out:%s' % var_name]) for var_name in ('FAR', 'WAR'))
+        dPt_out = combine_partials((PR, J['flow_in:out:Pt']), (Pt_in, J['PR']))
+        ideal_ht, dideal_ht = flowstation.isentropic_h_partials(unknowns['flow_in:out:s'], Pt_in * PR, FAR=unknowns['flow_in:out:FAR'], WAR=unknowns['flow_in:out:WAR'], fuel=unknowns['flow_in:out:fuel'],
+                                                                inputs=dict(composition, s=J['flow_in:out:s'], Pt=dPt_out), step=self.fd_step)
+        inputs = dict(composition, Pt=dPt_out, W={'flow_in:in:W': 1.0},
+                      ht=combine_partials((1.0 / eff, dideal_ht), (1.0 - 1.0 / eff, J['flow_in:out:ht']), (-(ideal_ht - ht_in) / eff ** 2, deff)))
+        if params['design']:
+            inputs['Mach'] = {'MNexit_des': 1.0}
+        J.update(self._flow_partials('flow_out', unknowns, inputs))
+        C, dC = GAS_CONSTANT * math.log(PR), combine_partials((GAS_CONSTANT / PR, J['PR']))
+        delta_s = unknowns['flow_out:out:s'] - unknowns['flow_in:out:s']
+        ddelta_s = combine_partials((1.0, J['flow_out:out:s']), (-1.0, J['flow_in:out:s']))
+        J['eff_poly'] = combine_partials((delta_s / (C + delta_s) ** 2, dC), (-C / (C + delta_s) ** 2, ddelta_s))
+        W = params['flow_in:in:W']
+        J['pwr'] = combine_partials(((unknowns['flow_out:out:ht'] - ht_in) * 1.4148532, {'flow_in:in:W': 1.0}), (W * 1.4148532, J['flow_out:out:ht']), (-W * 1.4148532, J['flow_in:out:ht']))
+        tip_radius, hub_to_tip = unknowns['tip_radius'], params['hub_to_tip']
+        J['tip_radius'] = combine_partials((0.5 * tip_radius / unknowns['flow_out:out:area'], J['flow_out:out:area']), (tip_radius * hub_to_tip / (1.0 - hub_to_tip ** 2), {'hub_to_tip': 1.0}))
+        J['hub_radius'] = combine_partials((hub_to_tip, J['tip_radius']), (tip_radius, {'hub_to_tip': 1.0}))
+        return J
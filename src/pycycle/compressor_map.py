@@ -0,0 +1,92 @@
+'''
+Tabulated compressor maps.
+
+A map gives corrected flow Wc, pressure ratio PR, and adiabatic efficiency eff on a grid of corrected speed Nc and R-line, the usual parameterization along each speed line from surge to choke. Maps are read from text files with one grid point per line and the columns
+
+    # Nc  Rline  Wc  PR  eff
+    0.9   1.0    ...
+
+in any order, as long as every combination of the Nc and Rline values is present. Lines starting with # are comments.
+
+Values are interpolated bilinearly in (Nc, Rline) and extrapolated linearly from the edge cells. Every method takes scalars or arrays, broadcast against each other, and returns floats for scalar arguments, so the same map serves a single cycle point or a whole sweep.
+
+Maps are usually scaled to the design point of the compressor they model; see scalars(), which the Compressor calls once at design.
+'''
+
+import numpy as np
+
+class CompressorMap(object):
+    '''Wc, PR, and eff on an (Nc, Rline) grid'''
+    def __init__(self, Nc, Rline, Wc, PR, eff):
+        self.Nc = np.asarray(Nc, dtype=float)
+        self.Rline = np.asarray(Rline, dtype=float)
+        self.Wc, self.PR, self.eff = [np.asarray(table, dtype=float) for table in (Wc, PR, eff)]
+        shape = (len(self.Nc), len(self.Rline))
+        if len(self.Nc) < 2 or len(self.Rline) < 2 or any(table.shape != shape for table in (self.Wc, self.PR, self.eff)):
+            raise ValueError('A map needs tables of shape (len(Nc), len(Rline)) with at least two speeds and two R-lines.')
+        if (np.diff(self.Nc) <= 0).any() or (np.diff(self.Rline) <= 0).any():
+            raise ValueError('Nc and Rline must be strictly increasing.')
+
+    @classmethod
+    def load(cls, filename):
+        '''Read a map from a text file of Nc, Rline, Wc, PR, eff columns'''
+        data = np.loadtxt(filename, ndmin=2)
+        if data.shape[1] != 5:
+            raise ValueError('%s: expected 5 columns (Nc, Rline, Wc, PR, eff), found %d' % (filename, data.shape[1]))
+        Nc, Rline = np.unique(data[:, 0]), np.unique(data[:, 1])
+        i, j = np.searchsorted(Nc, data[:, 0]), np.searchsorted(Rline, data[:, 1])
+        filled = np.zeros((len(Nc), len(Rline)), dtype=int)
+        np.add.at(filled, (i, j), 1)
+        if (filled != 1).any():
+            raise ValueError('%s: every (Nc, Rline) pair of the grid must appear exactly once' % filename)
+        tables = []
+        for column in (2, 3, 4):
+            table = np.empty((len(Nc), len(Rline)))
+            table[i, j] = data[:, column]
+            tables.append(table)
+        return cls(Nc, Rline, *tables)
+
+    def save(self, filename):
+        '''Write the map in the format read by load()'''
+        Nc, Rline = np.meshgrid(self.Nc, self.Rline, indexing='ij')
+        columns = [Nc, Rline, self.Wc, self.PR, self.eff]
+        np.savetxt(filename, np.column_stack([column.ravel() for column in columns]), header='Nc Rline Wc PR eff')
+
+    def lookup(self, Nc, Rline):
+        '''(Wc, PR, eff) at the given speeds and R-lines'''
+        scalar = np.ndim(Nc) == 0 and np.ndim(Rline) == 0
+        Nc, Rline = np.broadcast_arrays(np.asarray(Nc, dtype=float), np.asarray(Rline, dtype=float))
+        i, u = _locate(self.Nc, Nc)
+        j, v = _locate(self.Rline, Rline)
+        values = [(1.0 - u) * ((1.0 - v) * table[i, j] + v * table[i, j + 1]) + u * ((1.0 - v) * table[i + 1, j] + v * table[i + 1, j + 1]) for table in (self.Wc, self.PR, self.eff)]
+        return tuple(float(value) for value in values) if scalar else tuple(values)
+
+    def rline(self, Nc, Wc):
+        '''R-line at which the speed line Nc passes through corrected flow Wc. Wc must vary monotonically along the speed line; flows beyond its ends are extrapolated from the end segments.'''
+        scalar = np.ndim(Nc) == 0 and np.ndim(Wc) == 0
+        Nc, Wc = np.broadcast_arrays(np.asarray(Nc, dtype=float), np.asarray(Wc, dtype=float))
+        i, u = _locate(self.Nc, Nc)
+        lines = (1.0 - u)[..., np.newaxis] * self.Wc[i] + u[..., np.newaxis] * self.Wc[i + 1] # Wc along each speed line
+        increasing = lines[..., -1:] > lines[..., :1]
+        lines = np.where(increasing, lines, -lines)
+        target = np.where(increasing[..., 0], Wc, -Wc)
+        # segment containing the target, or the end segment on its side
+        j = np.clip((lines[..., 1:-1] <= target[..., np.newaxis]).sum(axis=-1), 0, len(self.Rline) - 2)
+        W0, W1 = _take(lines, j), _take(lines, j + 1)
+        Rline = self.Rline[j] + (target - W0) / (W1 - W0) * (self.Rline[j + 1] - self.Rline[j])
+        return float(Rline) if scalar else Rline
+
+    def scalars(self, Nc, Rline, Wc, PR, eff):
+        '''Factors (Wc, PR, eff) that make the map point (Nc, Rline) match a design point with corrected flow Wc, pressure ratio PR, and efficiency eff. Flows and efficiencies are scaled by ratio, and pressure ratios by the ratio of PR - 1.'''
+        Wc_map, PR_map, eff_map = self.lookup(Nc, Rline)
+        return Wc / Wc_map, (PR - 1.0) / (PR_map - 1.0), eff / eff_map
+
+def _locate(grid, x):
+    '''Index of the grid cell containing (or, outside the grid, nearest to) each x, and the fraction of the way across it'''
+    i = np.clip(np.searchsorted(grid, x) - 1, 0, len(grid) - 2)
+    return i, (x - grid[i]) / (grid[i + 1] - grid[i])
+
+def _take(lines, j):
+    '''lines[..., j] for an index array j of the leading shape of lines'''
+    flat = lines.reshape(-1, lines.shape[-1])
+    return flat[np.arange(len(flat)), j.ravel()].reshape(j.shape)
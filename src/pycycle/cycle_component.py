@@ -1,7 +1,12 @@
+import cPickle
 import math 
+from collections import namedtuple
+from functools import wraps
 
+import numpy as np
 from openmdao.core.component import Component
-from pycycle import flowstation
+from pycycle import flowstation, instrument
+from pycycle.cache import quantize
 
 FLOW_VARS = {'ht':       ('total enthalpy', -1.0, 'Btu/lbm'),
              'Tt':       ('total temperature', -1.0, 'degR'),
@@ -15,6 +20,7 @@ FLOW_VARS = {'ht':       ('total enthalpy', -1.0, 'Btu/lbm'),
              'W':        ('weight flow', 0.0, 'lbm/s'),
              'FAR':      ('fuel-to-air ratio', -1.0, ''),
              'WAR':      ('water-to-air ratio', -1.0, ''),
+             'fuel':     ('index of the fuel reactant in flowstation.REACTANT_NAMES, or -1 for the default', -1.0, ''),
              'Vsonic':   ('speed of sound', -1.0, 'ft/s'),
              'Vflow':    ('velocity', -1.0, 'ft/s'),
              'rhos':     ('static density', -1.0, 'lbm/ft**3'),
@@ -26,76 +32,404 @@ FLOW_VARS = {'ht':       ('total enthalpy', -1.0, 'Btu/lbm'),
              'Wc':       ('corrected weight flow', -1.0, 'lbm/s'),
              'is_super': ('selects preference for supersonic versus subsonic solution when setting area', False, '')}
 
+_EMPTY = dict((var_name, props[1]) for var_name, props in FLOW_VARS.iteritems()) # value of each variable when it is not set
+
+_STATION_INPUTS = ('ht', 'Tt', 'Pt', 's', 'hs', 'Ts', 'Ps', 'Mach', 'area', 'W', 'FAR', 'WAR') # continuous variables a FlowStation is solved from; the rest of its params are only read when the station is passed through unsolved
+_DISCRETE_VARS = ('fuel', 'is_super')
+_CONTINUOUS_VARS = tuple(var_name for var_name in FLOW_VARS if var_name not in _DISCRETE_VARS)
+_SOLVE_VARS = _STATION_INPUTS + _DISCRETE_VARS # the variables a FlowStation passes to flowstation.solve()
+
+_StationNames = namedtuple('_StationNames', ['params', 'outputs', 'empty', 'output_fields'])
+_STATION_NAMES = {} # FlowStation name -> _StationNames
+
+def _station_names(name):
+    '''Names of a FlowStation's variables, formatted once per FlowStation name: params and outputs map each variable to its param and output name, empty pairs each output name with its value when not set, and output_fields lists the output names of the fields of flowstation.Output, in order'''
+    names = _STATION_NAMES.get(name)
+    if names is None:
+        outputs = dict((var_name, '%s:out:%s' % (name, var_name)) for var_name in FLOW_VARS)
+        names = _STATION_NAMES[name] = _StationNames(params=dict((var_name, '%s:in:%s' % (name, var_name)) for var_name in FLOW_VARS),
+                                                    outputs=outputs,
+                                                    empty=tuple((outputs[var_name], _EMPTY[var_name]) for var_name in FLOW_VARS),
+                                                    output_fields=tuple(outputs[field] for field in flowstation.Output._fields))
+    return names
+
+FLOW_VAR_NAMES = tuple(sorted(FLOW_VARS)) # layout of a compact FlowStation vector
+FLOW_DEFAULTS = np.array([float(FLOW_VARS[var_name][1]) for var_name in FLOW_VAR_NAMES])
+_IS_SUPER = FLOW_VAR_NAMES.index('is_super')
+
+class FlowVector(object):
+    '''Attribute access to a compact FlowStation vector, e.g. FlowVector(comp.unknowns['flow_out:out']).Pt. Setting an attribute writes through to the vector.'''
+    __slots__ = ('data',)
+
+    def __init__(self, data=None):
+        self.data = FLOW_DEFAULTS.copy() if data is None else data
+
+def _flow_vector_property(index):
+    def fget(self):
+        return bool(self.data[index]) if index == _IS_SUPER else self.data[index]
+    def fset(self, value):
+        self.data[index] = value
+    return property(fget, fset, doc=FLOW_VARS[FLOW_VAR_NAMES[index]][0])
+
+for _index, _var_name in enumerate(FLOW_VAR_NAMES):
+    setattr(FlowVector, _var_name, _flow_vector_property(_index))
+
+class _CompactVars(object):
+    '''params or unknowns of a component with compact FlowStations, keyed like the per-variable layout ('flow_in:in:W') so that solve_nonlinear does not depend on the layout'''
+    __slots__ = ('_wrapper', '_index', '_keys')
+
+    def __init__(self, wrapper, index):
+        self._wrapper = wrapper
+        self._index = index # per-variable name -> (vector name, position)
+        vectors = set(vector for vector, position in index.itervalues())
+        self._keys = [name for name in wrapper.keys() if name not in vectors] + sorted(index)
+
+    def __getitem__(self, name):
+        location = self._index.get(name)
+        if location is None:
+            return self._wrapper[name]
+        value = self._wrapper[location[0]][location[1]]
+        return bool(value) if location[1] == _IS_SUPER else value
+
+    def __setitem__(self, name, value):
+        location = self._index.get(name)
+        if location is None:
+            self._wrapper[name] = value
+        else:
+            self._wrapper[location[0]][location[1]] = value
+
+    def __contains__(self, name):
+        return name in self._index or name in self._wrapper
+
+    def keys(self):
+        return self._keys
+
+    def __getattr__(self, name):
+        return getattr(self._wrapper, name)
+
+def _solve_mode(values):
+    '''The total ('Tt', 'ht', or 's') and static spec ('Mach', 'area', 'Ps', or None) that flowstation.solve() solves a FlowStation's values by, or None if it solves them by Ts, Ps, and Mach'''
+    if values['Ts'] != -1 and values['Ps'] != -1 and values['Mach'] != -1:
+        return None
+    total = 'Tt' if values['Tt'] != -1 else 'ht' if values['ht'] != -1 else 's'
+    spec = 'Mach' if values['Mach'] > 0 else 'area' if values['area'] != -1 else 'Ps' if values['Ps'] != -1 else None
+    return total, spec
+
+def component_solve(solve_nonlinear):
+    '''Decorator for the solve_nonlinear of a CycleComponent. It hands solve_nonlinear params and unknowns keyed per FlowStation variable whatever the layout (see compact_flows), and with skip_unchanged, restores the outputs of the last run instead of running it again if every param is within skip_rtol of its value then. Solver iterations often run a component again when only a loop downstream of it has changed, and the component has no other inputs than its params and the design state, which set_design_state() invalidates the last run for. Anything else that changes the result without changing a param (e.g. a new compressor map) needs a call to invalidate(); changes of the module-level flowstation settings (set_mechanism(), set_property_table(), set_fast_mach_statics()) are part of the key.'''
+    @wraps(solve_nonlinear)
+    def wrapper(self, params, unknowns, resids):
+        own_vars = params is self.params and unknowns is self.unknowns
+        key = self._params_key() if self.skip_unchanged and own_vars else None
+        if key is not None and self._last_run is not None and self._last_run[0] == key:
+            self.skip_stats['skipped'] += 1
+            for name, value in self._last_run[1]:
+                unknowns[name] = value
+            return
+        if self._compact_stations and own_vars:
+            params, unknowns = self._station_vars()
+        solve_nonlinear(self, params, unknowns, resids)
+        self.skip_stats['evaluations'] += 1
+        if key is not None:
+            self._last_run = (key, [(name, np.copy(self.unknowns[name]) if isinstance(self.unknowns[name], np.ndarray) else self.unknowns[name]) for name in self.unknowns.keys()])
+    wrapper.component_solve = True
+    return wrapper
+
 class CycleComponent(Component): 
+    '''Base of the cycle components. Their solve_nonlinear must be decorated with component_solve for compact_flows and skip_unchanged to work.'''
+    warm_start = True # start static solves from the station's last converged static pressure ratio
+    fd_partials = False # take every partial derivative in linearize by finite differences of the whole component, instead of from _partials()
+    fd_step = 1e-5 # relative step of the finite differences, well above the noise of the equilibrium solves: of the equilibrium state partials behind _partials(), and of the inputs in _fd_partials()
+    discrete_params = () # float params that select a case rather than vary continuously, which _fd_partials() leaves out
+    optional_params = () # params that are unset at -1.0, which _fd_partials() leaves out while they are unset
+    compact_flows = False # store each FlowStation as one vector param and output, laid out as FLOW_VAR_NAMES, instead of one per variable; must be set before the component is created
+    skip_unchanged = False # reuse the previous outputs when the params are unchanged since the last run, see component_solve
+    skip_rtol = 1e-12 # relative tolerance within which params count as unchanged
+
     def __init__(self): 
         super(CycleComponent, self).__init__()
         self.add_param('design', False, desc='flag to indicate that the calculations are design conditions')
+        self._warm_starts = {} # FlowStation name -> Ps / Pt of its last converged static solve
+        self._cold_iterations = {} # (FlowStation name, 'Mach' or 'area') -> static evaluations of its last cold solve
+        self.warm_start_stats = {'cold_solves': 0, 'warm_solves': 0, 'iterations': 0, 'saved': 0}
+        self._stations = {} # FlowStation name -> its _StationNames
+        self._passed_through = set() # FlowStations whose last solve copied their params, being fully specified already (e.g. connected)
+        self._solve_modes = {} # FlowStation name -> (total, spec) of its last solve, see _solve_mode()
+        self._compact_stations = [] # names of the FlowStations stored as vectors
+        self._compact_vars = None # (params, unknowns) _CompactVars of the current setup
+        self._last_run = None # (params key, [(output name, value)]) of the last run, with skip_unchanged
+        self.skip_stats = {'evaluations': 0, 'skipped': 0}
+        self.linearize_stats = {'analytic': 0, 'fd': 0}
 
     @staticmethod
     def connect_flows(group, flow1, flow2):
         '''Connects flow variable trees. Both flow1 and flow2 are strings (e.g. 'component.flow_name')'''
-        for var_name in FLOW_VARS:
-            group.connect('%s:out:%s' % (flow1, var_name), '%s:in:%s' % (flow2, var_name))
+        compact1, compact2 = [group.find_subsystem(flow.rsplit('.', 1)[0]).compact_flows for flow in (flow1, flow2)]
+        if compact1 != compact2:
+            raise ValueError('cannot connect %s to %s: only one of them has compact_flows set' % (flow1, flow2))
+        if compact1:
+            group.connect('%s:out' % flow1, '%s:in' % flow2)
+            return
+        names1, names2 = _station_names(flow1), _station_names(flow2)
+        for var_name, output_name in names1.outputs.iteritems():
+            group.connect(output_name, names2.params[var_name])
 
     @staticmethod
     def copy_from(comp1, name1, comp2, name2):
         '''Copies parameters from FlowStation 1 to FlowStation 2'''
-        for var_name in FLOW_VARS:
-            comp2.params['%s:in:%s' % (name2, var_name)] = comp1.params['%s:in:%s' % (name1, var_name)]
+        if comp1.compact_flows and comp2.compact_flows:
+            comp2.params['%s:in' % name2] = comp1.params['%s:in' % name1].copy()
+            return
+        params1 = comp1._station_vars()[0] if comp1.compact_flows else comp1.params
+        params2 = comp2._station_vars()[0] if comp2.compact_flows else comp2.params
+        names1, names2 = _station_names(name1), _station_names(name2)
+        for var_name, param_name in names1.params.iteritems():
+            params2[names2.params[var_name]] = params1[param_name]
+
+    def _station_vars(self):
+        '''params and unknowns keyed per FlowStation variable, whatever the layout'''
+        if not self._compact_stations:
+            return self.params, self.unknowns
+        if self._compact_vars is None or self._compact_vars[1]._wrapper is not self.unknowns: # built again after each setup
+            param_index, unknown_index = {}, {}
+            for name in self._compact_stations:
+                names = self._stations[name]
+                for position, var_name in enumerate(FLOW_VAR_NAMES):
+                    param_index[names.params[var_name]] = ('%s:in' % name, position)
+                    unknown_index[names.outputs[var_name]] = ('%s:out' % name, position)
+            self._compact_vars = (_CompactVars(self.params, param_index), _CompactVars(self.unknowns, unknown_index))
+        return self._compact_vars
 
-    def _clear_unknowns(self, name, unknowns, var_names=FLOW_VARS):
-        '''Reset all of a FlowStation's unknowns to empty (-1.0).'''
+    def _params_key(self):
+        '''Hashable key of the current params, equal for values within skip_rtol, and of the flowstation settings the outputs depend on: the mechanism, property table, and fast Mach statics by their generation, and the static solver tolerances'''
+        key = [flowstation.settings_generation(), flowstation._statics_settings()]
+        for name in self.params.keys():
+            value = self.params[name]
+            if isinstance(value, np.ndarray):
+                key.append(tuple(quantize(float(x), self.skip_rtol) for x in value.flat))
+            else:
+                key.append(quantize(float(value) if isinstance(value, np.floating) else value, self.skip_rtol))
+        return tuple(key)
+
+    def invalidate(self):
+        '''Make the next run evaluate even if the params are unchanged, with skip_unchanged'''
+        self._last_run = None
+
+    def clear_caches(self):
+        '''Forget the warm starts and cached results of earlier runs, so the next run solves from scratch, e.g. to time it. The design state is kept. Components with caches of their own extend this.'''
+        self._warm_starts.clear()
+        self.invalidate()
+
+    def linearize(self, params, unknowns, resids):
+        '''Partial derivatives of the continuous outputs. Components give them analytically in _partials(), built from the partials of their FlowStations (see _flow_partials()). linearize falls back to finite differences of the whole component (see _fd_partials()) with fd_partials set, for components without _partials(), and where _partials() raises NotImplementedError or ValueError, e.g. for a FlowStation solved by Ts, Ps, and Mach, or at a choked area. linearize_stats counts both.'''
+        if self._compact_stations:
+            params, unknowns = self._station_vars()
+        J = None
+        if not self.fd_partials:
+            try:
+                partials = self._partials(params, unknowns)
+            except (NotImplementedError, ValueError):
+                pass
+            else:
+                J = dict(((output, name), value) for output, row in partials.iteritems() for name, value in row.iteritems())
+        if J is None:
+            J = self._fd_partials(params, unknowns, resids)
+            self.linearize_stats['fd'] += 1
+        else:
+            self.linearize_stats['analytic'] += 1
+        return self._compact_jacobian(J) if self._compact_stations else J
+
+    def _partials(self, params, unknowns):
+        '''Partial derivatives of the outputs at the solved state, as a dict of output name -> dict of param name -> derivative, where missing entries are zero. Components without analytic partials raise NotImplementedError.'''
+        raise NotImplementedError('%s has no analytic partials.' % type(self).__name__)
+
+    def _flow_partials(self, name, unknowns, inputs=None, mode=None):
+        '''Partials of a solved FlowStation's outputs in the form of _partials(), from the partials of the variables it was solved from (inputs, a dict of var name -> partials; missing ones are constant). Without inputs, the FlowStation was solved from its own params, or passed through them; as in _fd_partials(), unset (-1.0) variables have no partials. mode is the (total, spec) it was solved by (see _solve_mode()), by default that of its last solve by _solve_flow_vars().'''
+        names = self._stations[name]
+        outputs = names.outputs
+        if inputs is None:
+            set_vars = [var_name for var_name in _CONTINUOUS_VARS if unknowns[outputs[var_name]] != _EMPTY[var_name]]
+            if name in self._passed_through:
+                return dict((outputs[var_name], {names.params[var_name]: 1.0} if var_name in set_vars else {}) for var_name in _CONTINUOUS_VARS)
+            inputs = dict((var_name, {names.params[var_name]: 1.0}) for var_name in set_vars if var_name in _STATION_INPUTS)
+        mode = mode or self._solve_modes.get(name)
+        if mode is None:
+            raise NotImplementedError('%s is not solved from its totals.' % name)
+        out = flowstation.Output(*[unknowns[output_name] for output_name in names.output_fields])
+        partials = flowstation.solve_partials(out, W=unknowns[outputs['W']], total=mode[0], spec=mode[1], FAR=unknowns[outputs['FAR']], WAR=unknowns[outputs['WAR']], fuel=unknowns[outputs['fuel']], inputs=inputs, step=self.fd_step)
+        J = dict((outputs[field], field_partials) for field, field_partials in partials.iteritems())
+        for var_name in ('W', 'FAR', 'WAR'):
+            J[outputs[var_name]] = inputs.get(var_name, {}) if unknowns[outputs[var_name]] != _EMPTY[var_name] else {}
+        return J
+
+    def _fd_partials(self, params, unknowns, resids):
+        '''Partial derivatives by finite differences. The columns come from perturbing the inputs one at a time and re-running solve_nonlinear from the current state, which warm-starts every static solve; the static solves are converged tightly enough for the step. Only the inputs the component actually uses are perturbed: the unset (-1.0) FlowStation params, those a solved FlowStation does not read, discrete_params, and unset optional_params are structurally zero and are left out. The outputs, design state, and warm starts are restored afterwards.'''
+        inputs = self._linearize_inputs(params)
+        discrete = set(names.outputs[var_name] for names in self._stations.itervalues() for var_name in _DISCRETE_VARS)
+        saved = dict((name, unknowns[name]) for name in unknowns.keys())
+        outputs = [name for name, value in saved.iteritems() if name not in discrete and isinstance(value, (float, np.floating))]
+        design_state, warm_starts = self.design_state(), dict(self._warm_starts)
+        J = {}
+        try:
+            with flowstation.statics_rtol(self.fd_step * 1e-6):
+                self.solve_nonlinear(params, unknowns, resids)
+                base = dict((output, unknowns[output]) for output in outputs)
+                for name in inputs:
+                    value = params[name]
+                    step = self.fd_step * (abs(value) or 1.0)
+                    params[name] = value + step
+                    try:
+                        self.solve_nonlinear(params, unknowns, resids)
+                    finally:
+                        params[name] = value
+                    for output in outputs:
+                        J[output, name] = (unknowns[output] - base[output]) / step
+        finally:
+            for name, value in saved.iteritems():
+                unknowns[name] = value
+            self.set_design_state(design_state)
+            self._warm_starts = warm_starts
+        return J
+
+    def _linearize_inputs(self, params):
+        '''The params _fd_partials() perturbs'''
+        station_params = set(param_name for names in self._stations.itervalues() for param_name in names.params.itervalues())
+        inputs = []
+        for name, names in self._stations.iteritems():
+            var_names = _CONTINUOUS_VARS if name in self._passed_through else _STATION_INPUTS
+            inputs.extend(names.params[var_name] for var_name in var_names if params[names.params[var_name]] != _EMPTY[var_name])
+        for name in params.keys():
+            value = params[name]
+            if name in station_params or name in self.discrete_params or not isinstance(value, (float, np.floating)):
+                continue
+            if name in self.optional_params and value == -1.0:
+                continue
+            inputs.append(name)
+        return inputs
+
+    def _compact_jacobian(self, J):
+        '''A Jacobian keyed per FlowStation variable, gathered into blocks of the compact FlowStation vectors'''
+        params, unknowns = self._station_vars()
+        size = len(FLOW_VAR_NAMES)
+        blocks = {}
+        for (output, name), value in J.iteritems():
+            output_vector, row = unknowns._index.get(output, (output, None))
+            param_vector, column = params._index.get(name, (name, None))
+            if row is None and column is None:
+                blocks[output_vector, param_vector] = value
+                continue
+            block = blocks.get((output_vector, param_vector))
+            if block is None:
+                block = blocks[output_vector, param_vector] = np.zeros((size if row is not None else 1, size if column is not None else 1))
+            block[row or 0, column or 0] = value
+        return blocks
+
+    def _clear_unknowns(self, name, unknowns, var_names=None):
+        '''Reset all of a FlowStation's unknowns, or only var_names, to empty (-1.0).'''
+        if var_names is None:
+            for output_name, value in self._stations[name].empty:
+                unknowns[output_name] = value
+            return
+        outputs = self._stations[name].outputs
         for var_name in var_names:
-            unknowns['%s:out:%s' % (name, var_name)] = FLOW_VARS[var_name][1]
+            unknowns[outputs[var_name]] = _EMPTY[var_name]
+
+    def _copy_composition(self, name1, name2, unknowns):
+        '''Carry the fuel-to-air and water-to-air ratios and fuel type of FlowStation 1 over to FlowStation 2'''
+        outputs1, outputs2 = self._stations[name1].outputs, self._stations[name2].outputs
+        for var_name in ('FAR', 'WAR', 'fuel'):
+            unknowns[outputs2[var_name]] = unknowns[outputs1[var_name]]
 
     def _solve_flow_vars(self, name, params, unknowns):
         '''Solve a FlowStation's unknowns based on variables specified as parameters.'''
+        with instrument.scope(self, name):
+            self._solve_station(name, params, unknowns)
+
+    def _solve_station(self, name, params, unknowns):
+        names = self._stations[name]
+        param_names, output_names = names.params, names.outputs
         def var(var_name):
-            param_name = '%s:in:%s' % (name, var_name)
-            output_name = '%s:out:%s' % (name, var_name)
-            assert output_name in unknowns.keys() or param_name in params.keys()
-            if not output_name in unknowns.keys():
-                return params[param_name]
-            if not param_name in params.keys():
-                return unknowns[output_name]
-            return unknowns[output_name] if unknowns[output_name] != FLOW_VARS[var_name][1] else params[param_name]
-        def set_vars(var_dict):
-            for var_name, val in var_dict.iteritems():
-                output_name = '%s:out:%s' % (name, var_name)
-                unknowns[output_name] = val
+            value = unknowns[output_names[var_name]]
+            return value if value != _EMPTY[var_name] else params[param_names[var_name]]
+        values = dict((var_name, var(var_name)) for var_name in _SOLVE_VARS)
         try:
-            out = flowstation.solve(ht=var('ht'), Tt=var('Tt'), Pt=var('Pt'), s=var('s'), hs=var('hs'), Ts=var('Ts'), Ps=var('Ps'), Mach=var('Mach'), area=var('area'), W=var('W'), is_super=var('is_super'))
-            set_vars({'ht': out.ht,
-                      'Tt': out.Tt,
-                      'Pt': out.Pt,
-                      's':  out.s,
-                      'hs': out.hs,
-                      'Ts': out.Ts,
-                      'Ps': out.Ps,
-                      'Mach': out.Mach,
-                      'area': out.area,
-                      'W': var('W'),
-                      'FAR': var('FAR'),
-                      'WAR': var('WAR'),
-                      'Vsonic': out.Vsonic,
-                      'Vflow': out.Vflow,
-                      'rhos': out.rhos,
-                      'rhot': out.rhot,
-                      'gams': out.gams,
-                      'gamt': out.gamt,
-                      'Cp': out.Cp,
-                      'Cv': out.Cv,
-                      'Wc': out.Wc,
-                      'is_super': var('is_super')})
+            # Mach- and area-specified statics are iterative and can be warm started
+            spec = 'Mach' if values['Mach'] > 0 else 'area' if values['area'] != -1 else None
+            PsqPt = self._warm_starts.get(name) if self.warm_start and spec is not None else None
+            evaluations = flowstation.static_evaluations() if spec is not None else 0
+            out = flowstation.solve(Ps_guess=PsqPt * values['Pt'] if PsqPt is not None else -1.0, **values)
+            if spec is not None:
+                self._record_warm_start(name, spec, out, flowstation.static_evaluations() - evaluations, PsqPt is not None)
+            self._set_flow_vars(name, unknowns, out, W=values['W'], FAR=values['FAR'], WAR=values['WAR'], fuel=values['fuel'], is_super=values['is_super'])
+            self._passed_through.discard(name)
+            self._solve_modes[name] = _solve_mode(values)
         except flowstation.ArgumentError:
-            for var_name in FLOW_VARS.keys():
-                set_vars({var_name: var(var_name)})
+            self._passed_through.add(name)
+            self._solve_modes.pop(name, None)
+            for var_name, output_name in output_names.iteritems():
+                unknowns[output_name] = values[var_name] if var_name in values else var(var_name)
     
+    def _set_flow_vars(self, name, unknowns, out, W, FAR, WAR, fuel, is_super):
+        '''Set a FlowStation's unknowns from a flowstation.Output and the variables it does not contain'''
+        names = self._stations[name]
+        for output_name, value in zip(names.output_fields, out):
+            unknowns[output_name] = value
+        outputs = names.outputs
+        unknowns[outputs['W']] = W
+        unknowns[outputs['FAR']] = FAR
+        unknowns[outputs['WAR']] = WAR
+        unknowns[outputs['fuel']] = fuel
+        unknowns[outputs['is_super']] = is_super
+
+    def _record_warm_start(self, name, spec, out, iterations, warm):
+        '''Remember a station's converged static pressure ratio for its next solve, and count the static evaluations saved compared to its last cold solve of the same kind'''
+        stats = self.warm_start_stats
+        stats['iterations'] += iterations
+        if warm:
+            stats['warm_solves'] += 1
+            if (name, spec) in self._cold_iterations:
+                stats['saved'] += self._cold_iterations[name, spec] - iterations
+        else:
+            stats['cold_solves'] += 1
+            self._cold_iterations[name, spec] = iterations
+        if out.Pt > 0 and out.Ps > 0:
+            self._warm_starts[name] = out.Ps / out.Pt
+
+    def design_state(self):
+        '''Values fixed by the last design run that off-design runs depend on, such as design areas: every attribute and output whose name ends in _des'''
+        return {'attributes': dict((name, value) for name, value in self.__dict__.iteritems() if name.endswith('_des')),
+                'unknowns': dict((name, self.unknowns[name]) for name in self.unknowns.keys() if name.endswith('_des'))}
+
+    def set_design_state(self, state):
+        '''Restore a design_state(), e.g. in another process, so off-design runs need no design run first'''
+        self.__dict__.update(state['attributes'])
+        self.invalidate()
+        for name, value in state['unknowns'].iteritems():
+            self.unknowns[name] = value
+
+    def save_design_state(self, filename):
+        '''Write design_state() to a file'''
+        with open(filename, 'wb') as f:
+            cPickle.dump(self.design_state(), f, cPickle.HIGHEST_PROTOCOL)
+
+    def load_design_state(self, filename):
+        '''Restore a design state written by save_design_state(). Set params['design'] to False to run off-design from it.'''
+        with open(filename, 'rb') as f:
+            self.set_design_state(cPickle.load(f))
+
     def _add_flowstation(self, name):
-        '''Add a variable tree representing a FlowStation. Parameters are stored as self.parameters['FLOWSTATION NAME:in:VARIABLE NAME'] and outputs are stored as self.unknowns['FLOWSTATION NAME:out:VARIABLE NAME'].'''
+        '''Add a variable tree representing a FlowStation. Parameters are stored as self.parameters['FLOWSTATION NAME:in:VARIABLE NAME'] and outputs are stored as self.unknowns['FLOWSTATION NAME:out:VARIABLE NAME'], or with compact_flows as the vectors self.parameters['FLOWSTATION NAME:in'] and self.unknowns['FLOWSTATION NAME:out'] (see FlowVector).'''
+        names = self._stations[name] = _station_names(name)
+        if self.compact_flows:
+            if not getattr(self.solve_nonlinear, 'component_solve', False):
+                raise TypeError('%s.solve_nonlinear must be decorated with component_solve to use compact_flows' % type(self).__name__)
+            self._compact_stations.append(name)
+            self.add_param('%s:in' % name, FLOW_DEFAULTS.copy(), desc='FlowStation variables, laid out as FLOW_VAR_NAMES')
+            self.add_output('%s:out' % name, FLOW_DEFAULTS.copy(), desc='FlowStation variables, laid out as FLOW_VAR_NAMES')
+            return
         for var_name, props in FLOW_VARS.iteritems():
-            param_name = '%s:in:%s' % (name, var_name)
-            output_name = '%s:out:%s' % (name, var_name)
+            param_name = names.params[var_name]
+            output_name = names.outputs[var_name]
             if props[2] == '':
                 self.add_param(param_name, props[1], desc=props[0])
                 self.add_output(output_name, props[1], desc=props[0])
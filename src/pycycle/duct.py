@@ -1,4 +1,6 @@
-from pycycle.cycle_component import CycleComponent
+from pycycle import instrument
+from pycycle.flowstation import combine_partials
+from pycycle.cycle_component import CycleComponent, component_solve
 
 class Duct(CycleComponent):
     '''The inlet takes in air at a given flow rate and mach number, and diffuses it down to a slower mach number and larger area'''
@@ -10,10 +12,13 @@ class Duct(CycleComponent):
         self._add_flowstation('flow_in')
         self._add_flowstation('flow_out')
 
+    @component_solve
+    @instrument.component_scope
     def solve_nonlinear(self, params, unknowns, resids):
         self._clear_unknowns('flow_in', unknowns)
         self._clear_unknowns('flow_out', unknowns)
         self._solve_flow_vars('flow_in', params, unknowns)
+        self._copy_composition('flow_in', 'flow_out', unknowns)
         Pt_out = unknowns['flow_in:out:Pt'] * (1.0 - params['dPqP'])
         q = params['Q_dot'] / params['flow_in:in:W']
         unknowns['flow_out:out:ht'] = unknowns['flow_in:out:ht'] + q
@@ -26,3 +31,15 @@ class Duct(CycleComponent):
         else: 
             unknowns['flow_out:out:area'] = self._exit_area_des
             self._solve_flow_vars('flow_out', params, unknowns)
+
+    def _partials(self, params, unknowns):
+        J = self._flow_partials('flow_in', unknowns)
+        W, Q_dot = params['flow_in:in:W'], params['Q_dot']
+        dW = {'flow_in:in:W': 1.0}
+        inputs = {'ht': combine_partials((1.0, J['flow_in:out:ht']), (1.0 / W, {'Q_dot': 1.0}), (-Q_dot / W ** 2, dW)),
+                  'Pt': combine_partials((1.0 - params['dPqP'], J['flow_in:out:Pt']), (-unknowns['flow_in:out:Pt'], {'dPqP': 1.0})),
+                  'W': dW, 'FAR': J['flow_in:out:FAR'], 'WAR': J['flow_in:out:WAR']}
+        if params['design']:
+            inputs['Mach'] = {'MNexit_des': 1.0}
+        J.update(self._flow_partials('flow_out', unknowns, inputs))
+        return J
@@ -1,24 +1,238 @@
-from os.path import dirname, join
+import math
+import threading
+import weakref
+from os.path import dirname, exists, join
 from collections import namedtuple
-from Cantera import *
-from scipy.optimize import newton, brentq, bisect
+from contextlib import contextmanager
+import numpy as np
 
 import pycycle
+from pycycle import instrument
+from pycycle.cache import LRUCache, quantize
 
 GAS_CONSTANT = 0.0685592 # Btu/lbm-R
 
 Output = namedtuple('Output', ['ht', 'Tt', 'Pt', 's', 'hs', 'Ts', 'Ps', 'Mach', 'area', 'Vsonic', 'Vflow', 'rhos', 'rhot', 'gams', 'gamt', 'Cp', 'Cv', 'Wc'])
 
+TOTAL_FIELDS = ('ht', 'Tt', 'Pt', 's', 'rhot', 'gamt', 'Cp', 'Cv', 'Wc') # the Output fields that do not need the statics
+_UNSET_STATICS = dict((name, -1.0) for name in Output._fields if name not in TOTAL_FIELDS)
+
 class ArgumentError(Exception): pass
 
 REACTANT_NAMES = []
 REACTANT_SPLITS =[]
+_REACTANTS_FROZEN = False
 def add_reactant(reactants, splits):
-    '''Add a reactant that can be mixed in'''
+    '''Add a reactant that can be mixed in. Reactants can only be added before the first phase is loaded; from then on they are fixed (see _freeze_reactants()), so every thread and every cached composition sees the same list.'''
+    if _REACTANTS_FROZEN:
+        raise ArgumentError('Reactants cannot be added once flows have been solved.')
     assert len(REACTANT_NAMES) == len(REACTANT_SPLITS)
     assert len(reactants) == len(splits)
     REACTANT_NAMES.append(reactants)
     REACTANT_SPLITS.append(splits)
+    clear_solve_cache() # results from a property table may already be cached
+
+def _freeze_reactants():
+    '''Make the reactant lists immutable tuples'''
+    global REACTANT_NAMES, REACTANT_SPLITS, _REACTANTS_FROZEN
+    with _LOCK:
+        if not _REACTANTS_FROZEN:
+            REACTANT_NAMES = tuple(tuple(names) for names in REACTANT_NAMES)
+            REACTANT_SPLITS = tuple(tuple(splits) for splits in REACTANT_SPLITS)
+            _REACTANTS_FROZEN = True
+
+_DIRECTORY = dirname(pycycle.__file__)
+# gri1000.xml is gri1000.cti precompiled to CTML, which Cantera loads directly. Loading the .cti would convert it on every
+# first phase load, which is slow and writes ct2ctml.log into the working directory. Regenerate the .xml whenever the .cti changes:
+#     python -c "from Cantera import ctml_writer; ctml_writer.convert('gri1000.cti', 'gri1000.xml')"
+_PROP_FILE = join(_DIRECTORY, 'gri1000.xml')
+if not exists(_PROP_FILE):
+    _PROP_FILE = join(_DIRECTORY, 'gri1000.cti')
+_DRY_AIR = (1.0,)
+AIR = 0
+WATER = 1
+FUEL = 3 # the generic CHx hydrocarbon burned by the original burn() checks
+FULL_MECHANISM = 'gri30'
+REDUCED_MECHANISM = 'gri30_cycle' # the reactants and the significant combustion products only, see pycycle.mechanism
+_MECHANISM = FULL_MECHANISM
+_SETTINGS_GENERATION = 0
+def _settings_changed():
+    '''Count a change of a module-level setting that solutions depend on (mechanism, property table, fast Mach statics)'''
+    global _SETTINGS_GENERATION
+    with _LOCK:
+        _SETTINGS_GENERATION += 1
+
+def settings_generation():
+    '''Number of changes to the module-level solver settings so far, for caches of results that depend on them, e.g. CycleComponent.skip_unchanged'''
+    return _SETTINGS_GENERATION
+
+def set_mechanism(phase_id):
+    '''Solve equilibria with a phase of the mechanism file: FULL_MECHANISM (the default, all of GRI-Mech 3.0), or REDUCED_MECHANISM, whose 21 species equilibrate faster (python -m pycycle.mechanism reports the speedup and the differences to the full mechanism). Pooled phases and cached solutions of the previous mechanism are dropped; a property table keeps answering the states it covers.'''
+    global _MECHANISM
+    with _LOCK:
+        _MECHANISM = phase_id
+        del _SPECIES_NAMES[:]
+        _MASS_FRACTIONS.clear()
+        _PHASE_POOL.clear()
+        clear_solve_cache()
+        _settings_changed()
+
+def get_mechanism():
+    return _MECHANISM
+
+_CANTERA = None
+def _cantera():
+    '''The Cantera module, imported on first use so that importing pycycle does not load it'''
+    global _CANTERA
+    if _CANTERA is None:
+        import Cantera
+        _CANTERA = Cantera
+    return _CANTERA
+
+def _gas_constant():
+    '''Universal gas constant, J/(kmol*K)'''
+    return _cantera().GasConstant
+
+def _init_flow():
+    _freeze_reactants()
+    instrument.count('importPhase')
+    return _cantera().importPhase(_PROP_FILE, _MECHANISM)
+
+def composition(species=None, FAR=0.0, WAR=0.0, fuel=FUEL):
+    '''Normalized reactant mass fractions (indexed in add_reactant() order) of a mixture with the given fuel-to-air and water-to-air ratios. species is the composition before any fuel or water is added and defaults to dry air; FAR and WAR are relative to its air content, and negative (unset) ratios count as zero. FAR adds the reactant with index fuel (FUEL if negative). Trailing zero fractions are dropped, so equal mixtures always give equal tuples.'''
+    species = list(species if species is not None else _DRY_AIR)
+    if any(species[len(REACTANT_NAMES):]):
+        raise ArgumentError('Only %d reactants are defined.' % len(REACTANT_NAMES))
+    species = species[:len(REACTANT_NAMES)]
+    species += [0.0] * (len(REACTANT_NAMES) - len(species))
+    air = species[AIR]
+    if WAR > 0:
+        species[WATER] += WAR * air
+    if FAR > 0:
+        species[int(fuel) if fuel >= 0 else FUEL] += FAR * air
+    total = float(sum(species))
+    while species and not species[-1]:
+        species.pop()
+    return tuple(fract / total for fract in species)
+
+_LOCK = threading.RLock() # guards the shared, lazily built state below
+_MASS_FRACTIONS = LRUCache(256) # reactant fractions -> mechanism species mass fractions, of the recently used compositions
+_SPECIES_NAMES = []
+def _mass_fractions(species, flow=None):
+    '''Mass fraction array in mechanism species order for a reactant composition, kept for the recently used compositions'''
+    key = tuple(species)
+    Y = _MASS_FRACTIONS.get(key)
+    if Y is None:
+        with _LOCK:
+            Y = _MASS_FRACTIONS.get(key)
+            if Y is None:
+                if not _SPECIES_NAMES:
+                    _SPECIES_NAMES.extend(flow.speciesNames() if flow is not None else _PHASE_POOL.species_names())
+                assert len(REACTANT_NAMES) == len(REACTANT_SPLITS)
+                Y = np.zeros(len(_SPECIES_NAMES))
+                for names, splits, fract in zip(REACTANT_NAMES, REACTANT_SPLITS, key):
+                    assert len(names) == len(splits)
+                    for name, split in zip(names, splits):
+                        Y[_SPECIES_NAMES.index(name)] += split * fract
+                Y.flags.writeable = False
+                _MASS_FRACTIONS.put(key, Y)
+    return Y
+
+class _IdlePhases(list):
+    '''Idle phases of one thread (a list subclass, so the pool can hold it weakly)'''
+
+class _PhasePool(object):
+    '''Process-wide pool of loaded phases, kept per thread. Loading the mechanism is by far the most expensive part of a solve, so phases are handed back to the pool after use and have their composition set when they are handed out again; any idle phase serves any composition, so a thread only loads as many phases as it uses at once. Each thread's idle phases are thread-local, so a phase is only ever handed out to the thread that loaded it, threads never share a Cantera object, and a thread's phases are freed when it exits.'''
+    def __init__(self):
+        self._local = threading.local()
+        self._all = [] # weak references to the _IdlePhases of every thread, for clear() and stats()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _free(self):
+        '''Idle phases of the calling thread'''
+        try:
+            return self._local.free
+        except AttributeError:
+            free = self._local.free = _IdlePhases()
+            with self._lock:
+                self._all = [ref for ref in self._all if ref() is not None]
+                self._all.append(weakref.ref(free))
+            return free
+
+    def _idle(self):
+        '''The _IdlePhases of the live threads; call with _lock held'''
+        return [free for free in (ref() for ref in self._all) if free is not None]
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def acquire(self, species=_DRY_AIR):
+        '''Get a phase set to the given composition, loading a new one only if none are idle'''
+        free = self._free()
+        self._count(bool(free))
+        flow = free.pop() if free else _init_flow()
+        flow.setMassFractions(_mass_fractions(species, flow)) # equilibrate changes the composition, so always reset it
+        return flow
+
+    def release(self, flow):
+        '''Return a phase obtained from acquire(), from the same thread'''
+        self._free().append(flow)
+
+    def species_names(self):
+        '''Species of the mechanism, in the order of its mass fraction arrays'''
+        free = self._free()
+        if free:
+            return free[-1].speciesNames()
+        flow = _init_flow()
+        self._count(False)
+        free.append(flow) # composition is set when it is handed out
+        return flow.speciesNames()
+
+    def clear(self):
+        '''Drop all idle phases of all threads'''
+        with self._lock:
+            for free in self._idle():
+                del free[:]
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'idle': sum(len(free) for free in self._idle())}
+
+_PHASE_POOL = _PhasePool()
+
+_SOLVE_CACHE = None
+_SOLVE_CACHE_TOL = 1e-12
+_CRITICAL_STATES = LRUCache(256) # sonic statics per unit flow, keyed by totals
+def enable_solve_cache(maxsize=1024, rel_tol=1e-12):
+    '''Memoize solve(). Arguments are rounded to a relative tolerance of rel_tol before lookup, so calls that differ by less than that share a result. The least recently used results are dropped once there are more than maxsize.'''
+    global _SOLVE_CACHE, _SOLVE_CACHE_TOL
+    _SOLVE_CACHE = LRUCache(maxsize)
+    _SOLVE_CACHE_TOL = rel_tol
+
+def disable_solve_cache():
+    global _SOLVE_CACHE
+    _SOLVE_CACHE = None
+
+def clear_solve_cache():
+    '''Forget all memoized solutions, e.g. after the reactants or property backend change'''
+    if _SOLVE_CACHE is not None:
+        _SOLVE_CACHE.clear()
+    _CRITICAL_STATES.clear()
+
+def solve_cache_stats():
+    '''Hits, misses, hit rate, and size of the solve() cache, or None if it is disabled'''
+    return _SOLVE_CACHE.stats() if _SOLVE_CACHE is not None else None
+
 # For right now, all are Air/Fuel 
 add_reactant(['N2', 'O2', 'AR', 'CO2'], [0.755184, 0.231416, 0.012916, 0.000485])
 add_reactant(['H2O'], [1.0])
@@ -27,32 +241,93 @@ add_reactant(['C', 'H'], [0.86144, 0.13856])
 add_reactant(['Jet-A(g)'], [1.0])
 add_reactant(['H2'], [1.0])
 
-_DIRECTORY = dirname(pycycle.__file__)
-_PROP_FILE = join(_DIRECTORY, 'gri1000.cti')
-def _init_flow(species=[1.0, 0, 0, 0, 0, 0, 0, 0]):
-    flow = importPhase(_PROP_FILE)
-    _set_comp(flow, species)
-    return flow
-
-def _set_comp(flow, species):
-    comp_names = []
-    fracts = []
-    assert len(REACTANT_NAMES) == len(REACTANT_SPLITS)
-    for i in range(len(REACTANT_NAMES)):
-        assert len(REACTANT_NAMES[i]) == len(REACTANT_SPLITS[i])
-        for j in range(len(REACTANT_NAMES[i])):
-            name = REACTANT_NAMES[i][j]
-            fract = REACTANT_SPLITS[i][j] * species[i]
-            if fract > 1e-5:
-                if name in comp_names:
-                    fracts[comp_names.index(name)] += fract
-                else:
-                    comp_names.append(name)
-                    fracts.append(fract)
-    temp_comp = ''
-    for i in range(len(comp_names)):
-        temp_comp += '%s:%s ' % (comp_names[i], fracts[i])
-    flow.setMassFractions(temp_comp)
+@contextmanager
+def _phase(species=_DRY_AIR):
+    '''Borrow a phase from the pool for the duration of a with block'''
+    flow = _PHASE_POOL.acquire(species)
+    try:
+        yield flow
+    finally:
+        _PHASE_POOL.release(flow)
+
+def phase_pool_stats():
+    '''Number of phase pool hits, misses (mechanism loads), and currently idle phases'''
+    return _PHASE_POOL.stats()
+
+def preload_phases(count=1, species=_DRY_AIR):
+    '''Load phases into the pool ahead of time, e.g. when a worker process starts, so the first solves do not pay for loading the mechanism'''
+    flows = [_PHASE_POOL.acquire(species) for i in range(count)]
+    for flow in flows:
+        _PHASE_POOL.release(flow)
+
+def clear_phase_pool(reset_stats=False):
+    '''Discard all pooled phases, e.g. after the reactant definitions change'''
+    _PHASE_POOL.clear()
+    if reset_stats:
+        _PHASE_POOL.reset_stats()
+
+# Thermodynamic state in English units: T (degR), h (Btu/lbm), s (Btu/(lbm*R)), rho (lbm/ft**3), Cp and Cv (Btu/(lbm*R)), and MW (kg/kmol)
+State = namedtuple('State', ['T', 'h', 's', 'rho', 'Cp', 'Cv', 'MW'])
+
+_PROPERTY_TABLE = None
+def set_property_table(table):
+    '''Answer equilibrium evaluations from a tabulated backend (e.g. pycycle.property_table.PropertyTable) wherever it covers the requested state. Pass None to always use Cantera.'''
+    global _PROPERTY_TABLE
+    _PROPERTY_TABLE = table
+    clear_solve_cache()
+    _settings_changed()
+
+def get_property_table():
+    return _PROPERTY_TABLE
+
+def _equilibrium(mode, value, P, species=_DRY_AIR):
+    '''Equilibrium state at pressure P (psi) and either temperature (mode 'TP', degR), enthalpy ('HP', Btu/lbm), or entropy ('SP', Btu/(lbm*R))'''
+    if _PROPERTY_TABLE is not None and _PROPERTY_TABLE.species == tuple(species):
+        state = _PROPERTY_TABLE.lookup(mode, value, P)
+        if state is not None:
+            return state
+    return _cantera_equilibrium(mode, value, P, species)
+
+def _cantera_equilibrium(mode, value, P, species=_DRY_AIR):
+    '''Same as _equilibrium(), but always solved by Cantera'''
+    with _phase(species) as flow:
+        if mode == 'TP':
+            flow.set(T=value * 5.0 / 9.0, P=P * 6894.75729)
+        elif mode == 'HP':
+            flow.set(H=value / 0.0004302099943161011, P=P * 6894.75729)
+        else:
+            flow.set(S=value / 0.000238845896627, P=P * 6894.75729)
+        instrument.count('equilibrate', mode)
+        flow.equilibrate(mode)
+        return _phase_state(flow)
+
+def _phase_state(flow):
+    return State(T=flow.temperature() * 9.0 / 5.0,
+                 h=flow.enthalpy_mass() * 0.0004302099943161011,
+                 s=flow.entropy_mass() * 0.000238845896627,
+                 rho=flow.density() * 0.0624,
+                 Cp=flow.cp_mass() * 2.388459e-4,
+                 Cv=flow.cv_mass() * 2.388459e-4,
+                 MW=flow.meanMolecularWeight())
+
+def equilibrium_products(ht, Pt, species, Y_guess=None):
+    '''Equilibrium state of a burning mixture at total enthalpy ht and pressure Pt, and its product mass fractions (in mechanism species order). Y_guess optionally starts the solve from nearby products with the same element totals as species, e.g. earlier products shifted by the change in reactants, instead of from a hot equilibrium of the reactants; it only changes where the solve starts, not its result.'''
+    with _phase(species) as flow:
+        if Y_guess is None:
+            # start from a hot equilibrium to help the HP solve converge from cold reactants
+            flow.set(T=2660.0 * 5.0 / 9.0, P=Pt * 6894.75729)
+            instrument.count('equilibrate', 'TP')
+            flow.equilibrate('TP')
+        else:
+            flow.setMassFractions(Y_guess)
+        flow.set(H=ht / 0.0004302099943161011, P=Pt * 6894.75729)
+        instrument.count('equilibrate', 'HP')
+        flow.equilibrate('HP')
+        return _phase_state(flow), flow.massFractions()
+
+def _sonic_velocity(gam, T, MW):
+    '''Speed of sound (ft/s) from gamma, temperature (degR), and molecular weight'''
+    return math.sqrt(gam * _gas_constant() * T * 5.0 / 9.0 / MW) * 3.28084
 
 #    def set_dry_air(self, params=None):
 #        '''Set the composition to dry air'''
@@ -77,124 +352,632 @@ def _set_comp(flow, species):
 #        self._set_comp()
 #        self.solve_statics(params, unknowns)
         
-def solve(Pt=-1.0, Tt=-1.0, ht=-1.0, s=-1.0, W=0.0, hs=-1.0, Ts=-1.0, Ps=-1.0, Mach=-1.0, area=-1.0, is_super=False):
-    '''Calculate total and static conditions'''
+def solve(Pt=-1.0, Tt=-1.0, ht=-1.0, s=-1.0, W=0.0, hs=-1.0, Ts=-1.0, Ps=-1.0, Mach=-1.0, area=-1.0, is_super=False, Ps_guess=-1.0, species=None, FAR=-1.0, WAR=-1.0, fuel=-1, outputs=None):
+    '''Calculate total and static conditions. The composition is dry air unless species (reactant fractions, see composition()) or FAR or WAR are given; fuel is the index of the fuel reactant, or negative for FUEL. Ps_guess optionally starts the Mach- or area-specified static solve from a known static pressure, e.g. the previous solution of the same station. outputs optionally names the Output fields the caller needs; if they are all in TOTAL_FIELDS, the static solve is skipped and the static fields are left at -1.0.'''
+    if species is not None or FAR > 0 or WAR > 0:
+        species = composition(species, FAR=FAR, WAR=WAR, fuel=fuel)
+    else:
+        species = _DRY_AIR
+    totals_only = outputs is not None and _totals_only(outputs) and not (Ts != -1 and Ps != -1 and Mach != -1)
+    if totals_only:
+        # solved as stagnation totals, which share cache entries with other solves of the same totals
+        Ts = Ps = Mach = area = Ps_guess = -1.0
+        is_super = False
+    if instrument.is_enabled():
+        with instrument.timed(_solver_counts()):
+            out = _cached_solve(Pt=Pt, Tt=Tt, ht=ht, s=s, W=W, hs=hs, Ts=Ts, Ps=Ps, Mach=Mach, area=area, is_super=is_super, Ps_guess=Ps_guess, species=species)
+    else:
+        out = _cached_solve(Pt=Pt, Tt=Tt, ht=ht, s=s, W=W, hs=hs, Ts=Ts, Ps=Ps, Mach=Mach, area=area, is_super=is_super, Ps_guess=Ps_guess, species=species)
+    return out._replace(**_UNSET_STATICS) if totals_only else out
+
+def _totals_only(outputs):
+    '''Whether a solve() of the given outputs can skip the statics'''
+    unknown = [name for name in outputs if name not in Output._fields]
+    if unknown:
+        raise ArgumentError('Unknown outputs: %s' % ', '.join(unknown))
+    return all(name in TOTAL_FIELDS for name in outputs)
+
+def _cached_solve(Pt, Tt, ht, s, W, hs, Ts, Ps, Mach, area, is_super, Ps_guess, species):
+    if _SOLVE_CACHE is None:
+        return _solve(Pt=Pt, Tt=Tt, ht=ht, s=s, W=W, hs=hs, Ts=Ts, Ps=Ps, Mach=Mach, area=area, is_super=is_super, Ps_guess=Ps_guess, species=species)
+    key = tuple(quantize(float(x), _SOLVE_CACHE_TOL) for x in (Pt, Tt, ht, s, W, hs, Ts, Ps, Mach, area)) + (bool(is_super), species, _statics_settings())
+    out = _SOLVE_CACHE.get(key)
+    if out is None:
+        out = _solve(Pt=Pt, Tt=Tt, ht=ht, s=s, W=W, hs=hs, Ts=Ts, Ps=Ps, Mach=Mach, area=area, is_super=is_super, Ps_guess=Ps_guess, species=species)
+        _SOLVE_CACHE.put(key, out)
+    return out
+
+def _solve(Pt=-1.0, Tt=-1.0, ht=-1.0, s=-1.0, W=0.0, hs=-1.0, Ts=-1.0, Ps=-1.0, Mach=-1.0, area=-1.0, is_super=False, Ps_guess=-1.0, species=_DRY_AIR):
     if Ts != -1 and Ps != -1 and Mach != -1:
         if Pt != -1 or Tt != -1 or ht != -1 or s != -1:
             raise ArgumentError('Too many arguments to solve by Ts, Ps, and Mach.')
-        return solve_Ts_Ps_MN(Ts, Ps, Mach, W=W, is_super=is_super)
+        return solve_Ts_Ps_MN(Ts, Ps, Mach, W=W, is_super=is_super, species=species)
     if Pt == -1 or (Tt == -1 and ht == -1 and s == -1):
         raise ArgumentError('Too few arguments to solve by Pt.')
-    flow = _init_flow()
     if Tt != -1:
-        flow.set(T=Tt * 5.0 / 9.0, P=Pt * 6894.75729)
-        flow.equilibrate('TP')
+        state = _equilibrium('TP', Tt, Pt, species)
     elif ht != -1:
-        flow.set(H=ht / 0.0004302099943161011, P=Pt * 6894.75729)
-        flow.equilibrate('HP')
+        state = _equilibrium('HP', ht, Pt, species)
     else:
-        flow.set(S=s / 0.000238845896627, P=Pt * 6894.75729)
-        flow.equilibrate('SP')
-    ht = flow.enthalpy_mass() * 0.0004302099943161011
-    s = flow.entropy_mass() * 0.000238845896627
-    rhot = flow.density() * 0.0624
-    Tt = flow.temperature() * 9.0 / 5.0
-    Cp = flow.cp_mass() * 2.388459e-4
-    Cv = flow.cv_mass() * 2.388459e-4
+        state = _equilibrium('SP', s, Pt, species)
+    return solve_from_totals(state, Pt, W=W, Ts=Ts, Ps=Ps, Mach=Mach, area=area, is_super=is_super, Ps_guess=Ps_guess, species=species)
+
+def solve_from_totals(state, Pt, W=0.0, Ts=-1.0, Ps=-1.0, Mach=-1.0, area=-1.0, is_super=False, Ps_guess=-1.0, species=_DRY_AIR):
+    '''Same as solve(), but with the total state at Pt already known'''
+    ht = state.h
+    s = state.s
+    rhot = state.rho
+    Tt = state.T
+    Cp = state.Cp
+    Cv = state.Cv
     gamt = Cp / Cv
-    out = solve_statics(W=W, Ts=Ts, Ps=Ps, Mach=Mach, area=area, is_super=is_super, ht=ht, Pt=Pt, s=s, rhot=rhot, Tt=Tt, gamt=gamt)
-    Vsonic = out.Vsonic if out.Vsonic != -1 else math.sqrt(out.gams * GasConstant * flow.temperature() / flow.meanMolecularWeight()) * 3.28084
+    with instrument.timed(_solver_counts()): # not counted again when called from solve()
+        out = solve_statics(W=W, Ts=Ts, Ps=Ps, Mach=Mach, area=area, is_super=is_super, ht=ht, Pt=Pt, s=s, rhot=rhot, Tt=Tt, gamt=gamt, Ps_guess=Ps_guess, species=species)
+    Vsonic = out.Vsonic if out.Vsonic != -1 else _sonic_velocity(out.gams, Tt, state.MW)
     return Output(ht=ht, Tt=Tt, Pt=Pt, s=s, hs=out.hs, Ts=out.Ts, Ps=out.Ps, Mach=out.Mach, area=out.area, Vsonic=Vsonic, Vflow=out.Vflow, rhos=out.rhos, rhot=rhot, gams=out.gams, gamt=gamt, Cp=Cp, Cv=Cv, Wc=out.Wc) 
 
-# TODO implement self.burn()
-#    def burn(self, params, unknowns, fuel, Wfuel, hfuel):
-#        '''Burn a fuel with this station'''
-#        W_1 = params['W']
-#        params['W'] = W_1 + Wfuel 
-#        for i in range(0, len(self._species)):
-#            if (fuel - 1) == i:
-#                self._species[i] = (W_1 * self._species[i] + Wfuel) / params['W']
-#            else:
-#                self._species[i] = (W_1 * self._species[i]) / params['W']
-#        unknowns['ht'] = (W_1 * (unknowns['ht'] if unknowns['ht'] else params['ht']) + Wfuel * hfuel) / params['W']
-#        air1 = W_1 * (1.0 / (1.0 + params['FAR'] + params['WAR']))
-#        params['FAR'] = (air1 * FAR + Wfuel) / air1
-#        self._set_comp(unknowns)
-#        self._flow.set(T=2660 * 5 / 9, P=params['Pt'] * 6894.75729)
-#        self._flow.equilibrate('TP')
-#        self._flow.set(H=unknowns['ht'] / 0.0004302099943161011, P=params['Pt'] * 6894.75729)
-#        data._flow.equilibrate('HP')
-#        unknowns['Tt']   = self._flow.temperature() * 9.0 / 5.0
-#        unknowns['s']    = self._flow.entropy_mass() * 0.000238845896627
-#        unknowns['rhot'] = self._flow.density() * 0.0624
-#        unknowns['gamt'] = self._flow.cp_mass() / self._flow.cv_mass()
-
-def solve_statics_Mach(Mach, Pt, gamt, ht, s, Tt, W):
+def isentropic_h(s, Pt, species=None, FAR=-1.0, WAR=-1.0, fuel=-1):
+    '''Enthalpy (Btu/lbm) at entropy s and pressure Pt, e.g. the ideal exit enthalpy of a compression or expansion to Pt. Same as solve(s=s, Pt=Pt, ...).ht, but only evaluates the equilibrium state. The composition arguments are those of solve().'''
+    if species is not None or FAR > 0 or WAR > 0:
+        species = composition(species, FAR=FAR, WAR=WAR, fuel=fuel)
+    else:
+        species = _DRY_AIR
+    return _equilibrium('SP', s, Pt, species).h
+
+def burn(W, ht, Wfuel, hfuel, FAR=-1.0, WAR=-1.0):
+    '''Mix a fuel flow Wfuel with enthalpy hfuel into a flow W with total enthalpy ht and ratios FAR and WAR. Returns the flow, total enthalpy, and fuel-to-air ratio of the mixture.'''
+    air = W / (1.0 + max(FAR, 0.0) + max(WAR, 0.0))
+    W_out = W + Wfuel
+    return W_out, (W * ht + Wfuel * hfuel) / W_out, max(FAR, 0.0) + Wfuel / air
+
+_SOLVER_STAT_NAMES = ('evaluations', 'newton', 'fast_mach', 'bracket', 'warm')
+_THREAD_STATS = threading.local()
+_ALL_STATS = [] # the counters of every thread that has solved, including finished ones
+def _solver_counts():
+    '''The calling thread's solver counters. Each thread only increments its own, so the counts need no lock.'''
+    try:
+        return _THREAD_STATS.counts
+    except AttributeError:
+        counts = _THREAD_STATS.counts = dict.fromkeys(_SOLVER_STAT_NAMES, 0)
+        with _LOCK:
+            _ALL_STATS.append(counts)
+        return counts
+
+def solver_stats():
+    '''Number of exact static evaluations (solve_statics_Ps calls), and how many of them were made by each static solver ('newton', 'fast_mach', 'bracket', and 'warm'), over all threads, plus critical state cache hits and misses'''
+    with _LOCK:
+        stats = dict((name, sum(counts[name] for counts in _ALL_STATS)) for name in _SOLVER_STAT_NAMES)
+    critical = _CRITICAL_STATES.stats()
+    stats['critical_hits'] = critical['hits']
+    stats['critical_misses'] = critical['misses']
+    return stats
+
+def static_evaluations():
+    '''Number of exact static evaluations so far; a cheap solver_stats()['evaluations']'''
+    with _LOCK:
+        return sum(counts['evaluations'] for counts in _ALL_STATS)
+
+def reset_solver_stats():
+    with _LOCK:
+        for counts in _ALL_STATS:
+            for name in _SOLVER_STAT_NAMES:
+                counts[name] = 0
+    _CRITICAL_STATES.reset_stats()
+
+_FAST_MACH = False
+_FAST_MACH_TOL = 1e-6
+def set_fast_mach_statics(enabled=True, tol=1e-6):
+    '''Solve Mach-specified statics with a model-based guess polished by one or two exact evaluations, instead of a full Newton iteration. The returned Mach number is within a relative tolerance of tol of the specified one (the Newton solution), which keeps Ps within about 1.5 * tol for subsonic and 3 * tol for Mach numbers up to 2.'''
+    global _FAST_MACH, _FAST_MACH_TOL
+    _FAST_MACH = enabled
+    _FAST_MACH_TOL = tol
+    _settings_changed()
+
+def _statics_settings():
+    '''The solver settings a static solve depends on, as part of a cache key'''
+    return (_FAST_MACH and _FAST_MACH_TOL, _warm_rtol())
+
+def solve_statics_Mach(Mach, Pt, gamt, ht, s, Tt, W, fast=None, Ps_guess=-1.0, species=_DRY_AIR):
     '''Calculate the statics based on Mach'''
+    if 0.0 < Ps_guess < Pt:
+        out = _warm_statics('Mach', Mach, Ps_guess, Pt=Pt, s=s, Tt=Tt, ht=ht, W=W, species=species)
+        if out is not None:
+            return out
+    Ps_guess = _isentropic_Ps(Mach, Pt, gamt)
+    if fast if fast is not None else _FAST_MACH:
+        return _solve_statics_Mach_fast(Mach, Pt, gamt, ht, s, Tt, W, Ps_guess, species)
+    from scipy.optimize import newton
     out = [None] # Makes out[0] a reference
     def f(Ps):
-        out[0] = solve_statics_Ps(Ps=Ps, s=s, Tt=Tt, ht=ht, W=W)
+        _solver_counts()['newton'] += 1
+        out[0] = solve_statics_Ps(Ps=Ps, s=s, Tt=Tt, ht=ht, W=W, species=species)
         return out[0].Mach - Mach
-    Ps_guess = Pt * (1.0 + (gamt - 1.0) / 2.0 * Mach ** 2) ** (gamt / (1.0 - gamt))
     newton(f, Ps_guess)
     return out[0]
 
-def solve_statics_Ps(Ps, s, Tt, ht, W):
+_WARM_RTOL = threading.local() # per thread, so one thread's finite differences do not change another's solves
+def _warm_rtol():
+    return getattr(_WARM_RTOL, 'rtol', None)
+
+@contextmanager
+def statics_rtol(rtol):
+    '''Converge warm-started static solves to a tolerance of rtol * Pt on Ps, instead of the default 1.48e-8 psi, inside the with block, in the calling thread. Finite differences need this when the step is not much larger than the default tolerance.'''
+    previous, _WARM_RTOL.rtol = _warm_rtol(), rtol
+    try:
+        yield
+    finally:
+        _WARM_RTOL.rtol = previous
+
+def _warm_statics(name, value, Ps_guess, Pt, s, Tt, ht, W, tol=1.48e-8, maxiter=8, species=_DRY_AIR):
+    '''Statics where the field name ('Mach' or 'area') equals value, by a secant iteration from a guess that is expected to be close, e.g. a previous solution. Returns None if the iteration fails, so the caller can fall back to its cold start.'''
+    rtol = _warm_rtol()
+    if rtol is not None:
+        tol = rtol * Pt
+    _solver_counts()['warm'] += 2
+    try:
+        out0 = solve_statics_Ps(Ps=Ps_guess, s=s, Tt=Tt, ht=ht, W=W, species=species)
+        Ps1 = Ps_guess * (1.0 + 1e-6)
+        out1 = solve_statics_Ps(Ps=Ps1, s=s, Tt=Tt, ht=ht, W=W, species=species)
+        Ps0, q0, q1 = Ps_guess, getattr(out0, name) - value, getattr(out1, name) - value
+        for i in range(maxiter):
+            Ps = Ps1 - q1 * (Ps1 - Ps0) / (q1 - q0)
+            if abs(Ps - Ps1) < tol:
+                return out1
+            if not 0.0 < Ps < Pt:
+                return None
+            _solver_counts()['warm'] += 1
+            out = solve_statics_Ps(Ps=Ps, s=s, Tt=Tt, ht=ht, W=W, species=species)
+            Ps0, q0, Ps1, q1, out1 = Ps1, q1, Ps, getattr(out, name) - value, out
+    except (ValueError, ZeroDivisionError): # left the physical range, i.e. static enthalpy above total
+        pass
+    return None
+
+def _isentropic_Mach(Ps, Pt, gam):
+    return math.sqrt(2.0 / (gam - 1.0) * ((Pt / Ps) ** ((gam - 1.0) / gam) - 1.0))
+
+def _isentropic_Ps(Mach, Pt, gam):
+    return Pt * (1.0 + (gam - 1.0) / 2.0 * Mach ** 2) ** (gam / (1.0 - gam))
+
+def _solve_statics_Mach_fast(Mach, Pt, gamt, ht, s, Tt, W, Ps0, species=_DRY_AIR):
+    '''Mach-specified statics from a locally linearized gas model. gamma is taken to vary linearly with temperature between the totals and the first exact static state, and the isentropic relations with the mean gamma, offset to pass through that exact state, give the next pressure. A secant step on the exact states polishes it if needed.'''
+    tol = _FAST_MACH_TOL * Mach
+    def statics(Ps):
+        _solver_counts()['fast_mach'] += 1
+        return solve_statics_Ps(Ps=Ps, s=s, Tt=Tt, ht=ht, W=W, species=species)
+    out0 = statics(Ps0)
+    if abs(out0.Mach - Mach) <= tol:
+        return out0
+    gam = (gamt + out0.gams) / 2.0
+    Ps1 = _isentropic_Ps(Mach + _isentropic_Mach(Ps0, Pt, gam) - out0.Mach, Pt, gam)
+    out1 = statics(Ps1)
+    if abs(out1.Mach - Mach) <= tol:
+        return out1
+    Ps2 = Ps1 - (out1.Mach - Mach) * (Ps1 - Ps0) / (out1.Mach - out0.Mach)
+    out2 = statics(Ps2)
+    if abs(out2.Mach - Mach) <= tol:
+        return out2
+    return solve_statics_Mach(Mach, Pt, gamt, ht, s, Tt, W, fast=False, Ps_guess=Ps2, species=species)
+
+def solve_statics_Ps(Ps, s, Tt, ht, W, species=_DRY_AIR):
     '''Calculate the statics based on pressure'''
-    flow = _init_flow()
-    flow.set(S=s / 0.000238845896627, P=Ps * 6894.75729)
-    flow.equilibrate('SP')
-    Ts = flow.temperature() * 9.0 / 5.0
-    rhos = flow.density() * 0.0624
-    gams = flow.cp_mass() / flow.cv_mass()
-    hs = flow.enthalpy_mass() * 0.0004302099943161011
+    _solver_counts()['evaluations'] += 1
+    state = _equilibrium('SP', s, Ps, species)
+    Ts = state.T
+    rhos = state.rho
+    gams = state.Cp / state.Cv
+    hs = state.h
     Vflow = math.sqrt((778.169 * 32.1740 * 2 * (ht - hs))) # 778.169 lbf / J; 32.1740 ft/s^2 = g
-    Vsonic = math.sqrt(gams * GasConstant * flow.temperature() / flow.meanMolecularWeight()) * 3.28084
+    Vsonic = _sonic_velocity(gams, Ts, state.MW)
     Mach = Vflow / Vsonic
     area = W / (rhos * Vflow) * 144.0
     return Output(Ps=Ps, Ts=Ts, rhos=rhos, gams=gams, hs=hs, Vflow=Vflow, Vsonic=Vsonic, Mach=Mach, area=area, ht=-1.0, Tt=-1.0, Pt=-1.0, s=-1.0, rhot=-1.0, gamt=-1.0, Cp=-1.0, Cv=-1.0, Wc=-1.0)
 
-def solve_statics_area(area, Pt, gamt, ht, s, Tt, W, is_super):
+_MAX_HALVINGS = 60 # of Ps while bracketing a supersonic area, from the isentropic guess down to about 1e-18 of it
+def solve_statics_area(area, Pt, gamt, ht, s, Tt, W, is_super, Ps_guess=-1.0, species=_DRY_AIR):
     '''Calculate the statics based on area'''
-    statics_M1 = solve_statics_Mach(Mach=1.0, Pt=Pt, gamt=gamt, ht=ht, s=s, Tt=Tt, W=W)
-    # find the subsonic solution first
+    if W <= 0.0 or area <= 0.0:
+        raise ValueError('Statics by area need a positive flow and area, not W=%s and area=%s.' % (W, area))
+    if 0.0 < Ps_guess < Pt:
+        out = _warm_statics('area', area, Ps_guess, Pt=Pt, s=s, Tt=Tt, ht=ht, W=W, species=species)
+        if out is not None and (out.Mach > 1.0) == is_super:
+            return out
+    statics_M1 = _critical_statics(Pt=Pt, gamt=gamt, ht=ht, s=s, Tt=Tt, W=W, species=species)
+    if abs(statics_M1.area - area) <= 1e-10 * area:
+        return statics_M1 # choked, e.g. an off-design station at its sonic design area
+    if statics_M1.area > area:
+        raise ValueError('Area %s is smaller than the choked area %s.' % (area, statics_M1.area))
     out = [None] # Makes out[0] a reference
     def f(Ps):
-        out[0] = solve_statics_Ps(Ps=Ps, s=s, Tt=Tt, ht=ht, W=W)
+        _solver_counts()['bracket'] += 1
+        out[0] = solve_statics_Ps(Ps=Ps, s=s, Tt=Tt, ht=ht, W=W, species=species)
         return out[0].area - area
-    brentq(f, statics_M1.Ps, Pt - 1e-4)
-    # if you want the supersonic one, just keep going with a little lower initial guess    
-    if is_super:
-        if statics_M1.area == area:
-            return statics_M1
-        Ps_guess = out[0].Ps * out[0].Mach ** 2 * 2 * gamt / (gamt + 1.0)
-        newton(f, Ps_guess) # Ps_guess is extremely close, but solver is slightly more accurate
+    # both branches start from the sonic point, where the area has its minimum, and from an ideal gas guess of the Mach number
+    Mach_guess = _isentropic_area_Mach(area / statics_M1.area, gamt, is_super)
+    Ps_guess = min(_isentropic_Ps(Mach_guess, Pt, gamt), Pt - 1e-4)
+    f_guess = f(Ps_guess)
+    if f_guess > 0.0:
+        Ps_far, f_far = Ps_guess, f_guess
+    elif not is_super:
+        Ps_far = Pt - 1e-4
+        f_far = f(Ps_far)
+    else:
+        # the supersonic area grows without bound as Ps goes to zero
+        Ps_far, f_far = Ps_guess, f_guess
+        for i in range(_MAX_HALVINGS):
+            if f_far > 0.0:
+                break
+            Ps_guess, f_guess = Ps_far, f_far
+            Ps_far *= 0.5
+            f_far = f(Ps_far)
+        else:
+            raise ValueError('No supersonic solution for area %s found down to Ps=%s.' % (area, Ps_far))
+    if f_guess <= 0.0:
+        Ps_near, f_near = Ps_guess, f_guess # the guess is between the sonic point and the solution
+    else:
+        Ps_near, f_near = statics_M1.Ps, statics_M1.area - area
+    _bracketed_root(f, Ps_near, f_near, Ps_far, f_far)
     return out[0]
 
-def solve_statics(Tt=-1.0, Pt=-1.0, Mach=-1.0, area=-1.0, Ps=-1.0, gamt=-1.0, rhot=-1.0, Ts=-1.0, ht=-1.0, s=-1.0, W=0.0, is_super=False):
+def _critical_statics(Pt, gamt, ht, s, Tt, W, species=_DRY_AIR):
+    '''Statics at Mach 1, which only depend on W through the area, so they are cached per unit flow'''
+    key = tuple(quantize(float(x), 1e-12) for x in (Pt, ht, s)) + (tuple(species),)
+    statics = _CRITICAL_STATES.get(key)
+    if statics is None:
+        statics = solve_statics_Mach(Mach=1.0, Pt=Pt, gamt=gamt, ht=ht, s=s, Tt=Tt, W=1.0, species=species)
+        _CRITICAL_STATES.put(key, statics)
+    return statics._replace(area=statics.area * W)
+
+def _isentropic_area_Mach(area_ratio, gam, is_super):
+    '''Mach number with the given ratio of area to sonic area for a perfect gas'''
+    from scipy.optimize import brentq
+    def f(Mach):
+        return (2.0 / (gam + 1.0) * (1.0 + (gam - 1.0) / 2.0 * Mach ** 2)) ** ((gam + 1.0) / (2.0 * (gam - 1.0))) / Mach - area_ratio
+    if area_ratio <= 1.0:
+        return 1.0
+    return brentq(f, 1.0, 100.0) if is_super else brentq(f, 1e-8, 1.0)
+
+def _bracketed_root(f, a, fa, b, fb, xtol=2e-12, rtol=1e-13, maxiter=100):
+    '''Root of f between a and b, given f(a) and f(b) of opposite sign, by the Illinois variant of regula falsi. The last call to f is at the returned root, provided the last call before this one was at b.'''
+    if fa == 0.0:
+        f(a)
+        return a
+    if fb == 0.0:
+        return b
+    if fa * fb > 0.0:
+        raise ValueError('f(a) and f(b) must have different signs')
+    for i in range(maxiter):
+        c = (a * fb - b * fa) / (fb - fa)
+        if not min(a, b) < c < max(a, b):
+            c = (a + b) / 2.0
+        fc = f(c)
+        if fc == 0.0:
+            return c
+        if fc * fb < 0.0:
+            a, fa = b, fb
+        else:
+            fa *= 0.5 # a was kept again, so weight it down to keep the bracket shrinking from both ends
+        b, fb = c, fc
+        if abs(b - a) < xtol + rtol * abs(b):
+            return b
+    raise RuntimeError('Failed to converge after %d iterations, value is %s' % (maxiter, b))
+
+def solve_statics(Tt=-1.0, Pt=-1.0, Mach=-1.0, area=-1.0, Ps=-1.0, gamt=-1.0, rhot=-1.0, Ts=-1.0, ht=-1.0, s=-1.0, W=0.0, is_super=False, Ps_guess=-1.0, species=_DRY_AIR):
     '''Determine which static calc to use'''
     if Tt > 0 and Pt > 0 and W > 0: # if non zero
         Wc = math.sqrt(W * (Tt / 518.67)) / (Pt / 14.696)
     else:
         Wc = -1.0
     if Mach > 0:
-        out = solve_statics_Mach(Mach, Pt=Pt, gamt=gamt, Tt=Tt, ht=ht, s=s, W=W)
+        out = solve_statics_Mach(Mach, Pt=Pt, gamt=gamt, Tt=Tt, ht=ht, s=s, W=W, Ps_guess=Ps_guess, species=species)
     elif area != -1:
-        out = solve_statics_area(area, Pt=Pt, gamt=gamt, ht=ht, s=s, Tt=Tt, W=W, is_super=is_super)
+        out = solve_statics_area(area, Pt=Pt, gamt=gamt, ht=ht, s=s, Tt=Tt, W=W, is_super=is_super, Ps_guess=Ps_guess, species=species)
     elif Ps != -1:
-        out = solve_statics_Ps(Ps, s=s, Tt=Tt, ht=ht, W=W)
+        out = solve_statics_Ps(Ps, s=s, Tt=Tt, ht=ht, W=W, species=species)
     else:
         return Output(Ps=Pt, Ts=Tt, rhos=rhot, gams=gamt, hs=ht, Vflow=0.0, Mach=0.0, area=area, Wc=Wc, Vsonic=-1.0, ht=-1.0, Tt=-1.0, Pt=-1.0, s=-1.0, rhot=-1.0, gamt=gamt, Cp=-1.0, Cv=-1.0)
     return out._replace(Wc=Wc)
 
-def solve_Ts_Ps_MN(Ts, Ps, Mach, gamt=0.0, s=-1.0, W=0.0, is_super=False):
+def solve_Ts_Ps_MN(Ts, Ps, Mach, gamt=0.0, s=-1.0, W=0.0, is_super=False, species=_DRY_AIR):
     '''Set variables based on Ts, Ps, and MN'''
     # do this twice beacause gamt changes
     for n in range(2):
         Tt = Ts * (1.0 + (gamt - 1.0) / 2.0 * Mach ** 2)
         Pt = Ps * (1.0 + (gamt - 1.0) / 2.0 * Mach ** 2) ** (gamt / (gamt - 1.0))
-        totals = solve(Pt=Pt, Tt=Tt, Ts=Ts, s=s, W=W, is_super=is_super)
+        totals = solve(Pt=Pt, Tt=Tt, Ts=Ts, s=s, W=W, is_super=is_super, species=species)
         gamt = totals.gamt
-    statics = solve_statics_Mach(Mach, Pt=Pt, gamt=gamt, Tt=Tt, s=totals.s, W=W, ht=totals.ht)
+    statics = solve_statics_Mach(Mach, Pt=Pt, gamt=gamt, Tt=Tt, s=totals.s, W=W, ht=totals.ht, species=species)
     area = W / (statics.rhos * statics.Vflow) * 144.0
     return Output(ht=totals.ht, Tt=Tt, Pt=Pt, s=totals.s, hs=totals.hs, Ts=Ts, Ps=Ps, Mach=Mach, area=area, Vsonic=statics.Vsonic, Vflow=statics.Vflow, rhos=statics.rhos, rhot=totals.rhot, gams=statics.gams, gamt=totals.gamt, Cp=totals.Cp, Cv=totals.Cv, Wc=totals.Wc)
+
+def combine_partials(*terms):
+    '''Sum of coefficient * partials over (coefficient, partials) terms, where partials maps variable names to derivatives (missing ones are zero)'''
+    total = {}
+    for coefficient, partials in terms:
+        for name, value in partials.iteritems():
+            total[name] = total.get(name, 0.0) + coefficient * value
+    return total
+
+def _state_partials(T, P, FAR=-1.0, WAR=-1.0, fuel=-1, step=1e-5):
+    '''The equilibrium State at temperature T and pressure P, and the partials of its fields with respect to T, P, and whichever of FAR and WAR are set (not negative), as a dict of field -> partials. Equilibrium solves have no sensitivities of their own, so each column is a forward step of relative size step (absolute for the ratios), one evaluation each.'''
+    state = _equilibrium('TP', T, P, composition(FAR=FAR, WAR=WAR, fuel=fuel))
+    columns = [('T', T * step, _equilibrium('TP', T * (1.0 + step), P, composition(FAR=FAR, WAR=WAR, fuel=fuel))),
+               ('P', P * step, _equilibrium('TP', T, P * (1.0 + step), composition(FAR=FAR, WAR=WAR, fuel=fuel)))]
+    if FAR >= 0.0:
+        columns.append(('FAR', step, _equilibrium('TP', T, P, composition(FAR=FAR + step, WAR=WAR, fuel=fuel))))
+    if WAR >= 0.0:
+        columns.append(('WAR', step, _equilibrium('TP', T, P, composition(FAR=FAR, WAR=WAR + step, fuel=fuel))))
+    return state, dict((field, dict((name, (getattr(stepped, field) - getattr(state, field)) / h) for name, h, stepped in columns)) for field in State._fields)
+
+def _state_differentials(partials, dT, dP):
+    '''Partials of every State field, from those of T and P and the partials of the state (see _state_partials())'''
+    return dict((field, combine_partials((columns['T'], dT), (columns['P'], dP), *[(value, {name: 1.0}) for name, value in columns.iteritems() if name not in ('T', 'P')])) for field, columns in partials.iteritems())
+
+def _temperature_differential(partials, field, dvalue, dP):
+    '''Partials of the temperature of a state given by the State field (e.g. 'h' or 's') and pressure, from those of the field and of P'''
+    columns = partials[field]
+    return combine_partials((1.0 / columns['T'], dvalue), (-columns['P'] / columns['T'], dP), *[(-value / columns['T'], {name: 1.0}) for name, value in columns.iteritems() if name not in ('T', 'P')])
+
+def _sonic_differential(Vsonic, gam, T, MW, dgam, dT, dMW):
+    '''Partials of _sonic_velocity() from those of its arguments'''
+    return combine_partials((0.5 * Vsonic / gam, dgam), (0.5 * Vsonic / T, dT), (-0.5 * Vsonic / MW, dMW))
+
+def _chain(partials, inputs):
+    '''Partials with respect to whatever inputs (a dict of variable name -> partials) are taken with respect to'''
+    return combine_partials(*[(value, inputs.get(name, {})) for name, value in partials.iteritems()])
+
+def solve_partials(out, W=0.0, total='Tt', spec=None, FAR=-1.0, WAR=-1.0, fuel=-1, inputs=None, step=1e-5):
+    '''Partial derivatives of an Output of solve() with respect to the arguments it was solved from: Pt, the total given (total, 'Tt', 'ht', or 's'), W, the static spec ('Mach', 'area', 'Ps', or None for none), and whichever of FAR and WAR are set. Returns a dict of Output field -> dict of argument -> derivative, where missing arguments have no effect; inputs optionally maps the arguments to their own partials (e.g. with respect to a component's params), which the result is then taken with respect to instead. Only the partials of the equilibrium states at the totals and statics are evaluated numerically (see _state_partials()). The totals follow from them directly, and the statics by the isentropic relations at the solved state, where Ps is eliminated through the spec. Raises ValueError where the statics do not depend smoothly on the spec: at zero velocity, or at an area within 0.1% of the choked Mach number.'''
+    total_state, total_partials = _state_partials(out.Tt, out.Pt, FAR, WAR, fuel, step)
+    d = {'Pt': {'Pt': 1.0}}
+    if total == 'Tt':
+        d['Tt'] = {'Tt': 1.0}
+    else:
+        d['Tt'] = _temperature_differential(total_partials, 'h' if total == 'ht' else 's', {total: 1.0}, d['Pt'])
+    dt = _state_differentials(total_partials, d['Tt'], d['Pt'])
+    d.update(ht=dt['h'], s=dt['s'], rhot=dt['rho'], Cp=dt['Cp'], Cv=dt['Cv'])
+    d['gamt'] = combine_partials((1.0 / out.Cv, dt['Cp']), (-out.gamt / out.Cv, dt['Cv']))
+    d['Wc'] = combine_partials((0.5 * out.Wc / W, {'W': 1.0}), (0.5 * out.Wc / out.Tt, d['Tt']), (-out.Wc / out.Pt, d['Pt'])) if out.Wc != -1 else {}
+    if spec is None:
+        d.update(Ps=d['Pt'], Ts=d['Tt'], rhos=d['rhot'], gams=d['gamt'], hs=d['ht'], Vflow={}, Mach={}, area={})
+        d['Vsonic'] = _sonic_differential(out.Vsonic, out.gamt, out.Tt, total_state.MW, d['gamt'], d['Tt'], dt['MW'])
+        return dict((field, _chain(partials, inputs)) for field, partials in d.iteritems()) if inputs is not None else d
+    if out.Vflow <= 0.0:
+        raise ValueError('The statics of a flow at rest have no partials.')
+    # the statics at Ps, which stays a variable until the spec fixes it
+    static_state, static_partials = _state_partials(out.Ts, out.Ps, FAR, WAR, fuel, step)
+    d['Ps'] = {'Ps': 1.0}
+    d['Ts'] = _temperature_differential(static_partials, 's', d['s'], d['Ps'])
+    ds = _state_differentials(static_partials, d['Ts'], d['Ps'])
+    d.update(hs=ds['h'], rhos=ds['rho'])
+    d['gams'] = combine_partials((1.0 / static_state.Cv, ds['Cp']), (-out.gams / static_state.Cv, ds['Cv']))
+    d['Vflow'] = combine_partials((778.169 * 32.1740 / out.Vflow, d['ht']), (-778.169 * 32.1740 / out.Vflow, d['hs']))
+    d['Vsonic'] = _sonic_differential(out.Vsonic, out.gams, out.Ts, static_state.MW, d['gams'], d['Ts'], ds['MW'])
+    d['Mach'] = combine_partials((out.Mach / out.Vflow, d['Vflow']), (-out.Mach / out.Vsonic, d['Vsonic']))
+    d['area'] = combine_partials((out.area / W, {'W': 1.0}), (-out.area / out.rhos, d['rhos']), (-out.area / out.Vflow, d['Vflow']))
+    if spec == 'area' and abs(out.Mach - 1.0) < 1e-3:
+        # the area has its minimum at Mach 1, so the statics are singular in it there, and the partials of the states are too coarse to resolve them close by
+        raise ValueError('The statics at area %s are too close to choked (Mach %s) for partials.' % (out.area, out.Mach))
+    if spec != 'Ps':
+        spec_partials = dict(d[spec])
+        slope = spec_partials.pop('Ps', 0.0)
+        dPs = combine_partials((1.0 / slope, {spec: 1.0}), (-1.0 / slope, spec_partials))
+        for field in ('Ps', 'Ts', 'hs', 'rhos', 'gams', 'Vflow', 'Vsonic', 'Mach', 'area'):
+            partials = dict(d[field])
+            d[field] = combine_partials((1.0, partials), (partials.pop('Ps', 0.0), dPs))
+        d[spec] = {spec: 1.0}
+    return dict((field, _chain(partials, inputs)) for field, partials in d.iteritems()) if inputs is not None else d
+
+def isentropic_h_partials(s, Pt, FAR=-1.0, WAR=-1.0, fuel=-1, inputs=None, step=1e-5):
+    '''isentropic_h() of dry air or of a mixture with the given ratios, and its partial derivatives with respect to s, Pt, and whichever of FAR and WAR are set, or, given inputs, with respect to what they are taken with respect to (see solve_partials())'''
+    state = _equilibrium('SP', s, Pt, composition(FAR=FAR, WAR=WAR, fuel=fuel))
+    partials = _state_partials(state.T, Pt, FAR, WAR, fuel, step)[1]
+    dh = _state_differentials(partials, _temperature_differential(partials, 's', {'s': 1.0}, {'P': 1.0}), {'P': 1.0})['h']
+    dh['Pt'] = dh.pop('P', 0.0)
+    return state.h, _chain(dh, inputs) if inputs is not None else dh
+
+BATCH_DTYPE = np.dtype([(name, 'f8') for name in Output._fields] + [('converged', '?')])
+
+def solve_batch(Pt, Tt=None, ht=None, s=None, W=0.0, Ps=None, Mach=None, area=None, is_super=False, tol=1e-8, maxiter=50, species=None, FAR=-1.0, WAR=-1.0, fuel=-1, outputs=None):
+    '''Vectorized solve() over arrays of conditions. Pt and one of Tt, ht, or s are required, and at most one of Ps, Mach, or area may be given for the statics. All arguments except the composition (species, FAR, and WAR, which are the same for every point) are broadcast against each other. Returns a record array (dtype BATCH_DTYPE) with one record per point, so fields can be read as out.Ps or out['Ps']; points whose static solve did not converge have converged=False and NaN statics. As for solve(), outputs that are all in TOTAL_FIELDS skip the statics, which are then NaN.'''
+    if (Tt is None) + (ht is None) + (s is None) != 2:
+        raise ArgumentError('Exactly one of Tt, ht, or s is needed to solve a batch by Pt.')
+    if (Ps is None) + (Mach is None) + (area is None) < 2:
+        raise ArgumentError('Too many static arguments to solve a batch.')
+    if Tt is not None:
+        mode, value = 'TP', Tt
+    elif ht is not None:
+        mode, value = 'HP', ht
+    else:
+        mode, value = 'SP', s
+    spec = Ps if Ps is not None else Mach if Mach is not None else area if area is not None else 0.0
+    totals_only = outputs is not None and _totals_only(outputs)
+    if totals_only:
+        Ps = Mach = area = None # spec still sets the shape
+    arrays = np.broadcast_arrays(*[np.asarray(x, dtype=float) for x in (Pt, value, W, spec, is_super)])
+    shape = arrays[0].shape
+    Pt, value, W, spec, is_super = [x.ravel() for x in arrays]
+    is_super = is_super.astype(bool)
+    species = composition(species, FAR=FAR, WAR=WAR, fuel=fuel) if species is not None or FAR > 0 or WAR > 0 else _DRY_AIR
+
+    totals = _equilibrium_batch(mode, value, Pt, species)
+    gamt = totals.Cp / totals.Cv
+    out = np.empty(Pt.shape, dtype=BATCH_DTYPE)
+    out['ht'], out['Tt'], out['Pt'], out['s'] = totals.h, totals.T, Pt, totals.s
+    out['rhot'], out['gamt'], out['Cp'], out['Cv'] = totals.rho, gamt, totals.Cp, totals.Cv
+    with np.errstate(invalid='ignore'):
+        out['Wc'] = np.where((totals.T > 0) & (Pt > 0) & (W > 0), np.sqrt(W * (totals.T / 518.67)) / (Pt / 14.696), -1.0)
+    converged = np.ones(Pt.shape, dtype=bool)
+    if Ps is None and Mach is None and area is None:
+        statics = {'Ps': Pt, 'Ts': totals.T, 'rhos': totals.rho, 'gams': gamt, 'hs': totals.h, 'Vflow': np.zeros(Pt.shape), 'Mach': np.zeros(Pt.shape), 'area': -np.ones(Pt.shape),
+                   'Vsonic': np.sqrt(gamt * _gas_constant() * totals.T * 5.0 / 9.0 / totals.MW) * 3.28084}
+    else:
+        if Ps is not None:
+            Ps = spec
+        elif Mach is not None:
+            Ps, converged = _statics_Mach_batch(spec, Pt, gamt, totals.h, totals.s, W, tol, maxiter, species)
+        else:
+            Ps, converged = _statics_area_batch(spec, Pt, gamt, totals.h, totals.s, W, is_super, tol, maxiter, species)
+        statics = _statics_Ps_batch(np.where(converged, Ps, np.nan), totals.h, totals.s, W, species)
+    for name, values in statics.iteritems():
+        out[name] = values
+    if totals_only:
+        for name in _UNSET_STATICS:
+            out[name] = np.nan
+    out['converged'] = converged
+    return out.reshape(shape).view(np.recarray)
+
+def isentropic_h_batch(s, Pt, species=None, FAR=-1.0, WAR=-1.0, fuel=-1):
+    '''Vectorized isentropic_h(), with s and Pt broadcast against each other and one composition for every point'''
+    s, Pt = np.broadcast_arrays(np.asarray(s, dtype=float), np.asarray(Pt, dtype=float))
+    species = composition(species, FAR=FAR, WAR=WAR, fuel=fuel) if species is not None or FAR > 0 or WAR > 0 else _DRY_AIR
+    return _equilibrium_batch('SP', s.ravel(), Pt.ravel(), species).h.reshape(s.shape)
+
+def _solve_point(kwargs):
+    return solve(**kwargs)
+
+_THREAD_POOL = None
+def _thread_pool(threads=None):
+    '''The pool of threads solve_threaded() uses, created on first use and kept, so its threads keep their loaded phases between calls. A different number of threads replaces it.'''
+    global _THREAD_POOL
+    from multiprocessing.pool import ThreadPool
+    with _LOCK:
+        if _THREAD_POOL is not None and (threads is None or threads == _THREAD_POOL._processes):
+            return _THREAD_POOL
+        previous, _THREAD_POOL = _THREAD_POOL, ThreadPool(threads)
+        pool = _THREAD_POOL
+    if previous is not None:
+        previous.close() # its threads finish their points and exit
+    return pool
+
+def close_thread_pool():
+    '''Stop the threads of solve_threaded() once they are done, freeing their phases'''
+    global _THREAD_POOL
+    with _LOCK:
+        pool, _THREAD_POOL = _THREAD_POOL, None
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+def solve_threaded(points, threads=None, executor=None):
+    '''solve() each point (a dict of solve() arguments) in a pool of threads (default one per CPU) and return the Outputs in the order of the points. The pool is kept for later calls (see close_thread_pool()), and each of its threads loads and reuses its own phases. executor is an alternative pool to run in, anything with a map() such as a concurrent.futures.ThreadPoolExecutor, e.g. the caller's own. Threads only run at the same time while Cantera releases the GIL, so for many points solve_batch() or a process pool (see pycycle.sweep) is usually faster; this suits callers that already run in threads.'''
+    if executor is None:
+        executor = _thread_pool(threads)
+    return list(executor.map(_solve_point, points))
+
+def _equilibrium_batch(mode, values, P, species=_DRY_AIR):
+    '''Vectorized _equilibrium() over 1-D arrays. Uses the property table for every point it covers and Cantera for the rest.'''
+    state = State(*[np.empty(values.shape) for name in State._fields])
+    done = np.isnan(values) | np.isnan(P)
+    for prop in state:
+        prop[done] = np.nan
+    if _PROPERTY_TABLE is not None and _PROPERTY_TABLE.species == tuple(species):
+        inside, table_state = _PROPERTY_TABLE.lookup_batch(mode, values, P)
+        inside &= ~done
+        for prop, table_prop in zip(state, table_state):
+            prop[inside] = table_prop[inside]
+        done |= inside
+    for n in np.flatnonzero(~done):
+        for prop, val in zip(state, _cantera_equilibrium(mode, values[n], P[n], species)):
+            prop[n] = val
+    return state
+
+def _statics_Ps_batch(Ps, ht, s, W, species=_DRY_AIR):
+    '''Vectorized solve_statics_Ps(). Returns a dict of arrays.'''
+    state = _equilibrium_batch('SP', s, Ps, species)
+    gams = state.Cp / state.Cv
+    with np.errstate(invalid='ignore', divide='ignore'):
+        Vflow = np.sqrt(778.169 * 32.1740 * 2 * (ht - state.h))
+        Vsonic = np.sqrt(gams * _gas_constant() * state.T * 5.0 / 9.0 / state.MW) * 3.28084
+        area = W / (state.rho * Vflow) * 144.0
+    return {'Ps': Ps, 'Ts': state.T, 'rhos': state.rho, 'gams': gams, 'hs': state.h, 'Vflow': Vflow, 'Vsonic': Vsonic, 'Mach': Vflow / Vsonic, 'area': area}
+
+def _statics_Mach_batch(Mach, Pt, gamt, ht, s, W, tol, maxiter, species=_DRY_AIR):
+    '''Static pressure at each Mach number by a vectorized secant iteration from the isentropic guess. Returns (Ps, converged).'''
+    def f(Ps, n):
+        with np.errstate(invalid='ignore'):
+            return _statics_Ps_batch(Ps, ht[n], s[n], W[n], species)['Mach'] - Mach[n]
+    Ps_guess = Pt * (1.0 + (gamt - 1.0) / 2.0 * Mach ** 2) ** (gamt / (1.0 - gamt))
+    return _secant_batch(f, Ps_guess, tol, maxiter)
+
+def _statics_area_batch(area, Pt, gamt, ht, s, W, is_super, tol, maxiter, species=_DRY_AIR):
+    '''Static pressure at each area on the subsonic or supersonic branch. Returns (Ps, converged).'''
+    Ps_M1, converged = _statics_Mach_batch(np.ones(Pt.shape), Pt, gamt, ht, s, W, tol, maxiter, species)
+    area_M1 = _statics_Ps_batch(Ps_M1, ht, s, W, species)['area']
+    def f(Ps, n):
+        with np.errstate(invalid='ignore'):
+            return _statics_Ps_batch(Ps, ht[n], s[n], W[n], species)['area'] - area[n]
+    # bracket the subsonic root by [Ps(M=1), Pt) and the supersonic one by Ps(M=1) and a pressure low enough to be past the area
+    lo = np.where(is_super, Ps_M1 * 0.5, Ps_M1)
+    hi = np.where(is_super, Ps_M1, Pt - 1e-4)
+    for i in range(maxiter):
+        n = np.flatnonzero(is_super & converged)
+        n = n[f(lo[n], n) < 0.0]
+        if not len(n):
+            break
+        lo[n] *= 0.5
+    Ps, bracket_converged = _bracket_batch(f, lo, hi, tol, maxiter)
+    converged &= bracket_converged & (area >= area_M1 * (1.0 - 1e-12))
+    # exactly sonic
+    sonic = converged & (area == area_M1)
+    Ps[sonic] = Ps_M1[sonic]
+    return Ps, converged
+
+def _secant_batch(f, x0, tol, maxiter):
+    '''Vectorized secant method, started the same way as scipy.optimize.newton. f(x, n) gives the residuals of the points with indices n. Returns (x, converged).'''
+    x0 = x0.copy()
+    x1 = x0 * (1.0 + 1e-4) + np.where(x0 >= 0, 1e-4, -1e-4)
+    n = np.arange(len(x0))
+    q0 = f(x0, n)
+    q1 = f(x1, n)
+    converged = np.zeros(len(x0), dtype=bool)
+    active = ~(np.isnan(q0) | np.isnan(q1))
+    for i in range(maxiter):
+        n = np.flatnonzero(active)
+        if not len(n):
+            break
+        with np.errstate(invalid='ignore', divide='ignore'):
+            x = x1[n] - q1[n] * (x1[n] - x0[n]) / (q1[n] - q0[n])
+        done = np.abs(x - x1[n]) < tol
+        converged[n[done]] = True
+        x1[n[done]] = x[done]
+        failed = ~np.isfinite(x)
+        active[n[done | failed]] = False
+        n, x = n[~done & ~failed], x[~done & ~failed]
+        x0[n], q0[n] = x1[n], q1[n]
+        x1[n] = x
+        q1[n] = f(x, n)
+        active[n[np.isnan(q1[n])]] = False
+    return x1, converged
+
+def _bracket_batch(f, lo, hi, tol, maxiter):
+    '''Vectorized Illinois (modified regula falsi) root finding on brackets [lo, hi] with residuals of opposite sign. Returns (x, converged).'''
+    lo, hi = lo.copy(), hi.copy()
+    n = np.arange(len(lo))
+    f_lo, f_hi = f(lo, n), f(hi, n)
+    x = np.where(np.abs(f_lo) < np.abs(f_hi), lo, hi)
+    with np.errstate(invalid='ignore'):
+        active = f_lo * f_hi < 0.0
+    converged = (f_lo == 0.0) | (f_hi == 0.0)
+    side = np.zeros(len(lo), dtype=int)
+    for i in range(maxiter * 4):
+        n = np.flatnonzero(active)
+        if not len(n):
+            break
+        x_n = (lo[n] * f_hi[n] - hi[n] * f_lo[n]) / (f_hi[n] - f_lo[n])
+        f_x = f(x_n, n)
+        step = np.abs(x_n - x[n])
+        x[n] = x_n
+        # replace the bracket end with the same sign, and halve the other end's residual if it was also kept last time
+        same_as_lo = f_x * f_lo[n] > 0.0
+        m = n[same_as_lo]
+        lo[m], f_lo[m] = x_n[same_as_lo], f_x[same_as_lo]
+        f_hi[m[side[m] == -1]] *= 0.5
+        side[m] = -1
+        m = n[~same_as_lo]
+        hi[m], f_hi[m] = x_n[~same_as_lo], f_x[~same_as_lo]
+        f_lo[m[side[m] == 1]] *= 0.5
+        side[m] = 1
+        done = (f_x == 0.0) | (step < tol) | (np.abs(hi[n] - lo[n]) < tol)
+        converged[n[done]] = True
+        active[n[done | np.isnan(f_x)]] = False
+    return x, converged
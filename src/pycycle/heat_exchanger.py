@@ -15,8 +15,9 @@ NTU (effectiveness) Method
 
 import math
 
-from scipy.optimize import newton
-from pycycle.cycle_component import CycleComponent
+from pycycle import instrument
+from pycycle.flowstation import combine_partials
+from pycycle.cycle_component import CycleComponent, component_solve
 
 class HeatExchanger(CycleComponent):
     '''Calculates output temperatures for water and air, and heat transfer, for a given water flow rate for a water-to-air heat exchanger'''
@@ -38,10 +39,14 @@ class HeatExchanger(CycleComponent):
         self.add_output('Qmax', 0.0, desc='theoretical maximum possible heat transfer', units='hp')
         self._add_flowstation('flow_out')
 
+    @component_solve
+    @instrument.component_scope
     def solve_nonlinear(self, params, unknowns, resids):
+        from scipy.optimize import newton
         self._clear_unknowns('flow_in', unknowns)
         self._clear_unknowns('flow_out', unknowns)
         self._solve_flow_vars('flow_in', params, unknowns)
+        self._copy_composition('flow_in', 'flow_out', unknowns)
         W_cold_Cp_Min = min(params['W_cold'] * params['Cp_cold'], unknowns['flow_in:out:W'] * unknowns['flow_in:out:Cp'])
         unknowns['Qmax'] = W_cold_Cp_Min * (unknowns['flow_in:out:Tt'] - params['T_cold_in']) * 1.4148532 #BTU/s to hp
         T_out_guess = (unknowns['flow_in:out:Tt'] + params['T_cold_in']) / 2.0
@@ -67,3 +72,32 @@ class HeatExchanger(CycleComponent):
         else: 
             unknowns['flow_out:out:area'] = self._exit_area_des
             self._solve_flow_vars('flow_out', params, unknowns)
+
+    def _partials(self, params, unknowns):
+        J = self._flow_partials('flow_in', unknowns)
+        W, Cp, Tt = unknowns['flow_in:out:W'], unknowns['flow_in:out:Cp'], unknowns['flow_in:out:Tt']
+        dTt = J['flow_in:out:Tt']
+        T_hot_out, T_cold_out, T_cold_in = unknowns['T_hot_out'], unknowns['T_cold_out'], params['T_cold_in']
+        dT_cold_in = {'T_cold_in': 1.0}
+        C_hot, dC_hot = W * Cp, combine_partials((Cp, J['flow_in:out:W']), (W, J['flow_in:out:Cp']))
+        C_cold, dC_cold = params['W_cold'] * params['Cp_cold'], {'W_cold': params['Cp_cold'], 'Cp_cold': params['W_cold']}
+        C_min, dC_min = (C_cold, dC_cold) if C_cold <= C_hot else (C_hot, dC_hot)
+        J['Qmax'] = combine_partials(((Tt - T_cold_in) * 1.4148532, dC_min), (C_min * 1.4148532, dTt), (-C_min * 1.4148532, dT_cold_in))
+        J['Qreleased'] = J['Qabsorbed'] = dQ = combine_partials((params['effectiveness'], J['Qmax']), (unknowns['Qmax'], {'effectiveness': 1.0}))
+        J['T_hot_out'] = combine_partials((1.0, dTt), (-1.0 / (C_hot * 1.4148532), dQ), ((Tt - T_hot_out) / C_hot, dC_hot))
+        J['T_cold_out'] = combine_partials((1.0, dT_cold_in), (1.0 / (C_cold * 1.4148532), dQ), (-(T_cold_out - T_cold_in) / C_cold, dC_cold))
+        try:
+            dT = T_hot_out - Tt + T_cold_out - T_cold_in
+            log_ratio = math.log((T_hot_out - T_cold_in) / (Tt - T_cold_out))
+            J['LMTD'] = combine_partials((1.0 / log_ratio, J['T_hot_out']), (-1.0 / log_ratio, dTt), (1.0 / log_ratio, J['T_cold_out']), (-1.0 / log_ratio, dT_cold_in),
+                                         (-dT / log_ratio ** 2 / (T_hot_out - T_cold_in), combine_partials((1.0, J['T_hot_out']), (-1.0, dT_cold_in))),
+                                         (dT / log_ratio ** 2 / (Tt - T_cold_out), combine_partials((1.0, dTt), (-1.0, J['T_cold_out']))))
+        except ZeroDivisionError:
+            pass
+        inputs = {'Tt': J['T_hot_out'],
+                  'Pt': combine_partials((1.0 - params['dPqP'], J['flow_in:out:Pt']), (-unknowns['flow_in:out:Pt'], {'dPqP': 1.0})),
+                  'W': J['flow_in:out:W'], 'FAR': J['flow_in:out:FAR'], 'WAR': J['flow_in:out:WAR']}
+        if params['design']:
+            inputs['Mach'] = {'MNexit_des': 1.0}
+        J.update(self._flow_partials('flow_out', unknowns, inputs))
+        return J
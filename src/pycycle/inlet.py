@@ -1,4 +1,6 @@
-from pycycle.cycle_component import CycleComponent
+from pycycle import instrument
+from pycycle.flowstation import combine_partials
+from pycycle.cycle_component import CycleComponent, component_solve
 
 class Inlet(CycleComponent):
     '''The inlet takes in air at a given flow rate and mach number, and diffuses it down to a slower mach number and larger area'''
@@ -13,10 +15,13 @@ class Inlet(CycleComponent):
         self._add_flowstation('flow_in')
         self._add_flowstation('flow_out')
 
+    @component_solve
+    @instrument.component_scope
     def solve_nonlinear(self, params, unknowns, resids):
         self._clear_unknowns('flow_in', unknowns)
         self._clear_unknowns('flow_out', unknowns)
         self._solve_flow_vars('flow_in', params, unknowns)
+        self._copy_composition('flow_in', 'flow_out', unknowns)
         Pt_out = unknowns['flow_in:out:Pt'] * params['ram_recovery']
         unknowns['flow_out:out:W'] = unknowns['flow_in:out:W']
         unknowns['flow_out:out:Tt'] = unknowns['flow_in:out:Tt']
@@ -30,3 +35,16 @@ class Inlet(CycleComponent):
         else: 
             unknowns['flow_out:out:area'] = self._exit_area_des
             self._solve_flow_vars('flow_out', params, unknowns)
+
+    def _partials(self, params, unknowns):
+        J = self._flow_partials('flow_in', unknowns)
+        dW = J['flow_in:out:W']
+        J['F_ram'] = combine_partials((unknowns['flow_in:out:Vflow'] / 32.174, dW), (unknowns['flow_in:out:W'] / 32.174, J['flow_in:out:Vflow']))
+        inputs = {'Tt': J['flow_in:out:Tt'],
+                  'Pt': combine_partials((params['ram_recovery'], J['flow_in:out:Pt']), (unknowns['flow_in:out:Pt'], {'ram_recovery': 1.0})),
+                  'W': dW, 'FAR': J['flow_in:out:FAR'], 'WAR': J['flow_in:out:WAR']}
+        if params['design']:
+            inputs['Mach'] = {'MNexit_des': 1.0}
+            J['A_capture'] = J['flow_in:out:area']
+        J.update(self._flow_partials('flow_out', unknowns, inputs))
+        return J
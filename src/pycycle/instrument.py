@@ -0,0 +1,171 @@
+'''
+Opt-in instrumentation of the flowstation hot path.
+
+    from pycycle import instrument
+    instrument.enable()
+    problem.run()
+    print instrument.format_report()
+
+While enabled, Cantera phase loads (importPhase), equilibrium solves by mode (TP, HP, SP), static solver iterations by solver, and the number and wall time of flowstation.solve calls are counted. Each count goes to the innermost active scope: the flow station being solved by CycleComponent._solve_flow_vars, or, for solves a component makes directly, the component itself (station None). Anything outside a component is counted under component None.
+
+log() is the switchable channel for diagnostic messages. Messages are kept with the report while instrumentation is enabled, written to the stream passed to enable() if there is one, and dropped otherwise.
+
+Scopes are kept per thread, so solves in other threads (e.g. flowstation.solve_threaded()) count under their own thread's scope, or component None; the counts of all threads go to the same report.
+
+When disabled, which is the default, every hook returns after a single flag check.
+'''
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+_enabled = False
+_stream = None
+_local = threading.local() # per thread: the stack of scopes, and whether a timed solve is running
+_lock = threading.Lock() # guards _records and _messages
+_records = {}
+_messages = []
+
+def _scopes():
+    '''The calling thread's stack of scopes'''
+    try:
+        return _local.scopes
+    except AttributeError:
+        _local.scopes = [(None, None)]
+        return _local.scopes
+
+def enable(stream=None):
+    '''Start counting. Messages from log() are also written to stream, if given.'''
+    global _enabled, _stream
+    _enabled = True
+    _stream = stream
+
+def disable():
+    '''Stop counting. The counts so far are kept until reset().'''
+    global _enabled, _stream
+    _enabled = False
+    _stream = None
+
+def is_enabled():
+    return _enabled
+
+def reset():
+    with _lock:
+        _records.clear()
+        del _messages[:]
+
+def _record():
+    '''The record of the current scope; call with _lock held'''
+    key = _scopes()[-1]
+    record = _records.get(key)
+    if record is None:
+        record = _records[key] = {'solves': 0, 'time': 0.0, 'importPhase': 0, 'equilibrate': {}, 'iterations': {}}
+    return record
+
+def count(name, mode=None, n=1):
+    '''Add n to counter name (e.g. 'importPhase'), or to its sub-counter mode (e.g. 'equilibrate', 'HP'), in the current scope'''
+    if not _enabled:
+        return
+    with _lock:
+        record = _record()
+        if mode is None:
+            record[name] += n
+        else:
+            record[name][mode] = record[name].get(mode, 0) + n
+
+@contextmanager
+def timed(iterations):
+    '''Time a solve and count the change in the dict of solver iteration counters (those of the calling thread) during it, unless it is nested in another timed solve'''
+    if not _enabled or getattr(_local, 'timing', False):
+        yield
+        return
+    before = dict(iterations)
+    _local.timing = True
+    start = time.time()
+    try:
+        yield
+    finally:
+        elapsed = time.time() - start
+        _local.timing = False
+        with _lock:
+            record = _record()
+            record['solves'] += 1
+            record['time'] += elapsed
+            for key, value in iterations.iteritems():
+                if value != before.get(key, 0):
+                    record['iterations'][key] = record['iterations'].get(key, 0) + value - before.get(key, 0)
+
+def _component_name(component):
+    return getattr(component, 'pathname', '') or component.__class__.__name__
+
+@contextmanager
+def scope(component, station=None):
+    '''Attribute counts inside the with block to a component (and one of its flow stations)'''
+    if not _enabled:
+        yield
+        return
+    scopes = _scopes()
+    scopes.append((_component_name(component), station))
+    try:
+        yield
+    finally:
+        scopes.pop()
+
+def component_scope(solve_nonlinear):
+    '''Decorator for a component's solve_nonlinear that attributes the solves it makes directly to the component'''
+    @wraps(solve_nonlinear)
+    def wrapper(self, params, unknowns, resids):
+        if not _enabled:
+            return solve_nonlinear(self, params, unknowns, resids)
+        with scope(self):
+            return solve_nonlinear(self, params, unknowns, resids)
+    return wrapper
+
+def log(message, *args):
+    '''Send a diagnostic message to the instrumentation channel. With args, the message is message % args, formatted only while enabled.'''
+    if not _enabled:
+        return
+    if args:
+        message = message % args
+    component, station = _scopes()[-1]
+    with _lock:
+        _messages.append({'component': component, 'station': station, 'message': message})
+    if _stream is not None:
+        _stream.write('%s\n' % message)
+
+def report():
+    '''Counts per scope, their totals, and the logged messages, as plain dicts and lists'''
+    records = []
+    totals = {'solves': 0, 'time': 0.0, 'importPhase': 0, 'equilibrate': {}, 'iterations': {}}
+    with _lock:
+        for (component, station), record in _records.iteritems():
+            entry = {'component': component, 'station': station}
+            entry.update(record)
+            entry['equilibrate'] = dict(record['equilibrate'])
+            entry['iterations'] = dict(record['iterations'])
+            records.append(entry)
+        messages = list(_messages)
+    records.sort(key=lambda entry: (str(entry['component']), str(entry['station'])))
+    for record in records:
+        for name in ('solves', 'time', 'importPhase'):
+            totals[name] += record[name]
+        for name in ('equilibrate', 'iterations'):
+            for key, value in record[name].iteritems():
+                totals[name][key] = totals[name].get(key, 0) + value
+    return {'records': records, 'totals': totals, 'messages': messages}
+
+def dump(stream):
+    '''Write report() to a stream as JSON'''
+    json.dump(report(), stream, indent=2, sort_keys=True)
+
+def format_report():
+    '''report() as a text table, one line per scope'''
+    data = report()
+    lines = ['%-24s %-12s %7s %10s %6s %18s %s' % ('component', 'station', 'solves', 'time (s)', 'loads', 'equilibrate', 'iterations')]
+    for entry in data['records'] + [dict(data['totals'], component='total', station='')]:
+        equilibrate = ' '.join('%s:%d' % item for item in sorted(entry['equilibrate'].iteritems()))
+        iterations = ' '.join('%s:%d' % item for item in sorted(entry['iterations'].iteritems()))
+        lines.append('%-24s %-12s %7d %10.4f %6d %18s %s' % (entry['component'], entry['station'] if entry['station'] is not None else '-', entry['solves'], entry['time'], entry['importPhase'], equilibrate, iterations))
+    return '\n'.join(lines)
@@ -0,0 +1,85 @@
+'''
+Validation of the reduced mechanism (flowstation.REDUCED_MECHANISM) against the full one (flowstation.FULL_MECHANISM).
+
+    python -m pycycle.mechanism
+
+solves the equilibrium of dry air, humid air, and fuel-air mixtures up to stoichiometric over the temperatures and pressures of a cycle with both mechanisms, and prints the largest difference of each property with the state where it occurs, and the mean time per equilibrium solve of each mechanism. validate() returns the same numbers.
+
+Temperatures are compared between HP solves (as in the burner, see flowstation.equilibrium_products()) at the enthalpy of the full mechanism's state, so 'T' is the error a burner exit temperature would see. h and s are compared as absolute differences (Btu/lbm and Btu/(lbm*R)) since they pass through zero; the other properties as relative differences.
+
+On the default grid, with the gri30_cycle phase of gri1000.xml as generated by the Cantera 2.6 ctml_writer and solved by Cantera 2.6:
+
+              max error  at (T, P, FAR, WAR)
+    T         3.254e-07  (4000.0, 600.0, 0.04, 0.03)
+    h         4.785e-04  (4000.0, 600.0, 0.04, 0.03) (absolute)
+    s         1.290e-07  (4000.0, 600.0, 0.04, 0.03) (absolute)
+    rho       3.392e-08  (4000.0, 600.0, 0.04, 0.03)
+    Cp        2.670e-08  (4000.0, 600.0, 0.02, 0.03)
+    Cv        4.297e-08  (4000.0, 600.0, 0.02, 0.03)
+    MW        3.392e-08  (4000.0, 600.0, 0.04, 0.03)
+    equilibrium solve: 6.336 ms full, 3.320 ms reduced (1.9x faster)
+'''
+
+import itertools
+import time
+
+from pycycle import flowstation
+
+T_RANGE = (400.0, 1000.0, 2000.0, 3000.0, 4000.0) # degR
+P_RANGE = (1.0, 15.0, 100.0, 600.0) # psi
+FAR_RANGE = (0.0, 0.01, 0.02, 0.04, 0.068) # 0.068 is about stoichiometric for FUEL
+WAR_RANGE = (0.0, 0.03)
+ABSOLUTE = ('h', 's')
+
+def _solve_all(mechanism, mode, conditions, values, fuel):
+    '''Equilibrium states of each (T, P, FAR, WAR) condition with a mechanism, solved by mode from values (one per condition), and the mean time per solve'''
+    previous = flowstation.get_mechanism()
+    flowstation.set_mechanism(mechanism)
+    try:
+        def solve():
+            if mode == 'HP':
+                # as in the burner: an HP solve straight from cold fuel-air reactants does not converge at low enthalpies
+                return [flowstation.equilibrium_products(value, P, flowstation.composition(FAR=FAR, WAR=WAR, fuel=fuel))[0] for value, (T, P, FAR, WAR) in zip(values, conditions)]
+            return [flowstation._cantera_equilibrium(mode, value, P, flowstation.composition(FAR=FAR, WAR=WAR, fuel=fuel)) for value, (T, P, FAR, WAR) in zip(values, conditions)]
+        solve() # load the phases, so only equilibrium solves are timed
+        start = time.time()
+        states = solve()
+        return states, (time.time() - start) / len(conditions)
+    finally:
+        flowstation.set_mechanism(previous)
+
+def validate(T_range=T_RANGE, P_range=P_RANGE, FAR_range=FAR_RANGE, WAR_range=WAR_RANGE, fuel=flowstation.FUEL):
+    '''Compare the reduced mechanism with the full one on a grid of conditions. Returns {'errors': largest difference per property, 'worst': (T, P, FAR, WAR) of each, 'time': mean seconds per equilibrium solve per mechanism}.'''
+    conditions = list(itertools.product(T_range, P_range, FAR_range, WAR_range))
+    full, time_full = _solve_all(flowstation.FULL_MECHANISM, 'TP', conditions, [T for T, P, FAR, WAR in conditions], fuel)
+    reduced, time_reduced = _solve_all(flowstation.REDUCED_MECHANISM, 'TP', conditions, [T for T, P, FAR, WAR in conditions], fuel)
+    full_HP = _solve_all(flowstation.FULL_MECHANISM, 'HP', conditions, [state.h for state in full], fuel)[0]
+    reduced_HP = _solve_all(flowstation.REDUCED_MECHANISM, 'HP', conditions, [state.h for state in full], fuel)[0]
+    errors = dict((name, 0.0) for name in flowstation.State._fields)
+    worst = {}
+    for condition, exact, state, exact_HP, state_HP in zip(conditions, full, reduced, full_HP, reduced_HP):
+        for name in flowstation.State._fields:
+            if name == 'T':
+                value, expected = state_HP.T, exact_HP.T
+            else:
+                value, expected = getattr(state, name), getattr(exact, name)
+            error = abs(value - expected)
+            if name not in ABSOLUTE:
+                error /= abs(expected)
+            if error >= errors[name]:
+                errors[name], worst[name] = error, condition
+    return {'errors': errors, 'worst': worst, 'time': {flowstation.FULL_MECHANISM: time_full, flowstation.REDUCED_MECHANISM: time_reduced}}
+
+def report(results=None):
+    '''Text table of validate() results'''
+    results = results if results is not None else validate()
+    lines = ['%-6s %12s  %s' % ('', 'max error', 'at (T, P, FAR, WAR)')]
+    for name in flowstation.State._fields:
+        lines.append('%-6s %12.3e  %s%s' % (name, results['errors'][name], results['worst'].get(name), ' (absolute)' if name in ABSOLUTE else ''))
+    times = results['time']
+    lines.append('equilibrium solve: %.3f ms full, %.3f ms reduced (%.1fx faster)' % (times[flowstation.FULL_MECHANISM] * 1e3, times[flowstation.REDUCED_MECHANISM] * 1e3,
+                                                                                    times[flowstation.FULL_MECHANISM] / times[flowstation.REDUCED_MECHANISM]))
+    return '\n'.join(lines)
+
+if __name__ == '__main__':
+    print report()
@@ -1,10 +1,16 @@
-from pycycle import flowstation
-from pycycle.cycle_component import CycleComponent
+from pycycle import flowstation, instrument
+from pycycle.cache import LRUCache, quantize
+from pycycle.cycle_component import CycleComponent, component_solve
+from pycycle.flowstation import combine_partials
 
 class Nozzle(CycleComponent): 
     '''Calculates the gross thrust for a convergent-divergent nozzle, assuming an ideally expanded exit condition'''
+    boundaries_cache_size = 64 # off-design regime boundaries of recent operating points; 0 solves them every time
+
     def __init__(self):
         super(Nozzle, self).__init__()
+        self._boundaries = LRUCache(self.boundaries_cache_size)
+        self._flows = {} # flowstation.Outputs of the last run that are not FlowStations: 'throat_dmd' (sonic), 'throat', and at design 'exit_ideal'
         self._add_flowstation('flow_in')
         self._add_flowstation('flow_out')
 
@@ -28,16 +34,54 @@ class Nozzle(CycleComponent):
         PsR_recip = (gam + 1.0) / (2.0 * gam * Mach ** 2 - (gam - 1.0)) # reciprocal of static pressure ratio
         return rhoR ** (gam / (gam - 1.0)) * PsR_recip ** (1.0 / (gam - 1.0))
 
+    def _regime_boundaries(self, back_Ps, W, Tt, Pt, Aexit, flow_throat, comp):
+        '''Exit static pressures that bound the off-design regimes: the subsonic solution at the exit area (curve 4), the normal shock at the exit (curve c) with the total pressure behind it, and the supersonic solution (curve 5). They are solved in that order and only as far as back_Ps needs them; the ones not needed are None. Areas only enter statics per unit flow, so the boundaries solved so far are cached by Aexit / W, Tt, Pt, the throat total pressure, composition, and the flowstation solver settings.'''
+        key = tuple(quantize(float(x), 1e-12) for x in (Aexit / W, Tt, Pt, flow_throat.Pt)) + tuple(comp[var_name] for var_name in ('FAR', 'WAR', 'fuel')) + (flowstation.settings_generation(), flowstation._statics_settings())
+        boundaries = self._boundaries.get(key) if self.boundaries_cache_size else None
+        if boundaries is None:
+            boundaries = {}
+            if self.boundaries_cache_size:
+                self._boundaries.put(key, boundaries)
+        if 'subsonic' not in boundaries:
+            boundaries['subsonic'] = flowstation.solve(W=W, Tt=Tt, Pt=Pt, is_super=False, area=Aexit, **comp).Ps
+        Ps_subsonic = boundaries['subsonic']
+        if back_Ps >= Ps_subsonic and Ps_subsonic <= 0.999 * back_Ps:
+            # unchoked, and not within the PERFECTLY_EXPANDED tolerance of the supersonic solution, which is below Ps_subsonic
+            return Ps_subsonic, None, None, None
+        if 'supersonic' not in boundaries:
+            boundaries['supersonic'] = flowstation.solve(W=W, Tt=Tt, Pt=Pt, is_super=True, area=Aexit, **comp)
+        flow_out_supersonic = boundaries['supersonic']
+        if back_Ps >= Ps_subsonic:
+            return Ps_subsonic, None, None, flow_out_supersonic.Ps
+        if 'shock' not in boundaries:
+            Pt_shock = Nozzle.shockPR(flow_out_supersonic.Mach, flow_throat.gams) * flow_throat.Pt
+            boundaries['shock'] = (flowstation.solve(W=W, Tt=flow_throat.Tt, Pt=Pt_shock, is_super=False, area=Aexit, **comp).Ps, Pt_shock)
+        Ps_shock, Pt_shock = boundaries['shock']
+        return Ps_subsonic, Ps_shock, Pt_shock, flow_out_supersonic.Ps
+
+    def clear_caches(self):
+        super(Nozzle, self).clear_caches()
+        self._boundaries.clear()
+
+    def boundaries_stats(self):
+        '''Number of off-design points whose regime boundaries were cached (hits) and solved (misses)'''
+        return self._boundaries.stats()
+
+    @component_solve
+    @instrument.component_scope
     def solve_nonlinear(self, params, unknowns, resids): 
         self._clear_unknowns('flow_in', unknowns)
         self._clear_unknowns('flow_out', unknowns)
         self._solve_flow_vars('flow_in', params, unknowns)
+        self._copy_composition('flow_in', 'flow_out', unknowns)
         Pt_out = (1.0 - params['dPqP']) * unknowns['flow_in:out:Pt']
-        flow_throat = flowstation.solve(Tt=unknowns['flow_in:out:Tt'], Pt=Pt_out, Mach=1.0, W=unknowns['flow_in:out:W'])
+        comp = {var_name: unknowns['flow_in:out:%s' % var_name] for var_name in ('FAR', 'WAR', 'fuel')}
+        flow_throat = flowstation.solve(Tt=unknowns['flow_in:out:Tt'], Pt=Pt_out, Mach=1.0, W=unknowns['flow_in:out:W'], **comp)
         unknowns['Athroat_dmd'] = flow_throat.area
+        self._flows['throat_dmd'] = flow_throat
         unknowns['flow_out:out:W'] = unknowns['flow_in:out:W']
-        flow_exit_ideal = flowstation.solve(W=unknowns['flow_in:out:W'], Tt=unknowns['flow_in:out:Tt'], Pt=Pt_out, Ps=params['back_Ps'])
         if params['design']:
+            flow_exit_ideal = self._flows['exit_ideal'] = flowstation.solve(W=unknowns['flow_in:out:W'], Tt=unknowns['flow_in:out:Tt'], Pt=Pt_out, Ps=params['back_Ps'], **comp)
             unknowns['Athroat_des'] = flow_throat.area
             unknowns['Aexit_des'] = flow_exit_ideal.area
             unknowns['flow_out:out:Tt'] = unknowns['flow_in:out:Tt']
@@ -46,27 +90,21 @@ class Nozzle(CycleComponent):
             self._solve_flow_vars('flow_out', params, unknowns)
             unknowns['switchRegime'] = 'PERFECTLY_EXPANDED'
         else:
-            # subsonic solution, curve 4
-            flow_out_subsonic = flowstation.solve(W=unknowns['flow_out:out:W'], Tt=unknowns['flow_in:out:Tt'], Pt=unknowns['flow_in:out:Pt'], is_super=False, area=unknowns['Aexit_des'])
-            # supersonic solution, curve 5
-            flow_out_supersonic = flowstation.solve(W=unknowns['flow_out:out:W'], Tt=unknowns['flow_in:out:Tt'], Pt=unknowns['flow_in:out:Pt'], is_super=True, area=unknowns['Aexit_des'])
-            # normal shock at nozzle exit, curve c
-            Pt_exit = Nozzle.shockPR(flow_out_supersonic.Mach, flow_throat.gams) * flow_throat.Pt
-            flow_out_shock = flowstation.solve(W=unknowns['flow_out:out:W'], Tt=flow_throat.Tt, Pt=Pt_exit, is_super=False, area=unknowns['Aexit_des'])
-            if params['back_Ps'] >= flow_out_subsonic.Ps:
+            Ps_subsonic, Ps_shock, Pt_shock, Ps_supersonic = self._regime_boundaries(params['back_Ps'], unknowns['flow_in:out:W'], unknowns['flow_in:out:Tt'], unknowns['flow_in:out:Pt'], unknowns['Aexit_des'], flow_throat, comp)
+            if params['back_Ps'] >= Ps_subsonic:
                 # curves 1 to 4
                 unknowns['switchRegime'] = 'UNCHOKED'
-                flow_throat = flowstation.solve(Tt=unknowns['flow_in:out:Tt'], Pt=Pt_out, W=unknowns['flow_in:out:W'], area=unknowns['Athroat_des'])
+                flow_throat = flowstation.solve(Tt=unknowns['flow_in:out:Tt'], Pt=Pt_out, W=unknowns['flow_in:out:W'], area=unknowns['Athroat_des'], **comp)
                 unknowns['flow_out:out:Tt'] = flow_throat.Tt
                 unknowns['flow_out:out:Pt'] = flow_throat.Pt
                 unknowns['flow_out:out:area'] = unknowns['Aexit_des']
-            elif params['back_Ps'] >= flow_out_shock.Ps:
+            elif params['back_Ps'] >= Ps_shock:
                 # between curves 4 and c
                 unknowns['switchRegime'] = 'NORMAL_SHOCK'
                 unknowns['flow_out:out:Tt'] = flow_throat.Tt
-                unknowns['flow_out:out:Pt'] = flow_out_shock.Pt
+                unknowns['flow_out:out:Pt'] = Pt_shock
                 unknowns['flow_out:out:Ps'] = params['back_Ps']
-            elif params['back_Ps'] > flow_out_supersonic.Ps:
+            elif params['back_Ps'] > Ps_supersonic:
                 # between curves c and 5
                 unknowns['switchRegime'] = 'OVEREXPANDED'
                 unknowns['flow_out:out:is_super'] = True
@@ -81,8 +119,9 @@ class Nozzle(CycleComponent):
                 unknowns['flow_out:out:Pt'] = flow_throat.Pt
                 unknowns['flow_out:out:area'] = unknowns['Aexit_des']
             self._solve_flow_vars('flow_out', params, unknowns)
-            if abs(params['back_Ps'] - flow_out_supersonic.Ps) / params['back_Ps'] < 0.001:
+            if Ps_supersonic is not None and abs(params['back_Ps'] - Ps_supersonic) / params['back_Ps'] < 0.001:
                 unknowns['switchRegime'] = 'PERFECTLY_EXPANDED'
+        self._flows['throat'] = flow_throat
         unknowns['Fg'] = unknowns['flow_out:out:W'] * unknowns['flow_out:out:Vflow'] / 32.174 + unknowns['flow_out:out:area'] * (unknowns['flow_out:out:Ps'] - params['back_Ps'])
         unknowns['PR'] = flow_throat.Pt / unknowns['flow_out:out:Ps']
         unknowns['AR'] = unknowns['flow_out:out:area'] / flow_throat.area
@@ -92,3 +131,38 @@ class Nozzle(CycleComponent):
         else:
             unknowns['WqAexit'] = unknowns['flow_in:out:W'] / unknowns['Athroat_des']
             unknowns['WqAexit_dmd'] = unknowns['flow_in:out:W'] / unknowns['Athroat_dmd']
+
+    def _partials(self, params, unknowns):
+        if unknowns['switchRegime'] == 'NORMAL_SHOCK':
+            raise NotImplementedError('The total pressure behind a normal shock has no analytic partials.')
+        J = self._flow_partials('flow_in', unknowns)
+        W, Pt_in, back_Ps = unknowns['flow_in:out:W'], unknowns['flow_in:out:Pt'], params['back_Ps']
+        dW = J['flow_in:out:W']
+        comp = dict((var_name, unknowns['flow_in:out:%s' % var_name]) for var_name in ('FAR', 'WAR', 'fuel'))
+        inputs = {'Tt': J['flow_in:out:Tt'], 'W': dW, 'FAR': J['flow_in:out:FAR'], 'WAR': J['flow_in:out:WAR'],
+                  'Pt': combine_partials((1.0 - params['dPqP'], J['flow_in:out:Pt']), (-Pt_in, {'dPqP': 1.0}))}
+        def partials(name, spec, **spec_inputs):
+            return flowstation.solve_partials(self._flows[name], W=W, total='Tt', spec=spec, inputs=dict(inputs, **spec_inputs), step=self.fd_step, **comp)
+        throat_dmd = throat = partials('throat_dmd', 'Mach')
+        J['Athroat_dmd'] = throat_dmd['area']
+        flow_inputs = dict(inputs) # the exit has the totals of the throat
+        dAthroat_des = {}
+        if params['design']:
+            exit_ideal = partials('exit_ideal', 'Ps', Ps={'back_Ps': 1.0})
+            J['Athroat_des'] = dAthroat_des = throat_dmd['area']
+            J['Aexit_des'] = exit_ideal['area']
+            flow_inputs['Mach'] = exit_ideal['Mach']
+        elif unknowns['switchRegime'] == 'UNCHOKED':
+            throat = partials('throat', 'area')
+        J.update(self._flow_partials('flow_out', unknowns, flow_inputs))
+        Ps, area, Vflow = unknowns['flow_out:out:Ps'], unknowns['flow_out:out:area'], unknowns['flow_out:out:Vflow']
+        J['Fg'] = combine_partials((Vflow / 32.174, J['flow_out:out:W']), (unknowns['flow_out:out:W'] / 32.174, J['flow_out:out:Vflow']), (Ps - back_Ps, J['flow_out:out:area']), (area, J['flow_out:out:Ps']), (-area, {'back_Ps': 1.0}))
+        J['PR'] = combine_partials((1.0 / Ps, throat['Pt']), (-unknowns['PR'] / Ps, J['flow_out:out:Ps']))
+        J['AR'] = combine_partials((1.0 / self._flows['throat'].area, J['flow_out:out:area']), (-unknowns['AR'] / self._flows['throat'].area, throat['area']))
+        if unknowns['switchRegime'] == 'UNCHOKED':
+            J['WqAexit'] = combine_partials((1.0 / back_Ps, dW), (-W / back_Ps ** 2, {'back_Ps': 1.0}))
+            J['WqAexit_dmd'] = combine_partials((1.0 / Ps, dW), (-W / Ps ** 2, J['flow_out:out:Ps']))
+        else:
+            J['WqAexit'] = combine_partials((1.0 / unknowns['Athroat_des'], dW), (-W / unknowns['Athroat_des'] ** 2, dAthroat_des))
+            J['WqAexit_dmd'] = combine_partials((1.0 / unknowns['Athroat_dmd'], dW), (-W / unknowns['Athroat_dmd'] ** 2, J['Athroat_dmd']))
+        return J
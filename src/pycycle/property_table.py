@@ -0,0 +1,143 @@
+'''
+Tabulated thermodynamic properties for a single composition.
+
+A PropertyTable is built once from Cantera equilibrium solves on a dense grid of pressure and temperature. Afterwards, (P, T), (P, h), and (P, s) states inside the grid are answered by interpolation instead of an equilibrium solve:
+
+    table = PropertyTable()
+    flowstation.set_property_table(table)
+
+Properties are interpolated linearly in log(P) and log(T), which keeps entropy nearly linear between grid points. Density is not interpolated, but computed from the ideal gas law with the interpolated molecular weight. For (P, h) and (P, s) states, the temperature is found on the interpolated h(T) or s(T) curve at that pressure, and all other properties are then read at (P, T).
+
+Accuracy: linear interpolation error grows with the square of the grid spacing. When the table is built, every cell is checked against Cantera at its centre and the largest relative errors are stored in PropertyTable.error (keys 'T', 'Cp', 'Cv', 'rho'). 'T' is the temperature recovered from the tabulated h and s, so it also bounds the enthalpy error by roughly Cp * T * error['T']. PropertyTable.max_error is the largest of these and is the documented accuracy bound of the table. States outside the grid return None from lookup(), which makes flowstation fall back to Cantera.
+'''
+
+import math
+
+import numpy as np
+
+from pycycle import flowstation
+from pycycle.flowstation import State
+
+class PropertyTable(object):
+    '''Dense (P, T) table of equilibrium properties for one composition'''
+    def __init__(self, species=flowstation._DRY_AIR, P_range=(0.5, 1000.0), T_range=(300.0, 4000.0), nP=41, nT=371, check=True):
+        self.species = flowstation.composition(species)
+        self.lnP = np.linspace(math.log(P_range[0]), math.log(P_range[1]), nP)
+        self.lnT = np.linspace(math.log(T_range[0]), math.log(T_range[1]), nT)
+        self.T = np.exp(self.lnT)
+        self.h = np.empty((nP, nT))
+        self.s = np.empty((nP, nT))
+        self.Cp = np.empty((nP, nT))
+        self.Cv = np.empty((nP, nT))
+        self.MW = np.empty((nP, nT))
+        for i, lnP in enumerate(self.lnP):
+            P = math.exp(lnP)
+            for j, T in enumerate(self.T):
+                state = flowstation._cantera_equilibrium('TP', T, P, self.species)
+                self.h[i, j] = state.h
+                self.s[i, j] = state.s
+                self.Cp[i, j] = state.Cp
+                self.Cv[i, j] = state.Cv
+                self.MW[i, j] = state.MW
+        self.error = self._check() if check else {}
+        self.max_error = max(self.error.itervalues()) if self.error else float('nan')
+
+    def save(self, filename):
+        '''Store the table in a NumPy .npz file'''
+        np.savez(filename, species=np.array(self.species, dtype=float), lnP=self.lnP, T=self.T, h=self.h, s=self.s, Cp=self.Cp, Cv=self.Cv, MW=self.MW,
+                 error_keys=np.array(sorted(self.error)), error_values=np.array([self.error[key] for key in sorted(self.error)]))
+
+    @classmethod
+    def load(cls, filename):
+        '''Load a table stored by save() without re-running Cantera'''
+        data = np.load(filename)
+        table = cls.__new__(cls)
+        table.species = flowstation.composition(data['species'])
+        for name in ('lnP', 'T', 'h', 's', 'Cp', 'Cv', 'MW'):
+            setattr(table, name, data[name])
+        table.lnT = np.log(table.T)
+        table.error = dict(zip([str(key) for key in data['error_keys']], data['error_values']))
+        table.max_error = max(table.error.itervalues()) if table.error else float('nan')
+        return table
+
+    def covers(self, mode, value, P):
+        '''True if the table can answer the state without falling back to Cantera'''
+        return self._locate(mode, np.atleast_1d(np.asarray(value, dtype=float)), np.atleast_1d(np.asarray(P, dtype=float)))[0].all()
+
+    def lookup(self, mode, value, P):
+        '''State at pressure P (psi) and temperature ('TP'), enthalpy ('HP'), or entropy ('SP'), or None if it is outside the table'''
+        inside, i, w, T = self._locate(mode, np.array([value], dtype=float), np.array([P], dtype=float))
+        if not inside[0]:
+            return None
+        props = self._props(i, w, T, np.array([P], dtype=float))
+        state = State(*[prop[0] for prop in props])
+        # keep the specified property exact rather than interpolated
+        if mode == 'HP':
+            state = state._replace(h=float(value))
+        elif mode == 'SP':
+            state = state._replace(s=float(value))
+        return state
+
+    def lookup_batch(self, mode, values, P):
+        '''Vectorized lookup(). Returns (inside, State of arrays); entries where inside is False are NaN.'''
+        values = np.asarray(values, dtype=float)
+        P = np.broadcast_to(np.asarray(P, dtype=float), values.shape)
+        inside, i, w, T = self._locate(mode, values, P)
+        props = [np.where(inside, prop, np.nan) for prop in self._props(i, w, T, P)]
+        state = State(*props)
+        if mode == 'HP':
+            state = state._replace(h=np.where(inside, values, np.nan))
+        elif mode == 'SP':
+            state = state._replace(s=np.where(inside, values, np.nan))
+        return inside, state
+
+    def _locate(self, mode, values, P):
+        '''Pressure cell index and weight, and temperature, of each state'''
+        lnP = np.log(np.where(P > 0.0, P, np.nan))
+        with np.errstate(invalid='ignore'):
+            inside = (lnP >= self.lnP[0]) & (lnP <= self.lnP[-1])
+        x = np.interp(np.where(inside, lnP, self.lnP[0]), self.lnP, np.arange(len(self.lnP)))
+        i = np.minimum(x.astype(int), len(self.lnP) - 2)
+        w = x - i
+        if mode == 'TP':
+            T = values
+        else:
+            table = self.h if mode == 'HP' else self.s
+            # value along the T grid at this pressure; monotonic increasing in T
+            rows = (1.0 - w)[:, None] * table[i] + w[:, None] * table[i + 1]
+            inside &= (values >= rows[:, 0]) & (values <= rows[:, -1])
+            j = np.clip((rows < values[:, None]).sum(axis=1) - 1, 0, len(self.T) - 2)
+            n = np.arange(len(values))
+            lo, hi = rows[n, j], rows[n, j + 1]
+            T = np.exp(self.lnT[j] + (values - lo) / (hi - lo) * (self.lnT[j + 1] - self.lnT[j]))
+        with np.errstate(invalid='ignore'):
+            inside &= (T >= self.T[0]) & (T <= self.T[-1])
+        return inside, i, w, np.where(inside, T, self.T[0])
+
+    def _props(self, i, w, T, P):
+        '''Bilinear interpolation of all properties at the located states'''
+        y = np.interp(np.log(T), self.lnT, np.arange(len(self.T)))
+        j = np.minimum(y.astype(int), len(self.T) - 2)
+        v = y - j
+        def interp(table):
+            return ((1.0 - w) * ((1.0 - v) * table[i, j] + v * table[i, j + 1]) +
+                    w * ((1.0 - v) * table[i + 1, j] + v * table[i + 1, j + 1]))
+        MW = interp(self.MW)
+        rho = P * 6894.75729 * MW / (flowstation._gas_constant() * T * 5.0 / 9.0) * 0.0624
+        return T, interp(self.h), interp(self.s), rho, interp(self.Cp), interp(self.Cv), MW
+
+    def _check(self):
+        '''Largest relative error of the interpolated properties at the centre of each cell'''
+        error = {'T': 0.0, 'Cp': 0.0, 'Cv': 0.0, 'rho': 0.0}
+        for lnP in 0.5 * (self.lnP[1:] + self.lnP[:-1]):
+            P = math.exp(lnP)
+            for T in np.exp(0.5 * (self.lnT[1:] + self.lnT[:-1])):
+                exact = flowstation._cantera_equilibrium('TP', T, P, self.species)
+                for mode, value in (('TP', T), ('HP', exact.h), ('SP', exact.s)):
+                    state = self.lookup(mode, value, P)
+                    if state is None:
+                        continue
+                    error['T'] = max(error['T'], abs(state.T - T) / T)
+                    for name in ('Cp', 'Cv', 'rho'):
+                        error[name] = max(error[name], abs(getattr(state, name) - getattr(exact, name)) / abs(getattr(exact, name)))
+        return error
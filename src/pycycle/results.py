@@ -0,0 +1,135 @@
+'''
+Columnar storage for the results of many solves.
+
+A list of one flowstation.Output per point costs a tuple and a float object per value, which adds up quickly for large sweeps. A Results holds the same values as one preallocated float array per field, so its memory use is fixed when it is created (9 bytes per field per point with the unset mask, see nbytes):
+
+    results = Results(len(points))
+    for point in points:
+        results.append(flowstation.solve(**point))
+    results['Ps']          # array of static pressures, a view
+    results.to_dataframe() # pandas DataFrame on the same memory
+
+Values that are unset are stored as NaN, so they drop out of NumPy's nan-aware reductions, and a separate mask records them, which mask() and masked() return. In flowstation.Outputs and other sequences of values, and in record arrays such as those of solve_batch(), unset values are -1.0 (as in FlowStation variables) or NaN. In row dicts, unset fields are the ones missing from the dict; their values are taken as they are, -1.0 included, since results of a sweep can legitimately be -1.0. Rows that have not been filled yet are unset as well.
+
+The fields default to those of flowstation.Output but can be any names, e.g. the outputs of a pycycle.sweep.run_sweep(), whose failed points stay unset.
+'''
+
+import numpy as np
+
+from pycycle import flowstation
+
+UNSET = -1.0 # the unset value of flowstation.Output fields
+
+class Results(object):
+    '''Fixed-size table of float results, stored by field'''
+    def __init__(self, size, fields=flowstation.Output._fields):
+        self.fields = tuple(fields)
+        self._columns = dict((name, n) for n, name in enumerate(self.fields))
+        self._data = np.full((len(self.fields), size), np.nan) # one contiguous row per field
+        self._unset = np.ones((len(self.fields), size), dtype=bool) # True for fields missing from a row, and rows not filled yet
+        self._size = 0
+
+    @classmethod
+    def from_outputs(cls, outputs, fields=flowstation.Output._fields):
+        '''Results of a sequence of flowstation.Outputs (or other sequences of values in the order of fields)'''
+        outputs = list(outputs)
+        results = cls(len(outputs), fields)
+        for out in outputs:
+            results.append(out)
+        return results
+
+    @classmethod
+    def from_batch(cls, out):
+        '''Results of a solve_batch() record array, flattened'''
+        out = out.ravel()
+        results = cls(len(out))
+        results.set_rows(0, out)
+        return results
+
+    @classmethod
+    def from_dicts(cls, rows, fields=None):
+        '''Results of a sequence of dicts of field -> value, such as the results of pycycle.sweep.run_sweep(). Fields default to the sorted keys of all rows, except 'error'; fields missing from a row are left unset.'''
+        rows = list(rows)
+        if fields is None:
+            fields = sorted(set(name for row in rows for name in row if name != 'error'))
+        results = cls(len(rows), fields)
+        for row in rows:
+            results.append(row)
+        return results
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def capacity(self):
+        return self._data.shape[1]
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes + self._unset.nbytes
+
+    def append(self, values):
+        '''Fill the next row from a sequence of values in the order of fields, or a dict of field -> value'''
+        if self._size == self.capacity:
+            raise IndexError('Results are full (%d rows).' % self.capacity)
+        self.set_row(self._size, values)
+
+    def set_row(self, index, values):
+        '''Set row index from a sequence of values in the order of fields, whose -1.0 values are unset, or a dict of field -> value, whose missing fields are unset'''
+        if not 0 <= index < self.capacity:
+            raise IndexError('Row %d does not fit in %d.' % (index, self.capacity))
+        column = self._data[:, index]
+        if isinstance(values, dict):
+            unset = [name not in values for name in self.fields]
+            column[:] = [values.get(name, np.nan) for name in self.fields]
+            self._unset[:, index] = unset
+        else:
+            if len(values) != len(self.fields):
+                raise ValueError('Expected %d values (%s), got %d.' % (len(self.fields), ', '.join(self.fields), len(values)))
+            column[:] = values
+            unset = self._unset[:, index]
+            unset[:] = (column == UNSET) | np.isnan(column)
+            column[unset] = np.nan
+        self._size = max(self._size, index + 1)
+
+    def set_rows(self, start, out):
+        '''Set the rows from start on from a record array with (at least) the fields, whose -1.0 and NaN values are unset'''
+        stop = start + len(out)
+        if stop > self.capacity:
+            raise IndexError('Rows %d to %d do not fit in %d.' % (start, stop, self.capacity))
+        block = self._data[:, start:stop]
+        for n, name in enumerate(self.fields):
+            block[n] = out[name]
+        unset = self._unset[:, start:stop]
+        unset[:] = (block == UNSET) | np.isnan(block)
+        block[unset] = np.nan
+        self._size = max(self._size, stop)
+
+    def __getitem__(self, name):
+        '''Values of a field for the filled rows, as a view'''
+        return self._data[self._columns[name], :self._size]
+
+    def row(self, index):
+        '''Values of one row as a dict of field -> value'''
+        if not -self._size <= index < self._size:
+            raise IndexError('Row %d of %d.' % (index, self._size))
+        return dict(zip(self.fields, self._data[:, index % self._size].tolist()))
+
+    def mask(self, name=None):
+        '''True where a field is unset, or without a name, for the rows with no values at all (e.g. failed sweep points)'''
+        if name is not None:
+            return self._unset[self._columns[name], :self._size].copy()
+        return self._unset[:, :self._size].all(axis=0)
+
+    def masked(self, name):
+        '''A field as a masked array with its unset values masked, sharing the memory'''
+        return np.ma.masked_array(self[name], mask=self.mask(name), copy=False)
+
+    def as_array(self):
+        '''All values as a (fields, rows) array, a view'''
+        return self._data[:, :self._size]
+
+    def to_dataframe(self):
+        '''pandas DataFrame with a column per field. The single float block has the same layout as the Results, so pandas does not copy it.'''
+        import pandas
+        return pandas.DataFrame(self.as_array().T, columns=list(self.fields), copy=False)
@@ -1,4 +1,15 @@
-from pycycle.cycle_component import CycleComponent
+from pycycle import instrument
+from pycycle.flowstation import combine_partials
+from pycycle.cycle_component import CycleComponent, component_solve
+
+def _split_partials(comp, params, unknowns, J, dW1, dW2):
+    '''Add the partials of both exits of a splitter to those of its entrance, J, given those of the exit flows'''
+    for n, dW in ((1, dW1), (2, dW2)):
+        name = 'flow_out_%d' % n
+        inputs = {'Tt': J['flow_in:out:Tt'], 'Pt': J['flow_in:out:Pt'], 'W': dW, 'FAR': J['flow_in:out:FAR'], 'WAR': J['flow_in:out:WAR']}
+        if params['design']:
+            inputs['Mach'] = {'MNexit%d_des' % n: 1.0}
+        J.update(comp._flow_partials(name, unknowns, inputs))
 
 class SplitterBPR(CycleComponent):
     '''Takes a single incoming air stream and splits it into two separate ones based on a given bypass ratio'''
@@ -14,11 +25,15 @@ class SplitterBPR(CycleComponent):
         
         self.add_output('BPR_des', 0.0, desc='bypass ratio of splitter at design conditions')
 
+    @component_solve
+    @instrument.component_scope
     def solve_nonlinear(self, params, unknowns, resids):
         self._clear_unknowns('flow_in', unknowns)
         self._clear_unknowns('flow_out_1', unknowns)
         self._clear_unknowns('flow_out_2', unknowns)
         self._solve_flow_vars('flow_in', params, unknowns)
+        self._copy_composition('flow_in', 'flow_out_1', unknowns)
+        self._copy_composition('flow_in', 'flow_out_2', unknowns)
         unknowns['flow_out_1:out:W'] = unknowns['flow_in:out:W'] / (params['BPR'] + 1.0)
         unknowns['flow_out_2:out:W'] = unknowns['flow_out_1:out:W'] * params['BPR']
         unknowns['flow_out_1:out:Tt'] = unknowns['flow_out_2:out:Tt'] = unknowns['flow_in:out:Tt']
@@ -37,6 +52,16 @@ class SplitterBPR(CycleComponent):
             self._solve_flow_vars('flow_out_1', params, unknowns)
             self._solve_flow_vars('flow_out_2', params, unknowns)
 
+    def _partials(self, params, unknowns):
+        J = self._flow_partials('flow_in', unknowns)
+        BPR, W_in = params['BPR'], unknowns['flow_in:out:W']
+        dW1 = combine_partials((1.0 / (BPR + 1.0), J['flow_in:out:W']), (-W_in / (BPR + 1.0) ** 2, {'BPR': 1.0}))
+        dW2 = combine_partials((BPR, dW1), (unknowns['flow_out_1:out:W'], {'BPR': 1.0}))
+        _split_partials(self, params, unknowns, J, dW1, dW2)
+        if params['design']:
+            J['BPR_des'] = {'BPR': 1.0}
+        return J
+
 class SplitterW(CycleComponent):
     '''Takes a single incoming air stream and splits it into two separate ones based on a given mass flow for the Fl_O1'''
     def __init__(self):
@@ -49,11 +74,15 @@ class SplitterW(CycleComponent):
         self.add_param('MNexit1_des', 0.4, desc='Mach number at design conditions for flow_out_1')
         self.add_param('MNexit2_des', 0.4, desc='Mach number at design conditions for flow_out_2')
 
+    @component_solve
+    @instrument.component_scope
     def solve_nonlinear(self, params, unknowns, resids):
         self._clear_unknowns('flow_in', unknowns)
         self._clear_unknowns('flow_out_1', unknowns)
         self._clear_unknowns('flow_out_2', unknowns)
         self._solve_flow_vars('flow_in', params, unknowns)
+        self._copy_composition('flow_in', 'flow_out_1', unknowns)
+        self._copy_composition('flow_in', 'flow_out_2', unknowns)
         unknowns['flow_out_1:out:Tt'] = unknowns['flow_out_2:out:Tt'] = unknowns['flow_in:out:Tt']
         unknowns['flow_out_1:out:Pt'] = unknowns['flow_out_2:out:Pt'] = unknowns['flow_in:out:Pt']
         if params['design']:
@@ -73,3 +102,14 @@ class SplitterW(CycleComponent):
             unknowns['flow_out_2:out:area'] = self._exit_area_2_des
             self._solve_flow_vars('flow_out_1', params, unknowns)
             self._solve_flow_vars('flow_out_2', params, unknowns)
+
+    def _partials(self, params, unknowns):
+        J = self._flow_partials('flow_in', unknowns)
+        if params['design']:
+            dW1 = {'W1_des': 1.0}
+            dW2 = combine_partials((1.0, J['flow_in:out:W']), (-1.0, dW1))
+        else:
+            dW1 = combine_partials((1.0 / (self._BPR_des + 1.0), J['flow_in:out:W']))
+            dW2 = combine_partials((self._BPR_des, dW1))
+        _split_partials(self, params, unknowns, J, dW1, dW2)
+        return J
@@ -1,5 +1,5 @@
-from pycycle import flowstation
-from pycycle.cycle_component import CycleComponent
+from pycycle import flowstation, instrument
+from pycycle.cycle_component import CycleComponent, component_solve
 
 class FlowStart(CycleComponent):
     '''Flow initialization'''
@@ -12,17 +12,25 @@ class FlowStart(CycleComponent):
         self.add_output('area_des', 0.0, desc='flow area at design conditions', units='inch**2')
         self._add_flowstation('flow_out') # outgoing flow at specified conditions
 
+    @component_solve
+    @instrument.component_scope
     def solve_nonlinear(self, params, unknowns, resids):
         self._clear_unknowns('flow_out', unknowns)
         unknowns['flow_out:out:Tt'] = params['Tt']
         unknowns['flow_out:out:Pt'] = params['Pt']
         unknowns['flow_out:out:W'] = params['W']
         unknowns['flow_out:out:Mach'] = params['Mach']
-        print 'Mach', params['Mach']
+        instrument.log('Mach %s', params['Mach'])
         self._solve_flow_vars('flow_out', params, unknowns)
         if params['design']: 
             unknowns['area_des'] = unknowns['flow_out:out:area']
 
+    def _partials(self, params, unknowns):
+        J = self._flow_partials('flow_out', unknowns, {'Tt': {'Tt': 1.0}, 'Pt': {'Pt': 1.0}, 'W': {'W': 1.0}, 'Mach': {'Mach': 1.0}})
+        if params['design']:
+            J['area_des'] = J['flow_out:out:area']
+        return J
+
 class FlowStartStatic(CycleComponent):
     def __init__(self):
         super(FlowStartStatic, self).__init__()
@@ -32,6 +40,8 @@ class FlowStartStatic(CycleComponent):
         self.add_param('Mach', 0.1, desc='Mach number')
         self._add_flowstation('flow_out') # outgoing flow at specified conditions
 
+    @component_solve
+    @instrument.component_scope
     def solve_nonlinear(self, params, unknowns, resids):
         unknowns['flow_out:out:Ts'] = params['Ts']
         unknowns['flow_out:out:Ps'] = params['Ps']
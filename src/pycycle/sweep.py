@@ -0,0 +1,112 @@
+'''
+Off-design sweeps spread over a pool of worker processes.
+
+    def build():
+        p = Problem(root=MyEngine())
+        p.setup(check=False)
+        return p
+
+    p = build()
+    ... set the design point ...
+    p.run()
+    points = [{'start.W': W, 'nozzle.back_Ps': 15.0} for W in (90.0, 95.0, 100.0)]
+    results = sweep.run_sweep(build, p, points, outputs=['nozzle.Fg'])
+
+factory must be picklable, i.e. a module-level function, and must build a model with the same structure as the designed one. Each worker process loads the mechanism and builds the model once, when it starts, then takes the inputs, outputs, and design state (design areas and other values whose names end in _des, see CycleComponent.design_state) of the designed model instead of running design itself. Points therefore only need the values that differ from the design point. The points a worker runs warm-start from each other, so ordering points along a path through the envelope converges fastest.
+
+Results come back in the order of the points, one dict of output values per point. A point that fails gives {'error': traceback text} instead, so one bad point does not lose the rest of the sweep.
+
+The design state can also be stored, so later studies start from it without running design again:
+
+    sweep.save_design_state(p, 'engine.des')
+    ...
+    p = build()
+    sweep.load_design_state(p, 'engine.des') # p is now off-design
+    results = sweep.run_sweep(build, p, points, outputs=['nozzle.Fg'])
+'''
+
+import cPickle
+import multiprocessing
+import traceback
+
+from pycycle import flowstation
+from pycycle.cycle_component import CycleComponent
+
+_worker = {} # 'problem' -> the model of this worker process
+
+def design_state(problem):
+    '''Everything a copy of a designed model needs to run off-design: the inputs and outputs of each component, plus the design state of each CycleComponent, by pathname'''
+    state = {}
+    for comp in problem.root.components(recurse=True):
+        state[comp.pathname] = {'params': dict((name, comp.params[name]) for name in comp.params.keys()),
+                                'unknowns': dict((name, comp.unknowns[name]) for name in comp.unknowns.keys()),
+                                'design': comp.design_state() if isinstance(comp, CycleComponent) else None}
+    return state
+
+def set_design_state(problem, state):
+    '''Apply a design_state() to a model with the same structure, and switch it to off-design'''
+    missing = [comp.pathname for comp in problem.root.components(recurse=True) if comp.pathname not in state]
+    if missing:
+        raise ValueError('The design state has no values for %s.' % ', '.join(missing))
+    for comp in problem.root.components(recurse=True):
+        comp_state = state[comp.pathname]
+        for name, value in comp_state['params'].iteritems():
+            comp.params[name] = value
+        for name, value in comp_state['unknowns'].iteritems():
+            comp.unknowns[name] = value
+        if comp_state['design'] is not None:
+            comp.set_design_state(comp_state['design'])
+    # a connected design param is set by the next data transfer, so its source is switched as well
+    connections = problem.root.connections
+    for comp in problem.root.components(recurse=True):
+        if 'design' in state[comp.pathname]['params']:
+            comp.params['design'] = False
+            source = connections.get('%s.design' % comp.pathname)
+            if source is not None:
+                problem[source[0]] = False
+
+def save_design_state(problem, filename):
+    '''Write the design_state() of a designed model to a file'''
+    with open(filename, 'wb') as f:
+        cPickle.dump(design_state(problem), f, cPickle.HIGHEST_PROTOCOL)
+
+def load_design_state(problem, filename):
+    '''Apply a design state written by save_design_state() to a model with the same structure, and switch it to off-design'''
+    with open(filename, 'rb') as f:
+        set_design_state(problem, cPickle.load(f))
+
+def _init_worker(factory, state):
+    flowstation.preload_phases()
+    problem = factory()
+    set_design_state(problem, state)
+    _worker['problem'] = problem
+
+def _run_point(args):
+    point, outputs = args
+    problem = _worker['problem']
+    try:
+        for name, value in point.iteritems():
+            problem[name] = value
+        problem.run()
+        return dict((name, problem[name]) for name in outputs)
+    except Exception:
+        return {'error': traceback.format_exc()}
+
+def run_sweep(factory, design_problem, points, outputs=None, processes=None, chunksize=1):
+    '''Run design_problem off-design at each point (a dict of 'component.variable' -> value) in a pool of processes (default one per CPU; 1 runs in this process) and return the requested outputs (default all unknowns) of each point, in order'''
+    state = design_state(design_problem)
+    if outputs is None:
+        outputs = design_problem.root.unknowns.keys()
+    tasks = [(point, outputs) for point in points]
+    if processes == 1:
+        _init_worker(factory, state)
+        try:
+            return map(_run_point, tasks)
+        finally:
+            _worker.clear()
+    pool = multiprocessing.Pool(processes, _init_worker, (factory, state))
+    try:
+        return pool.map(_run_point, tasks, chunksize)
+    finally:
+        pool.close()
+        pool.join()
@@ -0,0 +1,110 @@
+import unittest
+
+from openmdao.core.problem import Problem
+from openmdao.core.group import Group
+
+from test_util import assert_rel_error, check_partials
+from pycycle import instrument
+from pycycle.burner import Burner
+
+class BurnerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.comp = Burner()
+        g = Group()
+        g.add('comp', self.comp)
+        self.p = Problem(root=g)
+        self.p.setup(check=False)
+        self.comp.params['flow_in:in:W'] = 100.0
+        self.comp.params['flow_in:in:Tt'] = 1100.0
+        self.comp.params['flow_in:in:Pt'] = 400.0
+        self.comp.params['flow_in:in:Mach'] = 0.2
+        self.comp.params['Wfuel'] = 2.5
+        self.comp.params['hfuel'] = -642.0
+        self.comp.params['design'] = True
+
+    def _assert(self):
+        TOL = 0.0001
+        assert_rel_error(self, self.comp.unknowns['flow_out:out:FAR'], .025, TOL)
+        assert_rel_error(self, self.comp.unknowns['flow_out:out:W'], 102.5, TOL)
+        assert_rel_error(self, self.comp.unknowns['flow_out:out:Pt'], 400, TOL)
+        assert_rel_error(self, self.comp.unknowns['flow_out:out:Tt'], 2669.69, TOL)
+        assert_rel_error(self, self.comp.unknowns['flow_out:out:ht'], 117.171, TOL)
+        assert_rel_error(self, self.comp.unknowns['flow_out:out:rhot'], .404265, TOL)
+        assert_rel_error(self, self.comp.unknowns['flow_out:out:gamt'], 1.293336, TOL)
+
+    def test_burn(self):
+        self.p.run()
+        self._assert()
+        assert_rel_error(self, self.comp.unknowns['flow_out:out:Mach'], 0.2, 1e-6)
+
+    def test_FAR(self):
+        self.comp.params['Wfuel'] = 0.0
+        self.comp.params['FAR'] = 0.025
+        self.p.run()
+        self._assert()
+        assert_rel_error(self, self.comp.unknowns['Wfuel_out'], 2.5, 1e-9)
+
+    def test_off_design(self):
+        self.p.run()
+        area = self.comp.unknowns['flow_out:out:area']
+        self.comp.params['design'] = False
+        self.p.run()
+        self._assert()
+        assert_rel_error(self, self.comp.unknowns['flow_out:out:area'], area, 1e-9)
+        assert_rel_error(self, self.comp.unknowns['flow_out:out:Mach'], 0.2, 1e-6)
+
+    def test_products_cache(self):
+        self.p.run()
+        # a nearby operating point starts from the product composition, and still ends at the equilibrium of its own FAR
+        self.comp.params['flow_in:in:Pt'] = 399.96
+        self.comp.params['Wfuel'] = 2.501
+        self.p.run()
+        stats = self.comp.products_stats()
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['states']['hits'], 0)
+        cached = dict((name, self.comp.unknowns[name]) for name in self.comp.unknowns.keys())
+
+        # a repeated point returns the cached state without an equilibrium solve
+        instrument.reset()
+        instrument.enable()
+        try:
+            self.p.run()
+            equilibrate = instrument.report()['totals']['equilibrate']
+        finally:
+            instrument.disable()
+            instrument.reset()
+        self.assertNotIn('HP', equilibrate)
+        self.assertEqual(self.comp.products_stats()['states']['hits'], 1)
+        self.assertEqual(self.comp.products_stats()['hits'], 1)
+        for name in ('Tt', 'ht', 's', 'rhot', 'gamt', 'Ps', 'area', 'FAR'):
+            assert_rel_error(self, self.comp.unknowns['flow_out:out:' + name], cached['flow_out:out:' + name], 1e-9)
+
+        cold = Burner()
+        cold.products_cache_size = 0
+        g = Group()
+        g.add('comp', cold)
+        p = Problem(root=g)
+        p.setup(check=False)
+        for name in self.comp.params.keys():
+            cold.params[name] = self.comp.params[name]
+        p.run()
+        for name in ('Tt', 'ht', 's', 'rhot', 'gamt', 'Ps', 'area', 'FAR'):
+            assert_rel_error(self, cold.unknowns['flow_out:out:' + name], cached['flow_out:out:' + name], 1e-9)
+
+    def test_linearize(self):
+        self.p.run()
+        W, ht = self.comp.unknowns['flow_out:out:W'], self.comp.unknowns['flow_out:out:ht']
+        J = self.comp.linearize(self.comp.params, self.comp.unknowns, self.comp.resids)
+        self.assertNotIn(('flow_out:out:Tt', 'fuel_type'), J)
+        self.assertNotIn(('flow_out:out:Tt', 'FAR'), J) # unset
+        assert_rel_error(self, J['flow_out:out:W', 'Wfuel'], 1.0, 1e-6)
+        assert_rel_error(self, J['flow_out:out:ht', 'Wfuel'], (-642.0 - ht) / W, 1e-4)
+        self.assertGreater(J['flow_out:out:Tt', 'Wfuel'], 0.0)
+        self.assertEqual(self.comp.unknowns['flow_out:out:ht'], ht)
+
+    def test_check_partial_derivatives(self):
+        check_partials(self, Burner(), {'flow_in:in:Tt': 1100.0, 'flow_in:in:Pt': 400.0, 'flow_in:in:W': 100.0, 'flow_in:in:Mach': 0.2, 'Wfuel': 2.5, 'hfuel': -642.0, 'dPqP': 0.03})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import cPickle
+import threading
+import unittest
+
+from pycycle.cache import LRUCache, quantize
+
+class LRUCacheTestCase(unittest.TestCase):
+    def test_eviction(self):
+        cache = LRUCache(maxsize=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1) # 'b' is now least recently used
+        cache.put('c', 3)
+        self.assertFalse('b' in cache)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(len(cache), 2)
+
+    def test_stats(self):
+        cache = LRUCache(maxsize=4)
+        cache.put('a', 1)
+        cache.get('a')
+        cache.get('a')
+        cache.get('b')
+        stats = cache.stats()
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 1)
+        self.assertAlmostEqual(stats['hit_rate'], 2.0 / 3.0)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_threads(self):
+        cache = LRUCache(maxsize=64)
+        def work(offset):
+            for n in range(2000):
+                key = (offset + n) % 100
+                if cache.get(key) is None:
+                    cache.put(key, key)
+        threads = [threading.Thread(target=work, args=(10 * k,)) for k in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(cache), 64)
+        stats = cache.stats()
+        self.assertEqual(stats['hits'] + stats['misses'], 8000)
+        # the lock is not pickled, so caches still go to worker processes
+        copy = cPickle.loads(cPickle.dumps(cache, cPickle.HIGHEST_PROTOCOL))
+        self.assertEqual(len(copy), 64)
+        copy.put('a', 1)
+
+    def test_quantize(self):
+        self.assertEqual(quantize(518.0, 1e-6), quantize(518.0 * (1.0 + 1e-9), 1e-6))
+        self.assertNotEqual(quantize(518.0, 1e-6), quantize(518.1, 1e-6))
+        self.assertNotEqual(quantize(1.0, 1e-6), quantize(-1.0, 1e-6))
+        self.assertEqual(quantize(0.0, 1e-6), 0.0)
+        self.assertEqual(quantize(True, 1e-6), True)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,8 +3,8 @@ import unittest
 from openmdao.core.problem import Problem
 from openmdao.core.group import Group
 
-from pycycle.components import Compressor
-from test_util import assert_rel_error
+from pycycle.compressor import Compressor
+from test_util import assert_rel_error, check_partials
 from pycycle import flowstation
 
 class CompressorTestCase(unittest.TestCase):
@@ -55,5 +55,8 @@ class CompressorTestCase(unittest.TestCase):
         p.run()
         assert_rel_error(self, comp.unknowns['PR'], 13.52995, TOL)
 
+    def test_check_partial_derivatives(self):
+        check_partials(self, Compressor(), {'flow_in:in:Tt': 518.0, 'flow_in:in:Pt': 14.7, 'flow_in:in:W': 100.0, 'flow_in:in:Mach': 0.4, 'flow_in:in:WAR': 0.01, 'PR_des': 5.0, 'eff_des': 0.88, 'hub_to_tip': 0.4, 'MNexit_des': 0.3})
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,135 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from openmdao.core.problem import Problem
+from openmdao.core.group import Group
+
+from test_util import assert_rel_error
+from pycycle.compressor import Compressor
+from pycycle.compressor_map import CompressorMap
+
+def make_map():
+    '''A map whose flow is bilinear in (Nc, Rline), so interpolation of it is exact'''
+    Nc = np.array([0.7, 0.8, 0.9, 1.0, 1.1])
+    Rline = np.array([1.0, 1.5, 2.0, 2.5, 3.0])
+    N, R = np.meshgrid(Nc, Rline, indexing='ij')
+    Wc = 50.0 * N * (0.9 + 0.05 * R)
+    PR = 1.0 + 12.0 * N ** 2 * (1.3 - 0.15 * R)
+    eff = 0.86 - 0.02 * (R - 2.0) ** 2 - 0.3 * (N - 1.0) ** 2
+    return CompressorMap(Nc, Rline, Wc, PR, eff)
+
+class CompressorMapTestCase(unittest.TestCase):
+    def setUp(self):
+        self.map = make_map()
+
+    def test_lookup(self):
+        Wc, PR, eff = self.map.lookup(0.9, 2.5)
+        self.assertIsInstance(Wc, float)
+        assert_rel_error(self, Wc, 50.0 * 0.9 * 1.025, 1e-12)
+        assert_rel_error(self, PR, 1.0 + 12.0 * 0.81 * 0.925, 1e-12)
+        assert_rel_error(self, eff, 0.86 - 0.005 - 0.003, 1e-12)
+        assert_rel_error(self, self.map.lookup(0.95, 1.7)[0], 50.0 * 0.95 * 0.985, 1e-12)
+
+    def test_arrays(self):
+        Nc = np.linspace(0.65, 1.15, 7)
+        Rline = np.linspace(0.8, 3.2, 7)
+        tables = self.map.lookup(Nc, Rline)
+        for k in range(len(Nc)):
+            for table, value in zip(tables, self.map.lookup(Nc[k], Rline[k])):
+                assert_rel_error(self, table[k], value, 1e-12)
+        # broadcasting a speed line
+        Wc = self.map.lookup(1.0, self.map.Rline)[0]
+        self.assertEqual(Wc.shape, self.map.Rline.shape)
+        assert_rel_error(self, Wc[-1], self.map.Wc[3, -1], 1e-12)
+
+    def test_rline(self):
+        for Nc, Rline in ((1.0, 2.0), (0.85, 1.3), (1.05, 2.9), (0.9, 3.4), (0.75, 0.8)):
+            Wc = self.map.lookup(Nc, Rline)[0]
+            assert_rel_error(self, self.map.rline(Nc, Wc), Rline, 1e-12)
+        Nc = np.array([0.85, 0.95, 1.05])
+        Rline = np.array([1.2, 2.2, 2.7])
+        Wc = self.map.lookup(Nc, Rline)[0]
+        for value, expected in zip(self.map.rline(Nc, Wc), Rline):
+            assert_rel_error(self, value, expected, 1e-12)
+        # flow falling along the speed lines
+        flipped = CompressorMap(self.map.Nc, self.map.Rline, self.map.Wc[:, ::-1], self.map.PR, self.map.eff)
+        assert_rel_error(self, flipped.rline(0.95, flipped.lookup(0.95, 1.8)[0]), 1.8, 1e-12)
+
+    def test_scalars(self):
+        Wc_scale, PR_scale, eff_scale = self.map.scalars(1.0, 2.0, 100.0, 20.0, 0.9)
+        Wc, PR, eff = self.map.lookup(1.0, 2.0)
+        assert_rel_error(self, Wc * Wc_scale, 100.0, 1e-12)
+        assert_rel_error(self, 1.0 + PR_scale * (PR - 1.0), 20.0, 1e-12)
+        assert_rel_error(self, eff * eff_scale, 0.9, 1e-12)
+
+    def test_save_load(self):
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'fan.map')
+            self.map.save(filename)
+            loaded = CompressorMap.load(filename)
+            # points may come in any order, but the whole grid is needed
+            lines = open(filename).readlines()
+            with open(filename, 'w') as f:
+                f.writelines(lines[:1] + lines[:1:-1])
+            self.assertRaises(ValueError, CompressorMap.load, filename)
+            with open(filename, 'w') as f:
+                f.writelines(lines[:1] + lines[:0:-1])
+            shuffled = CompressorMap.load(filename)
+        finally:
+            shutil.rmtree(directory)
+        for table in (loaded, shuffled):
+            np.testing.assert_allclose(table.Nc, self.map.Nc)
+            np.testing.assert_allclose(table.Rline, self.map.Rline)
+            for name in ('Wc', 'PR', 'eff'):
+                np.testing.assert_allclose(getattr(table, name), getattr(self.map, name), rtol=1e-15)
+
+    def test_compressor(self):
+        comp = Compressor(make_map())
+        g = Group()
+        g.add('comp', comp)
+        p = Problem(root=g)
+        p.setup(check=False)
+
+        comp.params['PR_des'] = 12.47
+        comp.params['MNexit_des'] = 0.4
+        comp.params['eff_des'] = 0.8
+        comp.params['flow_in:in:W'] = 1.08
+        comp.params['flow_in:in:Tt'] = 630.74523
+        comp.params['flow_in:in:Pt'] = 0.0271945
+        comp.params['flow_in:in:Mach'] = 0.6
+        comp.params['design'] = True
+        p.run()
+        Pt_des = comp.unknowns['flow_out:out:Pt']
+        pwr_des = comp.unknowns['pwr']
+        Wc_des = comp.unknowns['flow_in:out:Wc']
+
+        # the scaled map passes through the design point
+        comp.params['design'] = False
+        p.run()
+        TOL = 1e-6
+        assert_rel_error(self, comp.unknowns['PR'], 12.47, TOL)
+        assert_rel_error(self, comp.unknowns['eff'], 0.8, TOL)
+        assert_rel_error(self, comp.unknowns['Rline'], 2.0, TOL)
+        assert_rel_error(self, comp.unknowns['flow_out:out:Pt'], Pt_des, 1e-4)
+        assert_rel_error(self, comp.unknowns['pwr'], pwr_des, 1e-4)
+
+        # less flow at the same speed moves up the speed line towards surge
+        comp.params['flow_in:in:W'] = 1.08 * 0.98
+        p.run()
+        Rline = (comp.unknowns['flow_in:out:Wc'] / Wc_des - 0.9) / 0.05
+        assert_rel_error(self, comp.unknowns['Rline'], Rline, TOL)
+        assert_rel_error(self, comp.unknowns['PR'], 1.0 + 11.47 * (1.3 - 0.15 * Rline), TOL)
+        assert_rel_error(self, comp.unknowns['eff'], 0.8 * (0.86 - 0.01 * (2.0 - Rline)) / 0.86, TOL) # eff is linear between the R-lines
+
+        # and a lower speed drops the pressure ratio
+        comp.params['Nc'] = 0.9
+        p.run()
+        self.assertLess(comp.unknowns['PR'], 12.47 * 0.9)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,12 +1,28 @@
+import os
+import shutil
+import tempfile
 import unittest
 
+import numpy as np
+
 from openmdao.core.problem import Problem
 from openmdao.core.group import Group
 
-from test_util import assert_rel_error
+from test_util import assert_rel_error, check_partials
+from pycycle.cycle_component import CycleComponent, FlowVector, FLOW_VAR_NAMES
 from pycycle.duct import Duct
+from pycycle.start import FlowStart
 from pycycle import flowstation
 
+class CompactFlowStart(FlowStart):
+    compact_flows = True
+
+class CompactDuct(Duct):
+    compact_flows = True
+
+class SkippingDuct(CompactDuct):
+    skip_unchanged = True
+
 class DuctTestCase(unittest.TestCase):
     def test_duct(self): 
         comp = Duct()
@@ -55,7 +71,168 @@ class DuctTestCase(unittest.TestCase):
         assert_rel_error(self, comp.unknowns['flow_out:out:rhos'], 0.0013783, TOL)
         assert_rel_error(self, comp.unknowns['flow_out:out:Mach'], 0.4572, TOL)
         assert_rel_error(self, comp.unknowns['flow_out:out:area'], 221.4, TOL)
-        
+
+        # start a new duct off-design from the stored design
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'duct.des')
+            comp.save_design_state(filename)
+            comp2 = Duct()
+            g = Group()
+            g.add('comp', comp2)
+            p = Problem(root=g)
+            p.setup(check=False)
+            comp2.load_design_state(filename)
+        finally:
+            shutil.rmtree(directory)
+        for name in ('dPqP', 'Q_dot', 'flow_in:in:W', 'flow_in:in:Tt', 'flow_in:in:Pt', 'flow_in:in:Mach'):
+            comp2.params[name] = comp.params[name]
+        comp2.params['design'] = False
+        p.run()
+        assert_rel_error(self, comp2.unknowns['flow_out:out:Mach'], comp.unknowns['flow_out:out:Mach'], 1e-9)
+        assert_rel_error(self, comp2.unknowns['flow_out:out:area'], 221.4, TOL)
+
+    def test_check_partial_derivatives(self):
+        check_partials(self, Duct(), {'flow_in:in:Tt': 518.0, 'flow_in:in:Pt': 14.7, 'flow_in:in:W': 100.0, 'flow_in:in:Mach': 0.4, 'dPqP': 0.05, 'Q_dot': 100.0, 'MNexit_des': 0.3})
+
+class StartDuctTestCase(unittest.TestCase):
+    def _run_start_duct(self, start, duct):
+        g = Group()
+        g.add('start', start)
+        g.add('duct', duct)
+        CycleComponent.connect_flows(g, 'start.flow_out', 'duct.flow_in')
+        p = Problem(root=g)
+        p.setup(check=False)
+        start.params['W'] = 100.0
+        start.params['Tt'] = 1100.0
+        start.params['Pt'] = 400.0
+        start.params['Mach'] = 0.3
+        duct.params['dPqP'] = 0.05
+        duct.params['MNexit_des'] = 0.4
+        for design in (True, False):
+            start.params['design'] = duct.params['design'] = design
+            p.run()
+        return p
+
+    def test_compact_flows(self):
+        named = self._run_start_duct(FlowStart(), Duct())
+        compact = self._run_start_duct(CompactFlowStart(), CompactDuct())
+        self.assertEqual(len(compact.root.connections), 1)
+        flow_out = FlowVector(compact.root.duct.unknowns['flow_out:out'])
+        for var_name in ('ht', 'Pt', 'Ps', 'Mach', 'area', 'W', 'Vflow'):
+            assert_rel_error(self, getattr(flow_out, var_name), named.root.duct.unknowns['flow_out:out:%s' % var_name], 1e-10)
+        self.assertIs(flow_out.is_super, False)
+
+        flow_out.W = 50.0 # writes through to the output vector
+        self.assertEqual(compact['duct.flow_out:out'][FLOW_VAR_NAMES.index('W')], 50.0)
+
+        g = Group()
+        g.add('start', FlowStart())
+        g.add('duct', CompactDuct())
+        self.assertRaises(ValueError, CycleComponent.connect_flows, g, 'start.flow_out', 'duct.flow_in')
+
+    def test_skip_unchanged(self):
+        p = self._run_start_duct(CompactFlowStart(), SkippingDuct())
+        duct = p.root.duct
+        self.assertEqual(duct.skip_stats, {'evaluations': 2, 'skipped': 0})
+        p.run()
+        self.assertEqual(duct.skip_stats, {'evaluations': 2, 'skipped': 1})
+        self.assertEqual(p.root.start.skip_stats['skipped'], 0) # off by default
+
+    def test_skip_unchanged_restores_outputs(self):
+        p = self._run_start_duct(CompactFlowStart(), SkippingDuct())
+        duct = p.root.duct
+        flow_out = duct.unknowns['flow_out:out'].copy()
+        p['duct.flow_out:out'][:] = 0.0 # e.g. a Newton step; the outputs of the last run are restored
+        p.run()
+        self.assertEqual(duct.skip_stats, {'evaluations': 2, 'skipped': 1})
+        np.testing.assert_array_equal(duct.unknowns['flow_out:out'], flow_out)
+
+    def test_skip_unchanged_bit_identical(self):
+        # with one variable per param, a skipped run leaves the unknowns bit-identical too
+        duct = Duct()
+        duct.skip_unchanged = True
+        p = self._run_start_duct(FlowStart(), duct)
+        expected = duct.unknowns.vec.copy()
+        p['duct.flow_out:out:Ps'] = 0.0
+        p.run()
+        self.assertEqual(duct.skip_stats['skipped'], 1)
+        self.assertEqual(duct.unknowns.vec.tobytes(), expected.tobytes())
+
+    def test_skip_unchanged_params(self):
+        p = self._run_start_duct(CompactFlowStart(), SkippingDuct())
+        duct = p.root.duct
+        flow_out = duct.unknowns['flow_out:out'].copy()
+        duct.params['dPqP'] = 0.05 * (1.0 + 1e-14) # within skip_rtol
+        p.run()
+        self.assertEqual(duct.skip_stats, {'evaluations': 2, 'skipped': 1})
+        duct.params['dPqP'] = 0.06
+        p.run()
+        self.assertEqual(duct.skip_stats, {'evaluations': 3, 'skipped': 1})
+        self.assertLess(FlowVector(duct.unknowns['flow_out:out']).Pt, FlowVector(flow_out).Pt)
+
+    def test_skip_unchanged_design_state(self):
+        p = self._run_start_duct(CompactFlowStart(), SkippingDuct())
+        duct = p.root.duct
+        duct.set_design_state(duct.design_state())
+        p.run()
+        self.assertEqual(duct.skip_stats, {'evaluations': 3, 'skipped': 0})
+
+    def test_skip_unchanged_settings(self):
+        # the flowstation settings are part of the key
+        p = self._run_start_duct(CompactFlowStart(), SkippingDuct())
+        duct = p.root.duct
+        flowstation.set_fast_mach_statics(False)
+        p.run()
+        self.assertEqual(duct.skip_stats['skipped'], 0)
+        with flowstation.statics_rtol(1e-12):
+            p.run()
+        self.assertEqual(duct.skip_stats['skipped'], 0)
+        p.run()
+        self.assertEqual(duct.skip_stats['skipped'], 0)
+        p.run()
+        self.assertEqual(duct.skip_stats['skipped'], 1)
+
+    def test_linearize(self):
+        p = self._run_start_duct(FlowStart(), Duct())
+        duct = p.root.duct
+        outputs = dict((name, duct.unknowns[name]) for name in duct.unknowns.keys())
+        exit_area = duct._exit_area_des
+        J = duct.linearize(duct.params, duct.unknowns, duct.resids)
+        inputs = set(name for output, name in J)
+        self.assertTrue(set(['Q_dot', 'dPqP', 'flow_in:in:Vflow']) < inputs) # flow_in is connected, so it is passed through
+        self.assertNotIn('MNexit_des', inputs) # off-design the exit area is fixed
+        self.assertNotIn('flow_in:in:is_super', inputs)
+        self.assertEqual(duct.linearize_stats, {'analytic': 1, 'fd': 0})
+        assert_rel_error(self, J['flow_in:out:Vflow', 'flow_in:in:Vflow'], 1.0, 1e-9)
+        assert_rel_error(self, J['flow_out:out:Pt', 'dPqP'], -400.0, 1e-6)
+        assert_rel_error(self, J['flow_out:out:Pt', 'flow_in:in:Pt'], 0.95, 1e-6)
+        assert_rel_error(self, J['flow_out:out:ht', 'Q_dot'], 1.0 / 100.0, 1e-4)
+        assert_rel_error(self, J['flow_out:out:W', 'flow_in:in:W'], 1.0, 1e-6)
+        self.assertAlmostEqual(J.get(('flow_out:out:area', 'flow_in:in:W'), 0.0), 0.0) # off-design at the design area
+        # the analytic partials agree with finite differences
+        duct.fd_partials = True
+        J_fd = duct.linearize(duct.params, duct.unknowns, duct.resids)
+        self.assertEqual(duct.linearize_stats, {'analytic': 1, 'fd': 1})
+        for key in ('flow_out:out:Ps', 'flow_in:in:W'), ('flow_out:out:Ts', 'Q_dot'), ('flow_out:out:Mach', 'dPqP'):
+            assert_rel_error(self, J[key], J_fd[key], 1e-3)
+        duct.fd_partials = False
+        # the state is left as it was
+        self.assertEqual(duct._exit_area_des, exit_area)
+        for name, value in outputs.iteritems():
+            self.assertEqual(duct.unknowns[name], value)
+
+    def test_linearize_compact(self):
+        # with compact FlowStations the derivatives come in blocks of the vectors
+        named = self._run_start_duct(FlowStart(), Duct()).root.duct
+        J = named.linearize(named.params, named.unknowns, named.resids)
+        duct = self._run_start_duct(CompactFlowStart(), CompactDuct()).root.duct
+        J_compact = duct.linearize(duct.params, duct.unknowns, duct.resids)
+        block = J_compact['flow_out:out', 'flow_in:in']
+        self.assertEqual(block.shape, (len(FLOW_VAR_NAMES), len(FLOW_VAR_NAMES)))
+        assert_rel_error(self, block[FLOW_VAR_NAMES.index('Ps'), FLOW_VAR_NAMES.index('W')], J['flow_out:out:Ps', 'flow_in:in:W'], 1e-6)
+        assert_rel_error(self, J_compact['flow_out:out', 'dPqP'][FLOW_VAR_NAMES.index('Pt'), 0], -400.0, 1e-6)
+
 if __name__ == "__main__":
     unittest.main()
     
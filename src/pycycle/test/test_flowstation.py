@@ -1,4 +1,11 @@
+import gc
+import subprocess
+import sys
+import threading
 import unittest
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
 
 from openmdao.core.problem import Problem
 from openmdao.core.group import Group
@@ -17,6 +24,11 @@ class DummyComp(CycleComponent):
     def solve_nonlinear(self, params, unknowns, resids):
         self._solve_flow_vars('flow', params, unknowns)
 
+class ClearingDummyComp(DummyComp):
+    def solve_nonlinear(self, params, unknowns, resids):
+        self._clear_unknowns('flow', unknowns)
+        self._solve_flow_vars('flow', params, unknowns)
+
 class CycleComponentTestCase(unittest.TestCase):
     def setUp(self): 
         '''Initialization function called before every test function''' 
@@ -45,6 +57,48 @@ class CycleComponentTestCase(unittest.TestCase):
         assert_rel_error(self, self.comp2.unknowns['flow:out:Tt'], 518.0, TOL)
         assert_rel_error(self, self.comp2.unknowns['flow:out:Pt'], 15.0, TOL)
 
+    def test_warm_start(self):
+        comp = ClearingDummyComp()
+        g = Group()
+        g.add('comp', comp)
+        p = Problem(root=g)
+        p.setup(check=False)
+        comp.params['flow:in:W'] = 100.0
+        comp.params['flow:in:Tt'] = 1100.0
+        comp.params['flow:in:Pt'] = 400.0
+        comp.params['flow:in:area'] = 32.006
+        p.run()
+        comp.params['flow:in:Pt'] = 404.0
+        p.run()
+
+        stats = comp.warm_start_stats
+        self.assertEqual(stats['cold_solves'], 1)
+        self.assertEqual(stats['warm_solves'], 1)
+        self.assertGreater(stats['saved'], 0)
+        assert_rel_error(self, comp.unknowns['flow:out:area'], 32.006, 1e-6)
+        self.assertLess(comp.unknowns['flow:out:Mach'], 1.0)
+
+        comp.clear_caches()
+        p.run()
+        self.assertEqual(stats['cold_solves'], 2)
+        assert_rel_error(self, comp.unknowns['flow:out:area'], 32.006, 1e-6)
+
+    def test_WAR(self):
+        self.comp1.params['flow:in:W'] = 100.0
+        self.comp1.params['flow:in:Tt'] = 1000.0
+        self.comp1.params['flow:in:Pt'] = 15.0
+        self.comp1.params['flow:in:WAR'] = 0.02
+        self.p.run()
+
+        assert_rel_error(self, self.comp1.unknowns['flow:out:ht'], -.11513, .0001)
+        assert_rel_error(self, self.comp1.unknowns['flow:out:WAR'], 0.02, 1e-12)
+
+    def test_component_solve_required(self):
+        # compact_flows and skip_unchanged are handled by the component_solve decorator
+        class CompactDummyComp(DummyComp):
+            compact_flows = True
+        self.assertRaises(TypeError, CompactDummyComp)
+
 class FlowStationTestCase(unittest.TestCase):
 #        self.fs = FlowStation()
 #
@@ -89,29 +143,147 @@ class FlowStationTestCase(unittest.TestCase):
         flow = flowstation.solve(Tt=1000.0, Pt=40.0, W=100.0)
         diffs = flow.s - s
         assert_rel_error(self, diffs, .092609, .0001)
+
+    def test_lazy_imports(self):
+        # importing pycycle only loads Cantera and scipy.optimize once they are needed, and the mechanism is precompiled
+        loaded = subprocess.check_output([sys.executable, '-c', "import sys; import pycycle.flowstation, pycycle.compressor, pycycle.heat_exchanger; print [name for name in ('Cantera', 'scipy.optimize') if name in sys.modules]"])
+        self.assertEqual(loaded.strip(), '[]')
+        self.assertTrue(flowstation._PROP_FILE.endswith('.xml'))
+
+    def test_phase_pool(self):
+        flowstation.solve(Pt=15.0, Tt=518.0, W=100.0)
+        before = flowstation.phase_pool_stats()
+        flowstation.solve(Pt=15.0, Tt=518.0, W=100.0, Mach=0.3)
+        after = flowstation.phase_pool_stats()
+
+        self.assertEqual(after['misses'], before['misses'])
+        self.assertGreater(after['hits'], before['hits'])
+        self.assertGreater(after['idle'], 0)
+
+        # any idle phase serves any composition, so new FARs and WARs load no phases
+        flowstation.clear_phase_pool()
+        misses = flowstation.phase_pool_stats()['misses']
+        for FAR in (0.01, 0.011, 0.012, 0.013):
+            flowstation.solve(Pt=15.0, Tt=1500.0, W=100.0, Mach=0.3, FAR=FAR, WAR=FAR / 2.0)
+        self.assertEqual(flowstation.phase_pool_stats()['misses'], misses + 1)
+        self.assertEqual(flowstation.phase_pool_stats()['idle'], 1)
+
+    def test_solve_threaded(self):
+        points = [{'Pt': Pt, 'Tt': Tt, 'W': 100.0, 'Mach': 0.3, 'FAR': FAR} for Pt in (15.0, 40.0) for Tt in (518.0, 1500.0) for FAR in (0.0, 0.02)]
+        results = flowstation.solve_threaded(points, threads=3)
+        self.assertEqual(results, [flowstation.solve(**point) for point in points])
+
+        # phases loaded by the pool threads are not handed out to this one
+        flowstation.clear_phase_pool()
+        flowstation.solve_threaded([{'Pt': 15.0, 'Tt': 518.0}] * 6, threads=3)
+        idle = flowstation.phase_pool_stats()['idle']
+        flowstation.solve(Pt=15.0, Tt=518.0)
+        self.assertEqual(flowstation.phase_pool_stats()['idle'], idle + 1) # this thread loads its own
+
+        # the pool and its phases are kept between calls, and freed with the threads
+        pool = flowstation._thread_pool(3)
+        flowstation.solve_threaded([{'Pt': 15.0, 'Tt': 518.0}] * 6, threads=3)
+        self.assertIs(flowstation._thread_pool(3), pool)
+        flowstation.close_thread_pool()
+        gc.collect()
+        self.assertEqual(flowstation.phase_pool_stats()['idle'], 1)
+
+        # or run in the caller's pool
+        executor = ThreadPool(2)
+        try:
+            self.assertEqual(flowstation.solve_threaded(points, executor=executor), results)
+        finally:
+            executor.close()
+            executor.join()
+
+    def test_thread_state(self):
+        # solver counts of all threads add up, and statics_rtol only applies in its own thread
+        flowstation.reset_solver_stats()
+        rtols = []
+        def solve():
+            rtols.append(flowstation._warm_rtol())
+            flowstation.solve(Pt=15.0, Tt=518.0, W=100.0, Mach=0.3)
+        with flowstation.statics_rtol(1e-12):
+            thread = threading.Thread(target=solve)
+            thread.start()
+            thread.join()
+            self.assertEqual(flowstation._warm_rtol(), 1e-12)
+        self.assertEqual(rtols, [None])
+        self.assertIsNone(flowstation._warm_rtol())
+        self.assertGreater(flowstation.solver_stats()['evaluations'], 0)
+        self.assertEqual(flowstation.static_evaluations(), flowstation.solver_stats()['evaluations'])
+
+    def test_reactants_frozen(self):
+        flowstation.solve(Pt=15.0, Tt=518.0)
+        self.assertRaises(flowstation.ArgumentError, flowstation.add_reactant, ['H2'], [1.0])
+        self.assertIsInstance(flowstation.REACTANT_NAMES, tuple)
+
+    def test_solve_cache(self):
+        flowstation.enable_solve_cache(maxsize=8)
+        try:
+            flow1 = flowstation.solve(Pt=15.0, Tt=518.0, W=100.0, Mach=0.3)
+            flow2 = flowstation.solve(Pt=15.0, Tt=518.0, W=100.0, Mach=0.3)
+            stats = flowstation.solve_cache_stats()
+            self.assertEqual(stats['hits'], 1)
+            self.assertEqual(stats['misses'], 1)
+            self.assertEqual(flow1, flow2)
+            # solutions are only shared between solves with the same solver settings
+            flowstation.set_fast_mach_statics(True, tol=1e-3)
+            try:
+                flowstation.solve(Pt=15.0, Tt=518.0, W=100.0, Mach=0.3)
+            finally:
+                flowstation.set_fast_mach_statics(False)
+            with flowstation.statics_rtol(1e-12):
+                flowstation.solve(Pt=15.0, Tt=518.0, W=100.0, Mach=0.3)
+            self.assertEqual(flowstation.solve_cache_stats()['misses'], 3)
+            flowstation.solve(Pt=15.0, Tt=518.0, W=100.0, Mach=0.3)
+            self.assertEqual(flowstation.solve_cache_stats()['hits'], 2)
+            flowstation.set_property_table(None) # changing the backend invalidates the cache
+            self.assertEqual(flowstation.solve_cache_stats()['size'], 0)
+        finally:
+            flowstation.disable_solve_cache()
+        self.assertEqual(flowstation.solve_cache_stats(), None)
         
-# TODO implement the following:
-#    def test_set_WAR(self):
-#        self.fs.setWAR( 0.02 )
-#        self.fs.setTotalTP(1000, 15); 
-#        assert_rel_error(self,self.fs.Pt, 15., .0001)
-#        assert_rel_error(self,self.fs.Tt, 1000, .0001)
-#        assert_rel_error(self,self.fs.WAR, 0.02, .0001)
-#        assert_rel_error(self,self.fs.FAR, 0, .0001)
-#        assert_rel_error(self,self.fs.ht, -.11513, .0001)
-#
-#    def test_setDryAir(self):
-#        self.fs.setDryAir()
-#        self.fs.setTotalTP(1000, 15); 
-#        assert_rel_error(self,self.fs.Pt, 15.,.0001)
-#        assert_rel_error(self,self.fs.Tt, 1000, .0001)
-#        assert_rel_error(self,self.fs.WAR, 0.0, .0001)
-#        assert_rel_error(self,self.fs.FAR, 0, .0001)
-#        assert_rel_error(self,self.fs.ht, 111.129, .0001)
-#        assert_rel_error(self,self.fs.WAR, 0, .0001)
-#        assert_rel_error(self,self.fs.FAR, 0, .0001)
+    def test_set_WAR(self):
+        flow = flowstation.solve(Tt=1000.0, Pt=15.0, WAR=0.02)
+        assert_rel_error(self, flow.Pt, 15., .0001)
+        assert_rel_error(self, flow.Tt, 1000, .0001)
+        assert_rel_error(self, flow.ht, -.11513, .0001)
+
+    def test_setDryAir(self):
+        flow = flowstation.solve(Tt=1000.0, Pt=15.0, WAR=0.0, FAR=0.0)
+        assert_rel_error(self, flow.Pt, 15., .0001)
+        assert_rel_error(self, flow.Tt, 1000, .0001)
+        assert_rel_error(self, flow.ht, 111.129, .0001)
+
+    def test_composition(self):
+        self.assertEqual(flowstation.composition(), flowstation._DRY_AIR)
+        self.assertEqual(flowstation.composition([1.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0, 0]), flowstation._DRY_AIR)
+        species = flowstation.composition(FAR=0.025, WAR=0.01)
+        assert_rel_error(self, species[flowstation.WATER], 0.01 / 1.035, 1e-12)
+        assert_rel_error(self, species[flowstation.FUEL], 0.025 / 1.035, 1e-12)
+        self.assertRaises(flowstation.ArgumentError, flowstation.composition, [1.0] * 7)
+
+        # the mass fraction array is built once per composition
+        Y = flowstation._mass_fractions(species)
+        self.assertTrue(flowstation._mass_fractions(species) is Y)
+        assert_rel_error(self, Y.sum(), 1.0, 1e-5) # the reactant splits only sum to 1 within 1e-6
 
+    def test_solve_FAR(self):
+        flow = flowstation.solve(Tt=2500.0, Pt=400.0, W=100.0, Mach=0.2, FAR=0.025)
+        species = flowstation.composition(FAR=0.025)
+        self.assertEqual(flow, flowstation.solve(Tt=2500.0, Pt=400.0, W=100.0, Mach=0.2, species=species))
+        self.assertNotEqual(flow.ht, flowstation.solve(Tt=2500.0, Pt=400.0, W=100.0, Mach=0.2).ht)
+        assert_rel_error(self, flow.Mach, 0.2, 1e-6)
 
+    def test_isentropic_h(self):
+        s = flowstation.solve(Pt=15.0, Tt=518.0, FAR=0.01).s
+        for Pt in (15.0, 40.0, 187.0):
+            assert_rel_error(self, flowstation.isentropic_h(s, Pt, FAR=0.01), flowstation.solve(s=s, Pt=Pt, FAR=0.01).ht, 1e-12)
+        h = flowstation.isentropic_h_batch(s, [[15.0, 40.0], [187.0, 15.0]], FAR=0.01)
+        self.assertEqual(h.shape, (2, 2))
+        assert_rel_error(self, h[1, 0], flowstation.isentropic_h(s, 187.0, FAR=0.01), 1e-12)
+        assert_rel_error(self, h[1, 1], flowstation.solve(Pt=15.0, Tt=518.0, FAR=0.01).ht, 1e-9)
 
 #class TestBurn(unittest.TestCase): 
 #    def setUp(self):
@@ -176,6 +348,18 @@ class TestStatics(unittest.TestCase):
         flow = flowstation.solve(W=self.W, Tt=self.Tt, Pt=self.Pt, Mach=0.3)
         self._assert(flow)
 
+    def test_solve_Mach_fast(self):
+        flowstation.set_fast_mach_statics(True, tol=1e-6)
+        try:
+            flow = flowstation.solve(W=self.W, Tt=self.Tt, Pt=self.Pt, Mach=0.3)
+            supersonic = flowstation.solve(W=self.W, Tt=self.Tt, Pt=self.Pt, Mach=2.0)
+        finally:
+            flowstation.set_fast_mach_statics(False)
+        self._assert(flow)
+        assert_rel_error(self, flow.Mach, 0.3, 1e-6)
+        exact = flowstation.solve(W=self.W, Tt=self.Tt, Pt=self.Pt, Mach=2.0)
+        assert_rel_error(self, supersonic.Ps, exact.Ps, 3e-6)
+
     def test_solve_area(self):
         flow = flowstation.solve(W=self.W, Tt=self.Tt, Pt=self.Pt, area=32.006)
         self.assertLess(flow.Mach, 1.0)
@@ -196,6 +380,66 @@ class TestStatics(unittest.TestCase):
     def test_solve_super(self):
         flow = flowstation.solve(W=self.W, Tt=self.Tt, Pt=self.Pt, area=32.006, is_super=True)
         self.assertGreater(flow.Mach, 1.0)
+
+    def test_solve_area_reuses_critical_state(self):
+        flowstation.solve(W=self.W, Tt=self.Tt, Pt=self.Pt, area=32.006)
+        flowstation.reset_solver_stats()
+        flow = flowstation.solve(W=2 * self.W, Tt=self.Tt, Pt=self.Pt, area=2 * 32.006, is_super=True)
+        stats = flowstation.solver_stats()
+        self.assertGreater(flow.Mach, 1.0)
+        self.assertEqual(stats['critical_hits'], 1)
+        self.assertEqual(stats['critical_misses'], 0)
+        self.assertEqual(stats['newton'], 0)
+        self.assertEqual(stats['evaluations'], stats['bracket'])
+
+    def test_solve_area_too_small(self):
+        self.assertRaises(ValueError, flowstation.solve, W=self.W, Tt=self.Tt, Pt=self.Pt, area=1.0)
+        self.assertRaises(ValueError, flowstation.solve, W=0.0, Tt=self.Tt, Pt=self.Pt, area=32.006)
+        self.assertRaises(ValueError, flowstation.solve, W=self.W, Tt=self.Tt, Pt=self.Pt, area=0.0)
+
+    def test_solve_area_not_bracketed(self):
+        # a supersonic area that no static pressure reaches gives up after a bounded number of halvings
+        solve_statics_Ps = flowstation.solve_statics_Ps
+        def capped(*args, **kwargs):
+            out = solve_statics_Ps(*args, **kwargs)
+            return out._replace(area=min(out.area, 50.0))
+        flowstation.solve_statics_Ps = capped
+        try:
+            flowstation.reset_solver_stats()
+            self.assertRaises(ValueError, flowstation.solve, W=self.W, Tt=self.Tt, Pt=self.Pt, area=100.0, is_super=True)
+        finally:
+            flowstation.solve_statics_Ps = solve_statics_Ps
+        self.assertEqual(flowstation.solver_stats()['bracket'], flowstation._MAX_HALVINGS + 1)
+
+    def test_solve_batch(self):
+        flows = flowstation.solve_batch(W=self.W, Tt=self.Tt, Pt=self.Pt, Mach=[0.3, 0.3])
+        self.assertTrue(flows.converged.all())
+        self._assert(flows[0])
+        flows = flowstation.solve_batch(W=self.W, Tt=self.Tt, Pt=self.Pt, area=32.006, is_super=[False, True])
+        self.assertTrue(flows.converged.all())
+        self._assert(flows[0])
+        self.assertGreater(flows[1].Mach, 1.0)
+        flows = flowstation.solve_batch(W=self.W, Tt=[self.Tt, self.Tt], Pt=self.Pt, Ps=376.194)
+        self._assert(flows[1])
+
+    def test_solve_outputs(self):
+        flowstation.reset_solver_stats()
+        flow = flowstation.solve(W=self.W, Tt=self.Tt, Pt=self.Pt, area=32.006, outputs=('ht', 'gamt', 'Wc'))
+        self.assertEqual(flowstation.solver_stats()['evaluations'], 0)
+        full = flowstation.solve(W=self.W, Tt=self.Tt, Pt=self.Pt, area=32.006)
+        for name in flowstation.TOTAL_FIELDS:
+            self.assertEqual(getattr(flow, name), getattr(full, name))
+        self.assertEqual((flow.Ps, flow.Mach, flow.area), (-1.0, -1.0, -1.0))
+        # any static output needs the full solve
+        self.assertEqual(flowstation.solve(W=self.W, Tt=self.Tt, Pt=self.Pt, area=32.006, outputs=('ht', 'Ps')), full)
+        self.assertRaises(flowstation.ArgumentError, flowstation.solve, W=self.W, Tt=self.Tt, Pt=self.Pt, outputs=('Pstatic',))
+        flows = flowstation.solve_batch(W=self.W, Tt=self.Tt, Pt=self.Pt, Mach=[0.3, 0.5], outputs=('Cp',))
+        assert_rel_error(self, flows[1].Cp, full.Cp, 1e-12)
+        self.assertTrue(np.isnan(flows.Ps).all())
+
+    def test_solve_batch_not_converged(self):
+        flows = flowstation.solve_batch(W=self.W, Tt=self.Tt, Pt=self.Pt, area=[32.006, 1.0])
+        self.assertEqual(list(flows.converged), [True, False])
         
 # TODO implement the following
 #class HotH2(unittest.TestCase): 
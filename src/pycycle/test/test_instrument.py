@@ -0,0 +1,111 @@
+import json
+import threading
+import unittest
+from StringIO import StringIO
+
+from openmdao.core.problem import Problem
+from openmdao.core.group import Group
+
+from pycycle import flowstation, instrument
+from pycycle.duct import Duct
+from pycycle.start import FlowStart
+
+class InstrumentTestCase(unittest.TestCase):
+    def setUp(self):
+        self.comp = Duct()
+        g = Group()
+        g.add('duct', self.comp)
+        self.p = Problem(root=g)
+        self.p.setup(check=False)
+        self.comp.params['flow_in:in:W'] = 100.0
+        self.comp.params['flow_in:in:Tt'] = 1100.0
+        self.comp.params['flow_in:in:Pt'] = 400.0
+        self.comp.params['flow_in:in:Mach'] = 0.3
+        self.comp.params['design'] = True
+        instrument.reset()
+
+    def tearDown(self):
+        instrument.disable()
+        instrument.reset()
+
+    def _records(self):
+        return dict(((record['component'], record['station']), record) for record in instrument.report()['records'])
+
+    def test_disabled(self):
+        self.p.run()
+        self.assertEqual(instrument.report()['records'], [])
+
+    def test_counts(self):
+        flowstation.clear_phase_pool()
+        instrument.enable()
+        self.p.run()
+        records = self._records()
+        self.assertEqual(sorted(records), [('duct', 'flow_in'), ('duct', 'flow_out')])
+        flow_in = records['duct', 'flow_in']
+        self.assertEqual(flow_in['solves'], 1)
+        self.assertGreater(flow_in['time'], 0.0)
+        self.assertEqual(flow_in['importPhase'], 1)
+        self.assertEqual(flow_in['equilibrate']['TP'], 1)
+        self.assertEqual(flow_in['equilibrate']['SP'], flow_in['iterations']['evaluations'])
+        self.assertGreater(flow_in['iterations']['newton'], 0)
+        self.assertEqual(records['duct', 'flow_out']['importPhase'], 0)
+
+        totals = instrument.report()['totals']
+        self.assertEqual(totals['solves'], 2)
+        self.assertEqual(totals['equilibrate']['HP'], 1)
+
+        # direct solves outside of any component
+        flowstation.solve(Tt=518.0, Pt=15.0)
+        self.assertEqual(self._records()[None, None]['solves'], 1)
+
+    def test_direct_solves(self):
+        # the nozzle and compressor solve stations of their own, which count against the component
+        @instrument.component_scope
+        def solve_nonlinear(comp, params, unknowns, resids):
+            flowstation.solve(Tt=518.0, Pt=15.0, Mach=0.5)
+        instrument.enable()
+        solve_nonlinear(self.comp, None, None, None)
+        self.assertEqual(self._records()['duct', None]['solves'], 1)
+
+    def test_threads(self):
+        # a solve in another thread is not attributed to this thread's scope
+        instrument.enable()
+        with instrument.scope(self.comp, 'flow_in'):
+            thread = threading.Thread(target=flowstation.solve, kwargs={'Tt': 518.0, 'Pt': 15.0, 'Mach': 0.5})
+            thread.start()
+            thread.join()
+            flowstation.solve(Tt=518.0, Pt=15.0, Mach=0.5)
+        records = self._records()
+        self.assertEqual(records[None, None]['solves'], 1)
+        self.assertEqual(records['duct', 'flow_in']['solves'], 1)
+        self.assertEqual(records['duct', 'flow_in']['iterations'], records[None, None]['iterations']) # only this thread's iterations
+
+    def test_log_disabled(self):
+        # while disabled the message is not formatted
+        class Unprintable(object):
+            def __str__(self):
+                raise AssertionError('formatted')
+        instrument.log('Mach %s', Unprintable())
+        instrument.enable()
+        instrument.log('Mach %s', 0.5)
+        self.assertEqual(instrument.report()['messages'], [{'component': None, 'station': None, 'message': 'Mach 0.5'}])
+
+    def test_log(self):
+        start = FlowStart()
+        g = Group()
+        g.add('start', start)
+        p = Problem(root=g)
+        p.setup(check=False)
+        stream = StringIO()
+        instrument.enable(stream)
+        p.run()
+        self.assertEqual(stream.getvalue(), 'Mach 0.1\n')
+        self.assertEqual(instrument.report()['messages'], [{'component': 'start', 'station': None, 'message': 'Mach 0.1'}])
+
+        stream = StringIO()
+        instrument.dump(stream)
+        self.assertEqual(json.loads(stream.getvalue())['totals']['solves'], 1)
+        self.assertTrue(instrument.format_report().splitlines()[-1].startswith('total'))
+
+if __name__ == "__main__":
+    unittest.main()
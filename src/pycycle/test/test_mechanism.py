@@ -0,0 +1,37 @@
+import unittest
+
+from test_util import assert_rel_error
+from pycycle import flowstation, mechanism
+
+class MechanismTestCase(unittest.TestCase):
+    def tearDown(self):
+        flowstation.set_mechanism(flowstation.FULL_MECHANISM)
+
+    def test_reactants(self):
+        # every reactant can be mixed into the reduced mechanism
+        flowstation.set_mechanism(flowstation.REDUCED_MECHANISM)
+        for fuel in range(len(flowstation.REACTANT_NAMES)):
+            flow = flowstation.solve(Tt=2500.0, Pt=100.0, W=1.0, Mach=0.3, FAR=0.02, WAR=0.01, fuel=fuel)
+            assert_rel_error(self, flow.Mach, 0.3, 1e-6)
+        self.assertEqual(len(flowstation._SPECIES_NAMES), 21)
+
+    def test_select(self):
+        full = flowstation.solve(Tt=3000.0, Pt=400.0, FAR=0.03)
+        flowstation.set_mechanism(flowstation.REDUCED_MECHANISM)
+        self.assertEqual(flowstation.get_mechanism(), flowstation.REDUCED_MECHANISM)
+        reduced = flowstation.solve(Tt=3000.0, Pt=400.0, FAR=0.03)
+        flowstation.set_mechanism(flowstation.FULL_MECHANISM)
+        self.assertEqual(flowstation.solve(Tt=3000.0, Pt=400.0, FAR=0.03), full)
+        assert_rel_error(self, reduced.rhot, full.rhot, 1e-4)
+        assert_rel_error(self, reduced.Cp, full.Cp, 1e-4)
+
+    def test_validate(self):
+        results = mechanism.validate(T_range=(1000.0, 3500.0), P_range=(15.0, 400.0), FAR_range=(0.0, 0.068), WAR_range=(0.03,))
+        for name in ('T', 'rho', 'Cp', 'Cv', 'MW'):
+            self.assertLess(results['errors'][name], 1e-3)
+        self.assertLess(results['errors']['h'], 0.05)
+        self.assertEqual(mechanism.report(results).count('\n'), len(flowstation.State._fields) + 1)
+        self.assertEqual(flowstation.get_mechanism(), flowstation.FULL_MECHANISM)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -11,7 +11,7 @@ from pycycle.nozzle import Nozzle
 from pycycle.start import FlowStart
 from pycycle.cycle_component import CycleComponent
 from pycycle import flowstation
-from test_util import assert_rel_error
+from test_util import assert_rel_error, check_partials
 
 TOL = 0.001
 
@@ -125,6 +125,46 @@ class NozzleTestCaseResonable(unittest.TestCase):
         self.p.run()
         self.assertEqual(self.comp.unknowns['switchRegime'], 'PERFECTLY_EXPANDED')
 
+    def test_regime_boundaries_cache(self):
+        self.comp.params['design'] = False
+        self.comp.params['back_Ps'] = 45.0
+        self.p.run()
+        # unchoked needs only the subsonic boundary
+        boundaries, = self.comp._boundaries._data.values()
+        self.assertEqual(boundaries.keys(), ['subsonic'])
+
+        results = {}
+        for back_Ps in (14.0, 35.0, 45.0):
+            self.comp.params['back_Ps'] = back_Ps
+            self.p.run()
+            results[back_Ps] = (self.comp.unknowns['switchRegime'], self.comp.unknowns['Fg'])
+        # the boundaries only depend on the flow, not on the back pressure
+        self.assertEqual(self.comp.boundaries_stats()['misses'], 1)
+        self.assertEqual(self.comp.boundaries_stats()['hits'], 3)
+        self.assertEqual(sorted(boundaries), ['shock', 'subsonic', 'supersonic'])
+        self.assertEqual(results[45.0][0], 'UNCHOKED')
+
+        # a change of the solver settings solves them again
+        flowstation.set_mechanism(flowstation.REDUCED_MECHANISM)
+        try:
+            self.p.run()
+            self.assertEqual(self.comp.boundaries_stats()['misses'], 2)
+        finally:
+            flowstation.set_mechanism(flowstation.FULL_MECHANISM)
+        self.p.run()
+        self.assertEqual(self.comp.boundaries_stats()['misses'], 3)
+
+        self.comp.clear_caches()
+        self.p.run()
+        self.assertEqual(self.comp.boundaries_stats()['misses'], 4)
+
+        self.comp.boundaries_cache_size = 0
+        for back_Ps, (regime, Fg) in results.iteritems():
+            self.comp.params['back_Ps'] = back_Ps
+            self.p.run()
+            self.assertEqual(self.comp.unknowns['switchRegime'], regime)
+            assert_rel_error(self, self.comp.unknowns['Fg'], Fg, 1e-12)
+
 #class NozzleTestCaseMassFlowIter(unittest.TestCase):
 #    def test_mass_flow_iter(self):
 #        g = Group()
@@ -242,6 +282,10 @@ class NozzleTestCaseVeryLowTemp(unittest.TestCase):
         p.run()
 
         self.assertEqual(comp.unknowns['switchRegime'], 'UNDEREXPANDED')
+
+class NozzlePartialsTestCase(unittest.TestCase):
+    def test_check_partial_derivatives(self):
+        check_partials(self, Nozzle(), {'flow_in:in:Tt': 1100.0, 'flow_in:in:Pt': 40.0, 'flow_in:in:W': 100.0, 'flow_in:in:Mach': 0.3, 'back_Ps': 14.7}, designs=(True,))
  
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,62 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from test_util import assert_rel_error
+from pycycle import flowstation
+from pycycle.property_table import PropertyTable
+
+class PropertyTableTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.table = PropertyTable(P_range=(10.0, 500.0), T_range=(500.0, 2000.0), nP=21, nT=81)
+
+    def tearDown(self):
+        flowstation.set_property_table(None)
+
+    def test_accuracy_bound(self):
+        self.assertLess(self.table.max_error, 1e-3)
+
+    def test_statics(self):
+        exact = flowstation.solve(W=100.0, Tt=1100.0, Pt=400.0, Mach=0.3)
+        flowstation.set_property_table(self.table)
+        flow = flowstation.solve(W=100.0, Tt=1100.0, Pt=400.0, Mach=0.3)
+
+        TOL = 10 * self.table.max_error
+        assert_rel_error(self, flow.Ps, exact.Ps, TOL)
+        assert_rel_error(self, flow.Ts, exact.Ts, TOL)
+        assert_rel_error(self, flow.area, exact.area, TOL)
+        assert_rel_error(self, flow.gams, exact.gams, TOL)
+
+    def test_lookup(self):
+        exact = flowstation._cantera_equilibrium('TP', 1234.5, 123.4)
+        TOL = 10 * self.table.max_error
+        for mode, value in (('TP', exact.T), ('HP', exact.h), ('SP', exact.s)):
+            state = self.table.lookup(mode, value, 123.4)
+            assert_rel_error(self, state.T, exact.T, TOL)
+            assert_rel_error(self, state.rho, exact.rho, TOL)
+            assert_rel_error(self, state.Cp, exact.Cp, TOL)
+
+    def test_fall_back(self):
+        self.assertEqual(self.table.lookup('TP', 3000.0, 15.0), None)
+        self.assertEqual(self.table.lookup('TP', 1000.0, 1000.0), None)
+        exact = flowstation.solve(Tt=3000.0, Pt=15.0)
+        flowstation.set_property_table(self.table)
+        flow = flowstation.solve(Tt=3000.0, Pt=15.0)
+        self.assertEqual(flow.ht, exact.ht)
+
+    def test_save_load(self):
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'air.npz')
+            self.table.save(filename)
+            table = PropertyTable.load(filename)
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual(table.species, self.table.species)
+        self.assertEqual(table.max_error, self.table.max_error)
+        self.assertEqual(table.lookup('HP', 100.0, 20.0), self.table.lookup('HP', 100.0, 20.0))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+
+import numpy as np
+
+from pycycle import flowstation
+from pycycle.results import Results
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+class ResultsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.outputs = [flowstation.solve(Pt=Pt, Tt=518.0, W=100.0, Mach=0.3) for Pt in (15.0, 30.0)] + [flowstation.solve(Pt=45.0, Tt=518.0, W=100.0)]
+
+    def test_outputs(self):
+        results = Results(4)
+        self.assertEqual(results.nbytes, 4 * len(flowstation.Output._fields) * 9)
+        for out in self.outputs:
+            results.append(out)
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results.capacity, 4)
+        np.testing.assert_array_equal(results['Pt'], [15.0, 30.0, 45.0])
+        self.assertEqual(results.row(0), dict(zip(flowstation.Output._fields, self.outputs[0])))
+
+        # unset (-1.0) values are NaN and masked
+        self.assertEqual(self.outputs[2].area, -1.0)
+        self.assertTrue(np.isnan(results['area'][2]))
+        np.testing.assert_array_equal(results.mask('area'), [False, False, True])
+        self.assertEqual(results.masked('area').mean(), np.mean([self.outputs[0].area, self.outputs[1].area]))
+        self.assertFalse(results.mask('Pt').any())
+
+        # columns are views
+        results['Mach'][1] = 0.5
+        self.assertEqual(results.as_array()[flowstation.Output._fields.index('Mach'), 1], 0.5)
+        self.assertTrue(np.may_share_memory(results.masked('Mach'), results['Mach']))
+
+        results.append(self.outputs[0])
+        self.assertRaises(IndexError, results.append, self.outputs[0])
+        self.assertRaises(ValueError, results.set_row, 0, self.outputs[0][:5])
+
+    def test_batch(self):
+        out = flowstation.solve_batch(np.array([[15.0, 30.0], [45.0, 60.0]]), Tt=518.0, W=100.0, Mach=0.3)
+        results = Results.from_batch(out)
+        self.assertEqual(len(results), 4)
+        np.testing.assert_array_equal(results['Ps'], out.Ps.ravel())
+        self.assertFalse(results.mask('Ps').any())
+        # statics that were not solved are unset
+        results = Results.from_batch(flowstation.solve_batch(np.array([15.0, 30.0]), Tt=518.0, W=100.0))
+        np.testing.assert_array_equal(results.mask('area'), [True, True])
+        self.assertTrue(np.isnan(results['area']).all())
+        self.assertEqual(Results.from_outputs(self.outputs).row(1), Results.from_outputs(self.outputs[1:2]).row(0))
+
+    def test_dicts(self):
+        results = Results.from_dicts([{'nozzle.Fg': 1200.0, 'nozzle.Ps': 14.7}, {'error': 'Traceback ...'}, {'nozzle.Fg': 1300.0, 'nozzle.Ps': 14.7}])
+        self.assertEqual(results.fields, ('nozzle.Fg', 'nozzle.Ps'))
+        np.testing.assert_array_equal(results.mask(), [False, True, False])
+        self.assertEqual(np.nanmax(results['nozzle.Fg']), 1300.0)
+
+        # only missing fields are unset, not values of -1.0
+        results = Results.from_dicts([{'x': -1.0, 'y': 2.0}, {'y': -1.0}])
+        np.testing.assert_array_equal(results['y'], [2.0, -1.0])
+        np.testing.assert_array_equal(results.mask('x'), [False, True])
+        self.assertTrue(np.isnan(results['x'][1]))
+        self.assertEqual(results.masked('x').mean(), -1.0)
+        self.assertFalse(results.mask().any())
+
+    @unittest.skipIf(pandas is None, 'pandas is not installed')
+    def test_dataframe(self):
+        results = Results.from_outputs(self.outputs)
+        frame = results.to_dataframe()
+        self.assertEqual(list(frame.columns), list(flowstation.Output._fields))
+        self.assertTrue(np.may_share_memory(frame['Pt'].values, results['Pt']))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from openmdao.core.problem import Problem
+from openmdao.core.group import Group
+from openmdao.components.indep_var_comp import IndepVarComp
+
+from test_util import assert_rel_error
+from pycycle.duct import Duct
+from pycycle import sweep
+
+def build():
+    g = Group()
+    g.add('duct', Duct())
+    p = Problem(root=g)
+    p.setup(check=False)
+    return p
+
+def build_connected():
+    g = Group()
+    g.add('des', IndepVarComp('design', True))
+    g.add('duct', Duct())
+    g.connect('des.design', 'duct.design')
+    p = Problem(root=g)
+    p.setup(check=False)
+    return p
+
+class SweepTestCase(unittest.TestCase):
+    def setUp(self):
+        self.p = build()
+        comp = self.p.root.duct
+        comp.params['dPqP'] = 0.0
+        comp.params['Q_dot'] = -237.8
+        comp.params['MNexit_des'] = 0.4
+        comp.params['flow_in:in:W'] = 1.080
+        comp.params['flow_in:in:Tt'] = 1424.01
+        comp.params['flow_in:in:Pt'] = 0.34
+        comp.params['flow_in:in:Mach'] = 0.4
+        comp.params['design'] = True
+        self.p.run()
+        self.points = [{'duct.dPqP': dPqP, 'duct.flow_in:in:W': W} for W in (1.0, 1.04, 1.08) for dPqP in (0.0, 0.05)]
+        self.outputs = ['duct.flow_out:out:Mach', 'duct.flow_out:out:Pt', 'duct.flow_out:out:area']
+
+    def test_serial(self):
+        results = sweep.run_sweep(build, self.p, self.points, self.outputs, processes=1)
+        self.assertEqual(len(results), len(self.points))
+        for point, result in zip(self.points, results):
+            # off-design runs at the design exit area, and the design inputs not in the point
+            assert_rel_error(self, result['duct.flow_out:out:area'], 221.4, 0.005)
+            assert_rel_error(self, result['duct.flow_out:out:Pt'], 0.34 * (1.0 - point['duct.dPqP']), 1e-6)
+        self.assertLess(results[0]['duct.flow_out:out:Mach'], results[-1]['duct.flow_out:out:Mach'])
+
+    def test_parallel(self):
+        serial = sweep.run_sweep(build, self.p, self.points, self.outputs, processes=1)
+        parallel = sweep.run_sweep(build, self.p, self.points, self.outputs, processes=2)
+        for expected, result in zip(serial, parallel):
+            for name in self.outputs:
+                assert_rel_error(self, result[name], expected[name], 1e-6)
+
+    def test_error(self):
+        results = sweep.run_sweep(build, self.p, [{'duct.flow_in:in:W': 1.0}, {'duct.flow_in:in:W': 10.0}], self.outputs, processes=1)
+        self.assertNotIn('error', results[0])
+        self.assertIn('error', results[1]) # too much flow for the design area
+
+    def test_save_load(self):
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'duct.des')
+            sweep.save_design_state(self.p, filename)
+            p = build()
+            sweep.load_design_state(p, filename)
+        finally:
+            shutil.rmtree(directory)
+        self.assertFalse(p.root.duct.params['design'])
+        p['duct.dPqP'] = 0.05
+        p.run()
+        expected = sweep.run_sweep(build, self.p, [{'duct.dPqP': 0.05}], self.outputs, processes=1)[0]
+        for name in self.outputs:
+            assert_rel_error(self, p[name], expected[name], 1e-9)
+        # a state only fits a model of the same structure
+        g = Group()
+        g.add('other', Duct())
+        other = Problem(root=g)
+        other.setup(check=False)
+        self.assertRaises(ValueError, sweep.set_design_state, other, sweep.design_state(self.p))
+
+    def test_connected_design(self):
+        # design driven by an IndepVarComp stays off-design after the next data transfer
+        p = build_connected()
+        for name in ('dPqP', 'Q_dot', 'MNexit_des', 'flow_in:in:W', 'flow_in:in:Tt', 'flow_in:in:Pt', 'flow_in:in:Mach'):
+            p['duct.' + name] = self.p['duct.' + name]
+        p.run()
+        self.assertTrue(p.root.duct.params['design'])
+        results = sweep.run_sweep(build_connected, p, [{'duct.flow_in:in:W': 1.0}], self.outputs, processes=1)
+        assert_rel_error(self, results[0]['duct.flow_out:out:area'], p['duct.flow_out:out:area'], 1e-9) # at the design area
+        self.assertLess(results[0]['duct.flow_out:out:Mach'], p['duct.flow_out:out:Mach'])
+
+        sweep.set_design_state(p, sweep.design_state(p))
+        p.run()
+        self.assertFalse(p['des.design'])
+        self.assertFalse(p.root.duct.params['design'])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,12 @@
-# Copied from OpenMDAO 0.13 source
+# assert_rel_error copied from OpenMDAO 0.13 source
 from math import isnan
 
+from openmdao.core.group import Group
+from openmdao.core.problem import Problem
+from openmdao.components.indep_var_comp import IndepVarComp
+
+from pycycle import flowstation
+
 def assert_rel_error(test_case, actual, desired, tolerance):
     """
     Determine that the relative error between `actual` and `desired`
@@ -43,3 +49,21 @@ def assert_rel_error(test_case, actual, desired, tolerance):
             if abs(error) > tolerance:
                 test_case.fail('at %d: actual %s, desired %s, rel error %s,'
                                ' tolerance %s' % (i, act, des, error, tolerance))
+
+def check_partials(test_case, comp, inputs, designs=(True, False)):
+    '''Check the partials of comp at inputs, given by name, against central differences, on and off-design, and that it needed no finite differences of its own'''
+    g = Group()
+    g.add('inputs', IndepVarComp([(name.replace(':', '_'), value) for name, value in inputs.iteritems()]))
+    g.add('comp', comp)
+    for name in inputs:
+        g.connect('inputs.' + name.replace(':', '_'), 'comp.' + name)
+    p = Problem(root=g)
+    p.setup(check=False)
+    for design in designs:
+        p['comp.design'] = design
+        p.run()
+        with flowstation.statics_rtol(1e-13):
+            data = p.check_partial_derivatives(out_stream=None, comps=['comp'], global_options={'check_step_calc': 'relative', 'check_step_size': 1e-6, 'check_form': 'central'})
+        for key, errors in data['comp'].iteritems():
+            test_case.assertLess(errors['abs error'][0], 1e-4 * max(errors['magnitude'][2], 1.0), key)
+    test_case.assertEqual(comp.linearize_stats['fd'], 0)